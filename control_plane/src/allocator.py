@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+import numpy as np
+from .models import ScheduleMatrix
+
+
+@dataclass
+class Allocation:
+    """What each customer got under a capacity cap, and what it was short of."""
+    allocated: ScheduleMatrix
+    shortfall: ScheduleMatrix
+
+
+class CapacityAllocator:
+    """Share a per-slot agent cap between customers in priority order.
+
+    Priority 1 is served first, and a level only gets the agents the levels above it left
+    over; a customer with rows at several priorities competes at each of them with the
+    agents its rows at that priority need (see `allocate`). When a level asks for more
+    than is left in a slot, the agents are shared max-min fairly (water-filling): every
+    customer gets min(demand, level) for the highest whole `level` that fits, and the few
+    agents left after rounding go one each to the first customers (in first-seen order)
+    that are still short.
+
+    The water level is found with one sort per over-subscribed slot, so a slot costs
+    O(customers log customers) only when its level does not fit; slots with enough agents
+    are copied through as is.
+    """
+    # Cells per water-filling block; bounds the sort temporaries
+    BLOCK_CELLS = 1 << 22
+
+    def __init__(self, capacity):
+        # Agents available per slot: one number, or one per slot of the schedule
+        self.capacity = capacity
+
+    def allocate(self, schedule: ScheduleMatrix, priorities: Dict[str, int],
+                 levels: Optional[Sequence[ScheduleMatrix]] = None) -> Allocation:
+        """Allocate `schedule`'s demand; `priorities` maps customers to 1-5 (default 5).
+
+        With `levels` (a `Scheduler`'s `priority_schedules`: every customer's agents at
+        priority 1 to 5), each part of a customer's demand is served at its own priority and
+        `priorities` is not used; without, a customer's whole demand is served at its entry.
+        """
+        demand = schedule.cells
+        remaining = np.broadcast_to(np.asarray(self.capacity, dtype=np.int64), (schedule.slots,)).copy()
+        if (remaining < 0).any():
+            raise ValueError("capacity must not be negative")
+        names = schedule.customer_names
+
+        allocated = np.zeros_like(demand)
+        for columns, share in self._levels(schedule, priorities, levels):
+            short = np.flatnonzero(share.sum(axis=1) > remaining)
+            block = max(1, self.BLOCK_CELLS // max(1, columns.size))
+            for offset in range(0, short.size, block):
+                rows = short[offset:offset + block]
+                share[rows] = self.water_fill(share[rows], remaining[rows])
+            allocated[:, columns] += share
+            remaining -= share.sum(axis=1)
+
+        return Allocation(
+            allocated=ScheduleMatrix.from_cells(names, allocated, resolution=schedule.resolution, days=schedule.days),
+            shortfall=ScheduleMatrix.from_cells(names, demand - allocated, resolution=schedule.resolution, days=schedule.days),
+        )
+
+    @staticmethod
+    def _levels(schedule: ScheduleMatrix, priorities: Dict[str, int],
+                levels: Optional[Sequence[ScheduleMatrix]]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        # (schedule columns, their demand) of every priority, most urgent first; the columns
+        # follow the schedule's, so the agents left after rounding go out in first-seen order
+        if levels is None:
+            names = schedule.customer_names
+            column_priority = np.fromiter((priorities.get(name, 5) for name in names), dtype=np.int64, count=len(names))
+            for priority in np.unique(column_priority).tolist():
+                columns = np.flatnonzero(column_priority == priority)
+                yield columns, schedule.cells[:, columns]
+            return
+        for level in levels:
+            n = len(level.customer_names)
+            if n == 0:
+                continue
+            columns = np.fromiter((schedule.customer_index(name) for name in level.customer_names), dtype=np.int64,
+                                  count=n)
+            order = np.argsort(columns)
+            yield columns[order], level.cells[:, order]
+
+    @staticmethod
+    def water_fill(demand: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+        """Max-min fair integer split of `capacity[i]` agents over the row `demand[i]`.
+
+        Every row must ask for more than its capacity.
+        """
+        k = demand.shape[1]
+        ordered = np.sort(demand, axis=1)
+        # Agents taken by the j smallest demands when they are all met in full
+        satisfied = np.cumsum(ordered, axis=1) - ordered
+        level = (capacity[:, np.newaxis] - satisfied) // (k - np.arange(k))
+        # The first demand above its level fixes the level for the rest of the row
+        first_short = np.argmax(level < ordered, axis=1)
+        level = level[np.arange(len(level)), first_short]
+
+        share = np.minimum(demand, level[:, np.newaxis])
+        left = capacity - share.sum(axis=1)
+        still_short = demand > level[:, np.newaxis]
+        share += still_short & (np.cumsum(still_short, axis=1) <= left[:, np.newaxis])
+        return share
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from termcolor import colored
+import numpy as np
+from .formatter import Formatter
+from .generator import WorkloadGenerator
+from .main import peak_rss_mb
+from .parser import InputParser
+from .scheduler import Scheduler
+
+RESULTS_FORMAT = 1
+SIZES = (10, 1000, 100_000, 1_000_000)
+STAGES = ("parse", "schedule", "format")
+# Allowed drop in rows per second against a baseline before a stage counts as regressed
+DEFAULT_TOLERANCE = 0.25
+# Stages that took less than this in the baseline are timer noise and never gate
+MIN_GATED_SECONDS = 0.05
+# The python engine keeps one pydantic model per row; beyond this it only measures swapping
+PYTHON_MAX_ROWS = 1_000_000
+
+
+class Benchmark:
+    """Times parse, schedule and format on generated inputs of growing size.
+
+    Every (size, engine) case runs in its own interpreter, so its peak RSS is its own and
+    caches warmed by one case (time strings, imports) do not flatter the next. Each stage
+    is timed `repeat` times and the fastest run is kept. Results are plain JSON that a
+    later run can be compared against with `compare`.
+    """
+
+    @staticmethod
+    def run_case(path: str, engine: str, repeat: int = 1) -> dict:
+        """Time every stage on one input in this process (see `measure` for a fresh one)."""
+        rows = Benchmark._count_rows(path)
+        timings: Dict[str, float] = {}
+        # Load what the stages import on first use, so the first timed run is not charged for it
+        import dateutil.parser  # noqa: F401
+        from . import schemas  # noqa: F401
+
+        def timed(stage: str, fn):
+            best, result = float("inf"), None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = fn()
+                best = min(best, time.perf_counter() - started)
+            timings[stage] = best
+            return result
+
+        with open(os.devnull, "w") as devnull:
+            # Row errors go to stderr, which `measure` discards; their cost is part of the parse
+            if engine == "numpy":
+                requirements = timed("parse", lambda: InputParser.parse_csv_batch(path))
+            else:
+                requirements = timed("parse", lambda: InputParser.parse_csv(path))
+
+            def schedule():
+                scheduler = Scheduler(engine=engine)
+                scheduler.process_requirements(requirements)
+                # Force the lazy prefix sums, which are part of scheduling
+                scheduler.schedule.cells
+                return scheduler.schedule
+
+            matrix = timed("schedule", schedule)
+            customers = matrix.active_customers()
+            timed("format", lambda: Formatter.write_csv(matrix, devnull, customers))
+
+        return {
+            "rows": rows,
+            "engine": engine,
+            "customers": len(customers),
+            "stages": {stage: {"seconds": seconds, "rows_per_sec": rows / seconds if seconds else None}
+                       for stage, seconds in timings.items()},
+            "total_seconds": sum(timings.values()),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    @staticmethod
+    def measure(path: str, engine: str, repeat: int = 1) -> dict:
+        """`run_case` in a fresh interpreter."""
+        result = subprocess.run(
+            [sys.executable, "-m", "src.benchmark", "--case", path, "--engine", engine, "--repeat", str(repeat)],
+            cwd=Path(__file__).resolve().parent.parent, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, check=True,
+        )
+        return json.loads(result.stdout)
+
+    @staticmethod
+    def run(sizes: Sequence[int] = SIZES, engines: Sequence[str] = Scheduler.ENGINES, repeat: int = 1,
+            data_dir: Optional[str] = None, generator: Optional[WorkloadGenerator] = None,
+            python_max_rows: int = PYTHON_MAX_ROWS) -> dict:
+        """Benchmark every size with every engine; inputs are generated into `data_dir` once and reused."""
+        generator = generator or WorkloadGenerator()
+        cases = []
+        with tempfile.TemporaryDirectory() as scratch:
+            directory = Path(data_dir or scratch)
+            directory.mkdir(parents=True, exist_ok=True)
+            for rows in sizes:
+                path = Benchmark.input_path(directory, generator, rows)
+                if not path.exists():
+                    staging = path.with_suffix(".tmp")
+                    with open(staging, "w", newline="") as f:
+                        generator.write(f, rows)
+                    staging.rename(path)
+                for engine in engines:
+                    if engine == "python" and rows > python_max_rows:
+                        continue
+                    case = Benchmark.measure(str(path), engine, repeat)
+                    Benchmark._print_case(case)
+                    cases.append(case)
+        return {
+            "format": RESULTS_FORMAT,
+            "environment": Benchmark.environment(),
+            "workload": {"seed": generator.seed, "customers": generator.customers, "malformed": generator.malformed,
+                         "sub_hour": generator.sub_hour, "time_styles": generator.time_styles},
+            "repeat": repeat,
+            "cases": cases,
+        }
+
+    @staticmethod
+    def input_path(directory: Path, generator: WorkloadGenerator, rows: int) -> Path:
+        # Named after everything that shapes the file, so a reused data directory never serves a stale input
+        customers = generator.customers if generator.customers is not None else "auto"
+        styles = "-".join(generator.time_styles)
+        return directory / (f"workload_{rows}_seed{generator.seed}_c{customers}_m{generator.malformed}"
+                            f"_q{generator.sub_hour}_{styles}.csv")
+
+    @staticmethod
+    def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+        """One message per stage whose throughput fell more than `tolerance` below the baseline."""
+        previous = {(case["rows"], case["engine"]): case for case in baseline["cases"]}
+        regressions = []
+        for case in results["cases"]:
+            old = previous.get((case["rows"], case["engine"]))
+            if old is None:
+                continue
+            for stage, timing in case["stages"].items():
+                old_timing = old["stages"].get(stage)
+                if old_timing is None or old_timing["seconds"] < MIN_GATED_SECONDS:
+                    continue
+                ratio = timing["rows_per_sec"] / old_timing["rows_per_sec"]
+                if ratio < 1 - tolerance:
+                    regressions.append(f"{case['engine']} {stage} at {case['rows']} rows: "
+                                       f"{timing['rows_per_sec']:,.0f} rows/s, was {old_timing['rows_per_sec']:,.0f} "
+                                       f"({ratio - 1:+.0%})")
+        return regressions
+
+    @staticmethod
+    def environment() -> dict:
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).resolve().parent,
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        }
+
+    @staticmethod
+    def save(results: dict, output: Optional[str] = None) -> str:
+        if output is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output = f"outputs/benchmark_{timestamp}.json"
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Benchmark results saved to {output}")
+        return output
+
+    @staticmethod
+    def _count_rows(path: str) -> int:
+        with open(path, "rb") as f:
+            return max(0, sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b"")) - 1)
+
+    @staticmethod
+    def _print_case(case: dict):
+        stages = ", ".join(f"{stage} {timing['seconds']:.3f}s ({timing['rows_per_sec'] or 0:,.0f} rows/s)"
+                           for stage, timing in case["stages"].items())
+        print(f"{case['rows']:>10,} rows  {case['engine']:<6} {stages}; peak RSS {case['peak_rss_mb']:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler pipeline on generated inputs")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Comma separated input sizes in rows")
+    parser.add_argument("--engine", action="append", choices=Scheduler.ENGINES,
+                        help="Engine to benchmark; repeat for several (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated inputs")
+    parser.add_argument("--customers", type=int, help="Distinct customers per input (default: one per ten rows)")
+    parser.add_argument("--malformed", type=float, default=0.01, help="Share of malformed rows in the inputs")
+    parser.add_argument("--data-dir", help="Keep generated inputs here and reuse them across runs")
+    parser.add_argument("--python-max-rows", type=int, default=PYTHON_MAX_ROWS,
+                        help="Skip the python engine on larger inputs")
+    parser.add_argument("--output", help="Path of the JSON results (default: outputs/benchmark_<timestamp>.json)")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput drop against --baseline before failing (0.25 = 25%%)")
+    # Internal: time one case in this process and print its JSON (used by Benchmark.measure)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.case:
+        print(json.dumps(Benchmark.run_case(args.case, args.engine[0], args.repeat)))
+        return
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        generator = WorkloadGenerator(args.seed, args.customers, args.malformed)
+    except ValueError as e:
+        parser.error(str(e))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = Benchmark.run(sizes, args.engine or Scheduler.ENGINES, args.repeat, args.data_dir, generator,
+                            args.python_max_rows)
+    Benchmark.save(results, args.output)
+    if baseline is None:
+        return
+    regressions = Benchmark.compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(colored(f"Regression: {regression}", 'red'), file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print(colored(f"No stage regressed by more than {args.tolerance:.0%} against {args.baseline}", 'green'))
+
+
+if __name__ == "__main__":
+    main()
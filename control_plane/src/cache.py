@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from . import metrics
+from .models import RequirementBatch, ScheduleMatrix
+
+# Bumped when the layout of cache entries changes
+CACHE_FORMAT = 1
+# Default size cap of the cache directory
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Entry file whose modification time records the last use, for LRU eviction
+META_FILE = "meta.json"
+BATCH_COLUMNS = ("customer_ids", "avg_duration_sec", "start_minute", "end_minute", "total_calls", "priority", "row_numbers")
+
+
+def source_digest(*modules: str) -> str:
+    """Hash of the source of the sibling `modules`, so a cache entry dies with the code that built it.
+
+    Modules are named rather than imported, so hashing them does not load pydantic.
+    """
+    digest = hashlib.sha256(str(CACHE_FORMAT).encode())
+    for module in modules:
+        digest.update(Path(__file__).with_name(f"{module}.py").read_bytes())
+    return digest.hexdigest()
+
+
+# The parse depends on these modules, the schedule on these and the scheduling ones too
+PARSER_VERSION = source_digest("parser", "models", "schemas", "time_normalizer")
+SCHEDULER_VERSION = source_digest("parser", "models", "schemas", "time_normalizer", "scheduler", "erlang")
+
+
+@dataclass
+class CachedSchedule:
+    """A finished run: the per-customer schedule, priorities, the pooled schedule if any, the
+    row errors of the parse (see `InputParser.report_errors`), and the schedule per priority
+    when it was kept (see `Scheduler.priority_schedules`)."""
+    schedule: ScheduleMatrix
+    priorities: Dict[str, int]
+    pooled: Optional[ScheduleMatrix] = None
+    errors: List[Tuple[int, Optional[str]]] = field(default_factory=list)
+    levels: Optional[List[ScheduleMatrix]] = None
+
+
+class ScheduleCache:
+    """On-disk, content-addressed cache of parsed requirements and finished schedules.
+
+    Keys hash the bytes of the input file together with the source of the code that
+    produced the entry (`PARSER_VERSION`, `SCHEDULER_VERSION`) and every option the result
+    depends on, so editing the input or the parser simply misses and nothing is ever
+    invalidated by hand.
+
+    Each entry is a directory of `.npy` arrays plus a small `meta.json`; loads memory-map
+    the arrays, so a hit costs a hash of the input and a few `np.load`s. Entries are
+    written to a temporary directory and renamed into place, so readers never see half an
+    entry. The directory is kept under `max_bytes` by evicting the least recently used
+    entries (by the modification time of `meta.json`, touched on every hit).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def file_digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def requirements_key(input_digest: str, allow_wrap: bool = False, days: Optional[int] = None,
+                         parse_engine: str = "numpy") -> str:
+        # Rows with windows longer than `days` are rejected by the parse, so the horizon is part of the key,
+        # and the engine that parsed the rows words the errors replayed on a hit
+        return ScheduleCache._key("requirements", PARSER_VERSION, input_digest, allow_wrap, days, parse_engine)
+
+    @staticmethod
+    def schedule_key(input_digest: str, allow_wrap: bool, utilization: float, resolution: int, days: int,
+                     service_level: Optional[float] = None, answer_time: Optional[float] = None, pooled: bool = False,
+                     aggregate: bool = False, by_priority: bool = False, parse_engine: str = "numpy") -> str:
+        # The engines produce identical schedules, but the row errors replayed on a hit are worded
+        # by the engine that parsed the input, so only that one is part of the key
+        return ScheduleCache._key("schedule", SCHEDULER_VERSION, input_digest, allow_wrap, utilization, resolution,
+                                  days, service_level, answer_time, pooled, aggregate, by_priority, parse_engine)
+
+    def load_requirements(self, key: str) -> Optional[Tuple[RequirementBatch, List[Tuple[int, Optional[str]]]]]:
+        """The validated batch and the row errors its parse reported, or None on a miss."""
+        entry = self._open(key)
+        if entry is None:
+            return None
+        path, meta = entry
+        try:
+            columns = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in BATCH_COLUMNS}
+        except FileNotFoundError:
+            return self._miss()
+        self._hit()
+        errors = [tuple(error) for error in meta["errors"]]
+        return RequirementBatch(customer_names=meta["customer_names"], **columns), errors
+
+    def store_requirements(self, key: str, batch: RequirementBatch, errors: List[Tuple[int, Optional[str]]]):
+        arrays = {name: getattr(batch, name) for name in BATCH_COLUMNS}
+        self._store(key, arrays, {"customer_names": batch.customer_names, "errors": errors})
+
+    def load_schedule(self, key: str) -> Optional[CachedSchedule]:
+        entry = self._open(key)
+        if entry is None:
+            return None
+        path, meta = entry
+
+        def matrix(name: str, names: List[str]) -> ScheduleMatrix:
+            return ScheduleMatrix.from_cells(names, np.load(path / f"{name}_cells.npy", mmap_mode="r"),
+                                             np.load(path / f"{name}_totals.npy", mmap_mode="r"),
+                                             resolution=meta["resolution"], days=meta["days"])
+
+        try:
+            schedule = matrix("schedule", meta["customer_names"])
+            pooled = matrix("pooled", meta["pooled_names"]) if meta["pooled_names"] is not None else None
+            levels = None
+            if meta["level_names"] is not None:
+                levels = [matrix(f"level{i + 1}", names) for i, names in enumerate(meta["level_names"])]
+        except FileNotFoundError:
+            return self._miss()
+        self._hit()
+        return CachedSchedule(schedule, meta["priorities"], pooled, [tuple(error) for error in meta["errors"]], levels)
+
+    def store_schedule(self, key: str, cached: CachedSchedule):
+        arrays = {"schedule_cells": cached.schedule.cells, "schedule_totals": cached.schedule.totals}
+        if cached.pooled is not None:
+            arrays.update(pooled_cells=cached.pooled.cells, pooled_totals=cached.pooled.totals)
+        for i, level in enumerate(cached.levels or ()):
+            arrays.update({f"level{i + 1}_cells": level.cells, f"level{i + 1}_totals": level.totals})
+        self._store(key, arrays, {
+            "customer_names": cached.schedule.customer_names,
+            "pooled_names": cached.pooled.customer_names if cached.pooled is not None else None,
+            "level_names": [level.customer_names for level in cached.levels] if cached.levels is not None else None,
+            "priorities": cached.priorities,
+            "resolution": cached.schedule.resolution,
+            "days": cached.schedule.days,
+            "errors": cached.errors,
+        })
+
+    @staticmethod
+    def _key(kind: str, version: str, *parts) -> str:
+        return hashlib.sha256(json.dumps([kind, version, *parts]).encode()).hexdigest()
+
+    def _open(self, key: str) -> Optional[Tuple[Path, dict]]:
+        # The entry's directory and meta, or None (counted as a miss); the caller counts a hit
+        # once its arrays are loaded, since another process may evict the entry in between
+        path = self.directory / key
+        try:
+            with open(path / META_FILE) as f:
+                meta = json.load(f)
+            # Mark as recently used
+            os.utime(path / META_FILE)
+        except (OSError, ValueError):
+            return self._miss()
+        return path, meta
+
+    @staticmethod
+    def _hit():
+        run_metrics = metrics.current()
+        if run_metrics is not None:
+            run_metrics.count("cache_hits")
+
+    @staticmethod
+    def _miss() -> None:
+        run_metrics = metrics.current()
+        if run_metrics is not None:
+            run_metrics.count("cache_misses")
+        return None
+
+    def _store(self, key: str, arrays: Dict[str, np.ndarray], meta: dict):
+        path = self.directory / key
+        if path.exists():
+            return
+        staging = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self.directory))
+        try:
+            for name, array in arrays.items():
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+            with open(staging / META_FILE, "w") as f:
+                json.dump(meta, f)
+            os.rename(staging, path)
+        except OSError:
+            # Another process stored the same entry first, or the disk is full; the cache is best effort
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self.directory.iterdir():
+            meta = path / META_FILE
+            if path.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in path.iterdir())
+                entries.append((meta.stat().st_mtime, size, path))
+            except OSError:
+                # Not an entry, or evicted by another process meanwhile
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
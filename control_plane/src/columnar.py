@@ -0,0 +1,174 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Iterable, List, Optional
+import numpy as np
+from .models import ScheduleMatrix, split_offset
+from .formatter import Formatter
+
+# Key of the schedule description in Parquet / Arrow schema metadata, and its file in npy directories
+METADATA_KEY = b"schedule"
+NPY_METADATA = "schedule.json"
+
+
+class ColumnarSchedule:
+    """A schedule read back from a columnar file.
+
+    `cells` is slots x customers like `ScheduleMatrix.cells`, and `totals` the agents per
+    slot. For npy directories both are memory-mapped, so nothing is read until it is
+    touched. For Arrow IPC files every slot column is a zero-copy view into the memory-
+    mapped file (`slot`), and `cells` stacks them the first time it is asked for. Parquet
+    is compressed, so it is decoded once on load.
+    """
+
+    def __init__(self, customer_names: List[str], slot_columns: List[np.ndarray], totals: np.ndarray,
+                 resolution: int = 60, days: int = 1, cells: Optional[np.ndarray] = None):
+        self.customer_names = customer_names
+        self.totals = totals
+        self.resolution = resolution
+        self.days = days
+        self._slot_columns = slot_columns
+        self._cells = cells
+
+    @property
+    def slots(self) -> int:
+        return len(self.totals)
+
+    @property
+    def cells(self) -> np.ndarray:
+        if self._cells is None:
+            self._cells = np.stack(self._slot_columns) if self._slot_columns else np.zeros((0, len(self.customer_names)), dtype=np.int64)
+        return self._cells
+
+    def slot(self, index: int) -> np.ndarray:
+        """Agents per customer in one slot, without copying."""
+        return self._slot_columns[index]
+
+    def to_matrix(self) -> ScheduleMatrix:
+        """A `ScheduleMatrix` copy, for the formatter or further scheduling."""
+        return ScheduleMatrix.from_cells(self.customer_names, np.asarray(self.cells), np.asarray(self.totals),
+                                         resolution=self.resolution, days=self.days)
+
+
+class ColumnarStore:
+    """Write and read schedules in binary columnar layouts.
+
+    Every format stores one row per customer and one int64 column per slot (named like the
+    slots of the CSV output), so a slot is a contiguous column and a file with 50k customers
+    has a few hundred columns at most. Totals, resolution and days travel as metadata.
+
+    - `npy`: a directory with `cells.npy` (slots x customers), `totals.npy` and
+      `schedule.json` (customer names, resolution, days); read with `np.load(mmap_mode="r")`.
+    - `arrow`: an uncompressed Arrow IPC file, memory-mapped on read.
+    - `parquet`: a compressed Parquet file, for storage and analytics engines.
+
+    Arrow and Parquet need the optional `pyarrow` package.
+    """
+    FORMATS = ("parquet", "arrow", "npy")
+    SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "npy": ""}
+
+    @staticmethod
+    def save(schedule: ScheduleMatrix, fmt: str, output: Optional[str] = None, customers: Optional[Iterable[str]] = None,
+             prefix: str = "schedule") -> Path:
+        """Save `schedule` as `fmt`; paths and customer columns are chosen like in `Formatter.save_csv`."""
+        if fmt not in ColumnarStore.FORMATS:
+            raise ValueError(f"Unknown columnar format '{fmt}', expected one of {ColumnarStore.FORMATS}")
+        if customers is None:
+            customers = schedule.active_customers()
+        names = sorted(customers)
+        cells = ColumnarStore._columns(schedule, names)
+        totals = np.ascontiguousarray(schedule.totals, dtype=np.int64)
+        metadata = {"resolution": schedule.resolution, "days": schedule.days}
+
+        output_file = Formatter._output_path(output, prefix, ColumnarStore.SUFFIXES[fmt])
+        if fmt == "npy":
+            output_file.mkdir(parents=True, exist_ok=True)
+            np.save(output_file / "cells.npy", cells)
+            np.save(output_file / "totals.npy", totals)
+            with open(output_file / NPY_METADATA, "w") as f:
+                json.dump({**metadata, "customers": names}, f)
+        else:
+            pa = ColumnarStore.require_pyarrow(fmt)
+            labels = ColumnarStore.slot_labels(schedule.slots, schedule.resolution, schedule.days)
+            table = pa.Table.from_arrays(
+                [pa.array(names, type=pa.string())] + [pa.array(column) for column in cells],
+                names=["customer"] + labels,
+            ).replace_schema_metadata({METADATA_KEY: json.dumps({**metadata, "totals": totals.tolist()})})
+            if fmt == "arrow":
+                with pa.OSFile(str(output_file), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            else:
+                import pyarrow.parquet as pq
+                pq.write_table(table, str(output_file))
+
+        print(f"{fmt.capitalize()} output saved to {output_file}")
+        return output_file
+
+    @staticmethod
+    def load(path: str) -> ColumnarSchedule:
+        """Read a schedule written by `save`; the format is told by the path."""
+        path = Path(path)
+        if path.is_dir():
+            with open(path / NPY_METADATA) as f:
+                metadata = json.load(f)
+            cells = np.load(path / "cells.npy", mmap_mode="r")
+            return ColumnarSchedule(metadata["customers"], list(cells), np.load(path / "totals.npy", mmap_mode="r"),
+                                    metadata["resolution"], metadata["days"], cells=cells)
+        if path.suffix == ".parquet":
+            ColumnarStore.require_pyarrow("parquet")
+            import pyarrow.parquet as pq
+            table = pq.read_table(str(path))
+        elif path.suffix == ".arrow":
+            pa = ColumnarStore.require_pyarrow("arrow")
+            table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        else:
+            raise ValueError(f"Cannot tell the columnar format of {path}; expected an npy directory, .arrow or .parquet")
+        metadata = json.loads(table.schema.metadata[METADATA_KEY])
+        columns = [table.column(i).combine_chunks().to_numpy() for i in range(1, table.num_columns)]
+        return ColumnarSchedule(table.column(0).to_pylist(), columns, np.array(metadata["totals"], dtype=np.int64),
+                                metadata["resolution"], metadata["days"])
+
+    @staticmethod
+    def slot_labels(slots: int, resolution: int, days: int) -> List[str]:
+        return [Formatter._slot_label(*split_offset(index * resolution), days > 1) for index in range(slots)]
+
+    @staticmethod
+    def _columns(schedule: ScheduleMatrix, names: List[str]) -> np.ndarray:
+        # slots x len(names), customers the schedule has never seen as all-zero columns
+        columns = [schedule.customer_index(name) for name in names]
+        cells = schedule.cells
+        if None in columns:
+            cells = np.hstack([cells, np.zeros((schedule.slots, 1), dtype=cells.dtype)])
+            columns = [-1 if column is None else column for column in columns]
+        return np.ascontiguousarray(cells[:, np.asarray(columns, dtype=np.int64)], dtype=np.int64)
+
+    @staticmethod
+    def require_pyarrow(fmt: str):
+        """The pyarrow module, or a ValueError saying `fmt` needs it."""
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError:
+            raise ValueError(f"--format {fmt} needs the pyarrow package (pip install pyarrow)")
+        return pyarrow
+
+
+def main():
+    # Convert a columnar schedule back to text, JSON or CSV, e.g. for the visualization
+    parser = argparse.ArgumentParser(description="Read a columnar schedule")
+    parser.add_argument("path", help="npy directory, .arrow or .parquet file")
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text", help="Output format")
+    parser.add_argument("--output", help="Path to output CSV file (only used when --format=csv)")
+    args = parser.parse_args()
+
+    schedule = ColumnarStore.load(args.path).to_matrix()
+    if args.format == "json":
+        Formatter.print_json(schedule)
+    elif args.format == "csv":
+        Formatter.save_csv(schedule, output=args.output, customers=schedule.customer_names)
+    else:
+        Formatter.print_text(schedule)
+
+
+if __name__ == "__main__":
+    main()
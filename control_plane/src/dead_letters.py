@@ -0,0 +1,164 @@
+import csv
+import io
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from .parser import InputParser
+
+# Leading columns of a dead letter file; the input's own columns follow
+COLUMNS = ("row", "error")
+# Error column of rows that had fewer than six fields
+INCOMPLETE = "incomplete row"
+# Rejected rows are written this many at a time
+BATCH_ROWS = 1024
+
+
+class DeadLetterQueue:
+    """CSV file of the rows a parse rejected: row number, error, then the original fields.
+
+    The parsers hand rejected rows to `reject` instead of printing them (see
+    `InputParser.iter_csv_batches`), and rows are written `batch_rows` at a time, and at the
+    end of every parsed batch, sorted by row number. Rows that failed batch validation
+    arrive without their fields, which the batch no longer holds; those are looked up in
+    one pass over `source` (a callable returning the input's lines) when the queue is
+    closed. The file is then rewritten in row order if any rows were written out of it, so
+    both parse paths give the same file. Once corrected, the file is fed back with `replay`.
+    """
+
+    def __init__(self, path: str, source: Optional[Callable[[], Iterable[str]]] = None,
+                 batch_rows: int = BATCH_ROWS):
+        self.path = path
+        self.source = source
+        self.batch_rows = batch_rows
+        self.rejected = 0
+        self.incomplete = 0
+        self._buffer: List[list] = []
+        # row_idx -> error of the rows whose fields are looked up on close
+        self._unresolved: Dict[int, str] = {}
+        # Number of the last row written, and whether every row so far was written in order
+        self._last_row = -1
+        self._ordered = True
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS + InputParser.COLUMNS)
+
+    def __enter__(self) -> "DeadLetterQueue":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reject(self, row_idx: int, error: Optional[str], row: Optional[List[str]] = None):
+        """Queue a rejected row; a None `error` marks an incomplete row, a None `row` one to look up on close."""
+        self.rejected += 1
+        if error is None:
+            self.incomplete += 1
+            error = INCOMPLETE
+        if row is None:
+            self._unresolved[row_idx] = error
+            return
+        self._buffer.append([row_idx, error, *row])
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the queued rows in row order; the parsers call this at the end of every batch."""
+        if not self._buffer:
+            return
+        self._buffer.sort(key=lambda row: row[0])
+        if self._buffer[0][0] < self._last_row:
+            self._ordered = False
+        self._last_row = max(self._last_row, self._buffer[-1][0])
+        self._writer.writerows(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self._resolve()
+            self.flush()
+        finally:
+            self._file.close()
+        if not self._ordered:
+            self._sort_file()
+
+    def summary(self) -> str:
+        return f"{self.rejected} rejected rows ({self.incomplete} incomplete) written to {self.path}"
+
+    def _sort_file(self):
+        # Rewrite the file in row order; rows with the same number keep the order they were written in
+        with open(self.path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = sorted(reader, key=lambda row: int(row[0]))
+        with open(self.path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def _resolve(self):
+        if not self._unresolved:
+            return
+        fields = {}
+        if self.source is not None:
+            lines = self.source()
+            try:
+                # One row per line, as in `replay`: only the wanted lines are split into fields
+                data = iter(lines)
+                next(data, None)
+                for row_idx, line in enumerate(data):
+                    if row_idx in self._unresolved:
+                        fields[row_idx] = next(csv.reader([line]), [])
+            finally:
+                close = getattr(lines, "close", None)
+                if close is not None:
+                    close()
+        for row_idx in sorted(self._unresolved):
+            self._buffer.append([row_idx, self._unresolved[row_idx], *fields.get(row_idx, ())])
+        self._unresolved.clear()
+
+    @staticmethod
+    def read(path: str) -> Dict[int, List[str]]:
+        """The rows of a (corrected) dead letter file by row number, without the row and error columns."""
+        rows = {}
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None or tuple(column.strip() for column in header[:len(COLUMNS)]) != COLUMNS:
+                raise ValueError(f"{path} is not a dead letter file: expected the columns {', '.join(COLUMNS)} first")
+            for line, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                try:
+                    row_idx = int(row[0])
+                except ValueError:
+                    raise ValueError(f"{path} line {line}: row number '{row[0]}' is not an integer")
+                rows[row_idx] = row[len(COLUMNS):]
+        return rows
+
+    @staticmethod
+    def replay(input_path: str, dead_letter_paths: Sequence[str]) -> Iterator[str]:
+        """Lines of `input_path` with the rows of corrected dead letter files in place of the originals.
+
+        Rows keep their input row numbers, so a row that is still wrong is rejected again
+        under its original number. Rows numbered past the end of the input are added after
+        it. Assumes one row per line, as in every input the parser reads.
+        """
+        corrected = {}
+        for path in dead_letter_paths:
+            corrected.update(DeadLetterQueue.read(path))
+        with open(input_path, encoding="utf-8-sig", newline="") as f:
+            line = next(f, "")
+            yield line
+            for row_idx, line in enumerate(f):
+                row = corrected.pop(row_idx, None)
+                yield line if row is None else _csv_line(row)
+        if corrected and not line.endswith(("\n", "\r")):
+            yield "\n"
+        for row_idx in sorted(corrected):
+            yield _csv_line(corrected[row_idx])
+
+
+def _csv_line(row: List[str]) -> str:
+    out = io.StringIO()
+    csv.writer(out).writerow(row)
+    return out.getvalue()
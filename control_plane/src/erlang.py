@@ -0,0 +1,136 @@
+import math
+import threading
+from typing import Dict, Tuple
+import numpy as np
+
+# Pooled traffic and call rates are accumulated in millionths, as integers, so the sums
+# are exact and do not depend on the order requirements arrive in
+MICRO = 1_000_000
+# Standard deviations of traffic below A where the Erlang B recurrence is started
+WARM_UP = 9
+
+
+class ErlangC:
+    """Minimum agents meeting a service level target under the Erlang C queueing model.
+
+    With `traffic` A = calls per hour * average handle time / 3600 (in Erlangs) and N
+    agents, the share of calls answered within `answer_time` seconds is
+
+        SL(N) = 1 - C(N, A) * exp(-(N - A) * answer_time / handle_time)
+
+    where C(N, A) is the Erlang C waiting probability. It is derived from Erlang B, which
+    follows the recurrence B(0) = 1, B(n) = A * B(n-1) / (n + A * B(n-1)); every term
+    stays in (0, 1], so thousands of agents need no factorials and cannot overflow.
+
+    The recurrence also forgets where it started: an error in B(n) is scaled by about n/A
+    per step. So instead of stepping up from 0, each pair starts at n = A - 9*sqrt(A) from
+    the large-A value B = 1 - n/A, and the start error has shrunk by e^-40 by the time
+    n reaches A. A pair then costs O(sqrt(A)) steps instead of O(A).
+
+    `agents_array` solves all distinct (traffic, handle time) pairs of a batch together,
+    stepping the recurrence for every pair at once, and memoizes the answers so repeated
+    pairs (across rows, chunks and files) are solved once. One instance may be shared
+    between threads: writes to the memo hold a lock, and reads need none since the answer
+    for a pair never changes.
+    """
+
+    def __init__(self, service_level: float = 0.8, answer_time: float = 20, pooled: bool = False,
+                 max_entries: int = 1 << 20):
+        if not 0 < service_level < 1:
+            raise ValueError(f"service_level must be between 0 and 1 (exclusive), got {service_level}")
+        if answer_time < 0:
+            raise ValueError(f"answer_time must not be negative, got {answer_time}")
+        self.service_level = service_level
+        self.answer_time = answer_time
+        # Staff each slot for the pooled traffic of all customers instead of per customer
+        self.pooled = pooled
+        self.max_entries = max_entries
+        self._cache: Dict[Tuple[float, float], int] = {}
+        self._lock = threading.Lock()
+
+    def agents(self, traffic: float, handle_time: float) -> int:
+        """Minimum agents for `traffic` Erlangs of calls lasting `handle_time` seconds."""
+        cached = self._cache.get((traffic, handle_time))
+        if cached is not None:
+            return cached
+        return int(self.agents_array(np.array([traffic]), np.array([handle_time]))[0])
+
+    def agents_array(self, traffic: np.ndarray, handle_time: np.ndarray) -> np.ndarray:
+        """`agents` for every (traffic, handle time) pair."""
+        traffic = np.asarray(traffic, dtype=np.float64)
+        handle_time = np.broadcast_to(np.asarray(handle_time, dtype=np.float64), traffic.shape)
+        if traffic.size == 0:
+            return np.zeros(traffic.shape, dtype=np.int64)
+        pairs, inverse = np.unique(np.stack([traffic.ravel(), handle_time.ravel()], axis=1), axis=0, return_inverse=True)
+        keys = list(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+
+        agents = np.fromiter((self._cache.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        missing = np.flatnonzero(agents < 0)
+        if missing.size:
+            agents[missing] = self._solve(pairs[missing, 0], pairs[missing, 1])
+            with self._lock:
+                if len(self._cache) + missing.size > self.max_entries:
+                    self._cache.clear()
+                self._cache.update(zip((keys[i] for i in missing.tolist()), agents[missing].tolist()))
+        return agents[inverse.ravel()].reshape(traffic.shape)
+
+    def service_level_for(self, agents: int, traffic: float, handle_time: float) -> float:
+        """SL(agents) for one pair; 0 when the queue is unstable (agents <= traffic)."""
+        if agents <= traffic:
+            return 0.0
+        blocking = 1.0
+        for n in range(1, agents + 1):
+            blocking = traffic * blocking / (n + traffic * blocking)
+        waiting = agents * blocking / (agents - traffic * (1 - blocking))
+        return 1 - waiting * math.exp(-(agents - traffic) * self.answer_time / handle_time)
+
+    def _solve(self, traffic: np.ndarray, handle_time: np.ndarray) -> np.ndarray:
+        agents = np.zeros(len(traffic), dtype=np.int64)
+        active = np.flatnonzero(traffic > 0)
+        if active.size == 0:
+            return agents
+        load = traffic[active]
+        start = np.maximum(np.floor(load - WARM_UP * np.sqrt(load)), 0)
+        # SL(n) is 0 until the queue is stable, so the search begins just above the load
+        first = np.floor(load) + 1
+        blocking = self._erlang_b(load, start, (first - start).astype(np.int64))
+
+        # Step n = first, first + 1, ... for all pairs together; a pair leaves as soon as
+        # SL(n) meets the target, so each step only touches the pairs still unsolved
+        n = first
+        decay = self.answer_time / handle_time[active]
+        while True:
+            with np.errstate(over="ignore"):
+                waiting = n * blocking / (n - load * (1 - blocking))
+                met = 1 - waiting * np.exp(-(n - load) * decay) >= self.service_level
+            if met.any():
+                agents[active[met]] = n[met]
+                keep = ~met
+                active, blocking, decay, load, n = active[keep], blocking[keep], decay[keep], load[keep], n[keep]
+                if active.size == 0:
+                    return agents
+            n = n + 1
+            blocking = load * blocking / (n + load * blocking)
+
+    @staticmethod
+    def _erlang_b(load: np.ndarray, start: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        """B(start + steps, load) for every pair, from B(start) ~ 1 - start / load.
+
+        Pairs are stepped in order of decreasing `steps`, so the pairs still running are
+        always a prefix and every step updates contiguous slices in place.
+        """
+        order = np.argsort(-steps, kind="stable")
+        load, n, steps = load[order], start[order], steps[order]
+        blocking = 1 - n / load
+        scratch = np.empty_like(blocking)
+        # Number of pairs that need more than k steps, for k = 0, 1, ...
+        running = np.searchsorted(-steps, -np.arange(steps[0] if steps.size else 0), side="left")
+        for count in running.tolist():
+            b, l, m, t = blocking[:count], load[:count], n[:count], scratch[:count]
+            m += 1
+            np.multiply(l, b, out=t)
+            np.add(m, t, out=b)
+            np.divide(t, b, out=b)
+        result = np.empty_like(blocking)
+        result[order] = blocking
+        return result
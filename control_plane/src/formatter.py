@@ -1,51 +1,240 @@
+from __future__ import annotations
 import json
 import csv
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
-from .models import HourlyStat
+from typing import TYPE_CHECKING, Callable, List, Iterable, Iterator, Optional, TextIO, Tuple
+import numpy as np
+from .models import MINUTES_PER_DAY, ScheduleMatrix, split_offset
+from .sweep import UtilizationSweep
+from .allocator import Allocation
+
+if TYPE_CHECKING:
+    from .scenarios import ScenarioResult
+    from .schemas import HourlyStat
+    from .smoothing import Smoothing
+
+# Write buffer for output files
+BUFFER_SIZE = 1 << 20
+
 
 class Formatter:
+    """Render schedules as text, JSON or CSV.
+
+    Every writer streams slot by slot to `out` (stdout by default) or a buffered file. A
+    `ScheduleMatrix` is read straight from its cells, with each customer name formatted once
+    per output, so nothing proportional to the whole output is built in memory.
+    """
+
     @staticmethod
-    def print_text(schedule: List[HourlyStat]):
-        for slot in schedule:
-            hour_str = f"{slot.hour:02d}:00"
-            
-            # We preserve insertion order for determinism
-            breakdown_parts = [f"{k}={v}" for k, v in slot.breakdown.items()]
-            breakdown_str = ", ".join(breakdown_parts)
-            
-            if breakdown_str:
-                line = f"{hour_str} total={slot.total_agents}; {breakdown_str}"
-            else:
-                line = f"{hour_str} total=0; none"
-                
-            print(line)
+    def print_text(schedule: List[HourlyStat], out: Optional[TextIO] = None):
+        Formatter._write_text(out or sys.stdout, schedule)
+
+    @staticmethod
+    def print_json(schedule: List[HourlyStat], out: Optional[TextIO] = None):
+        # Same bytes as print(json.dumps(entries, indent=2))
+        out = out or sys.stdout
+        Formatter._write_json_entries(out, schedule)
+        out.write("\n")
+
+    @staticmethod
+    def print_allocation_text(allocation: Allocation, out: Optional[TextIO] = None):
+        # The allocated schedule, then only the slots where someone is short
+        out = out or sys.stdout
+        Formatter._write_text(out, allocation.allocated)
+        short = allocation.shortfall.totals.any()
+        out.write("shortfall:\n" if short else "shortfall: none\n")
+        Formatter._write_text(out, allocation.shortfall, skip_empty=True)
+
+    @staticmethod
+    def print_allocation_json(allocation: Allocation, out: Optional[TextIO] = None):
+        out = out or sys.stdout
+        out.write('{\n  "allocated": ')
+        Formatter._write_json_entries(out, allocation.allocated, indent="  ")
+        out.write(',\n  "shortfall": ')
+        Formatter._write_json_entries(out, allocation.shortfall, indent="  ", skip_empty=True)
+        out.write("\n}\n")
+
+    @staticmethod
+    def save_allocation_csv(allocation: Allocation, output: Optional[str] = None,
+                            customers: Optional[Iterable[str]] = None) -> Tuple[Path, Path]:
+        """Save the allocated schedule like `save_csv`, and the shortfall next to it.
+
+        The shortfall goes to `<output>_shortfall.csv`, or to a timestamped `shortfall_` file.
+        Returns both paths.
+        """
+        allocated_file = Formatter.save_csv(allocation.allocated, output=output, customers=customers)
+        shortfall_output = None
+        if output:
+            path = Path(output)
+            shortfall_output = str(path.with_name(f"{path.stem}_shortfall{path.suffix or '.csv'}"))
+        shortfall_file = Formatter.save_csv(allocation.shortfall, output=shortfall_output, customers=customers,
+                                            prefix="shortfall")
+        return allocated_file, shortfall_file
+
+    @staticmethod
+    def print_smoothing_text(smoothing: Smoothing, out: Optional[TextIO] = None):
+        # The schedule before and after, the moves made, and how the peak changed
+        out = out or sys.stdout
+        out.write("before:\n")
+        Formatter._write_text(out, smoothing.before)
+        out.write("after:\n")
+        Formatter._write_text(out, smoothing.after)
+        out.write("moves:\n" if smoothing.moves else "moves: none\n")
+        for move in smoothing.moves:
+            out.write(f"{move.customer} (priority {move.priority}): shift {move.shift_minutes:+d} min, "
+                      f"stretch +{move.stretch_minutes} min\n")
+        (before, before_at), (after, after_at) = (Formatter._peak(smoothing.before), Formatter._peak(smoothing.after))
+        out.write(f"peak: {before} at {before_at} -> {after} at {after_at}\n")
+
+    @staticmethod
+    def print_smoothing_json(smoothing: Smoothing, out: Optional[TextIO] = None):
+        out = out or sys.stdout
+        (before, before_at), (after, after_at) = (Formatter._peak(smoothing.before), Formatter._peak(smoothing.after))
+        peaks = {"peak_before": before, "peak_before_at": before_at, "peak_after": after, "peak_after_at": after_at}
+        out.write("{\n" + "".join(f"  {json.dumps(key)}: {json.dumps(value)},\n" for key, value in peaks.items()))
+        moves = [{"customer": move.customer, "priority": move.priority, "shift_minutes": move.shift_minutes,
+                  "stretch_minutes": move.stretch_minutes} for move in smoothing.moves]
+        out.write('  "moves": ' + json.dumps(moves, indent=2).replace("\n", "\n  "))
+        out.write(',\n  "before": ')
+        Formatter._write_json_entries(out, smoothing.before, indent="  ")
+        out.write(',\n  "after": ')
+        Formatter._write_json_entries(out, smoothing.after, indent="  ")
+        out.write("\n}\n")
+
+    @staticmethod
+    def save_smoothing_csv(smoothing: Smoothing, output: Optional[str] = None) -> Tuple[Path, Path, Path]:
+        """Save the smoothed schedule like `save_csv`, and the schedule before and the moves next to it.
+
+        They go to `<output>_before.csv` and `<output>_moves.csv`, or to timestamped
+        `before_` and `moves_` files. Returns the three paths.
+        """
+        after_file = Formatter.save_csv(smoothing.after, output=output)
+        before_output = moves_output = None
+        if output:
+            path = Path(output)
+            before_output = str(path.with_name(f"{path.stem}_before{path.suffix or '.csv'}"))
+            moves_output = str(path.with_name(f"{path.stem}_moves{path.suffix or '.csv'}"))
+        before_file = Formatter.save_csv(smoothing.before, output=before_output, prefix="before")
+        moves_file = Formatter._output_path(moves_output, "moves")
+        with open(moves_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['customer', 'priority', 'shift_minutes', 'stretch_minutes'])
+            for move in smoothing.moves:
+                writer.writerow([move.customer, move.priority, move.shift_minutes, move.stretch_minutes])
+
+        print(f"CSV output saved to {moves_file}")
+        return after_file, before_file, moves_file
+
+    @staticmethod
+    def print_sweep_text(sweep: UtilizationSweep, out: Optional[TextIO] = None):
+        out = out or sys.stdout
+        labels = [f"{label}=" for label in Formatter._sweep_labels(sweep)]
+        for utilization, row in zip(sweep.utilizations, sweep.totals):
+            totals = row.tolist()
+            hours_str = ", ".join([label + str(total) for label, total in zip(labels, totals)])
+            out.write(f"utilization={utilization} peak={max(totals)}; {hours_str}\n")
+
+    @staticmethod
+    def print_sweep_json(sweep: UtilizationSweep, out: Optional[TextIO] = None):
+        # Same bytes as print(json.dumps(entries, indent=2)), written a utilization at a time
+        entries = ({"utilization": utilization, "hourly_totals": row.tolist()}
+                   for utilization, row in zip(sweep.utilizations, sweep.totals))
+        Formatter._write_json_list(out or sys.stdout, entries)
+
+    @staticmethod
+    def save_sweep_csv(sweep: UtilizationSweep, output: Optional[str] = None) -> Path:
+        """Save a utilization x slot table of total agents as CSV.
+
+        Paths are chosen like in `save_csv`, with a `sweep_` prefix for timestamped files.
+        """
+        output_file = Formatter._output_path(output, "sweep")
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['utilization'] + Formatter._sweep_labels(sweep))
+            for utilization, totals in zip(sweep.utilizations, sweep.totals.tolist()):
+                writer.writerow([utilization] + totals)
+
+        print(f"CSV output saved to {output_file}")
+        return output_file
+
+    @staticmethod
+    def print_scenarios_text(results: List[ScenarioResult], out: Optional[TextIO] = None):
+        """Print one line per scenario, compared with the first (the baseline)."""
+        out = out or sys.stdout
+        for row in Formatter._scenario_rows(results):
+            name, utilization, peak, peak_at, hours, peak_change, hours_change = row
+            out.write(f"{name}: utilization={utilization} peak={peak} at {peak_at} agent_hours={hours:g} "
+                      f"({peak_change:+d} peak, {hours_change:+g} agent hours)\n")
+
+    @staticmethod
+    def print_scenarios_json(results: List[ScenarioResult], out: Optional[TextIO] = None):
+        # Same bytes as print(json.dumps(entries, indent=2)), written a scenario at a time
+        entries = ({
+            "scenario": result.name,
+            "utilization": result.utilization,
+            "peak_agents": row[2],
+            "peak_at": row[3],
+            "agent_hours": row[4],
+            "peak_change": row[5],
+            "agent_hours_change": row[6],
+            "hourly_totals": result.totals.tolist()
+        } for result, row in zip(results, Formatter._scenario_rows(results)))
+        Formatter._write_json_list(out or sys.stdout, entries)
 
     @staticmethod
-    def print_json(schedule: List[HourlyStat]):
-        output = []
-        for slot in schedule:
-            output.append({
-                "hour": slot.hour,
-                "total_agents": slot.total_agents,
-                "breakdown": slot.breakdown
-            })
-        print(json.dumps(output, indent=2))
+    def save_scenarios_csv(results: List[ScenarioResult], output: Optional[str] = None) -> Path:
+        """Save the scenario comparison table as CSV.
+
+        Paths are chosen like in `save_csv`, with a `scenarios_` prefix for timestamped files.
+        """
+        output_file = Formatter._output_path(output, "scenarios")
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['scenario', 'utilization', 'peak_agents', 'peak_at', 'agent_hours',
+                             'peak_change', 'agent_hours_change'])
+            writer.writerows(Formatter._scenario_rows(results))
+
+        print(f"CSV output saved to {output_file}")
+        return output_file
 
     @staticmethod
-    def save_csv(schedule: List[HourlyStat], output: Optional[str] = None):
-        """Save schedule as CSV.
+    def save_csv(schedule: List[HourlyStat], output: Optional[str] = None, customers: Optional[Iterable[str]] = None,
+                 prefix: str = "schedule") -> Path:
+        """Save schedule as CSV and return its path.
 
         If `output` is provided, write to that exact path. Otherwise create `outputs/` and
-        write a timestamped file there.
+        write a timestamped file there. Passing the known `customers` (e.g. `Scheduler.customers`)
+        skips the extra walk over the schedule that would otherwise collect them.
         """
-        # Get all unique customer names from breakdown
-        all_customers = set()
-        for slot in schedule:
-            all_customers.update(slot.breakdown.keys())
-        all_customers = sorted(all_customers)
+        if customers is None:
+            if isinstance(schedule, ScheduleMatrix):
+                customers = schedule.active_customers()
+            else:
+                # Get all unique customer names from breakdown
+                customers = set()
+                for slot in schedule:
+                    customers.update(slot.breakdown.keys())
+        output_file = Formatter._output_path(output, prefix)
+
+        # Write CSV
+        with open(output_file, 'w', newline='', buffering=BUFFER_SIZE) as f:
+            Formatter.write_csv(schedule, f, customers)
+
+        print(f"CSV output saved to {output_file}")
+        return output_file
+
+    @staticmethod
+    def write_csv(schedule: List[HourlyStat], out: TextIO, customers: Iterable[str]):
+        """Write the CSV of `save_csv` to an open stream (opened with newline='' for files)."""
+        all_customers = sorted(customers)
+        writer = csv.writer(out)
+        writer.writerow(['hour', 'total_agents'] + all_customers)
+        writer.writerows(Formatter._csv_rows(schedule, all_customers))
 
+    @staticmethod
+    def _output_path(output: Optional[str], prefix: str, suffix: str = ".csv") -> Path:
         if output:
             output_file = Path(output)
             output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -55,22 +244,131 @@ class Formatter:
             output_dir.mkdir(exist_ok=True)
             # Generate filename with timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = output_dir / f"schedule_{timestamp}.csv"
+            output_file = output_dir / f"{prefix}_{timestamp}{suffix}"
+        return output_file
 
-        # Write CSV
-        with open(output_file, 'w', newline='') as f:
-            fieldnames = ['hour', 'total_agents'] + all_customers
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+    @staticmethod
+    def _write_text(out: TextIO, schedule: List[HourlyStat], skip_empty: bool = False):
+        multi_day = getattr(schedule, "days", 1) > 1
+        for day, hour, minute, total, names, values in Formatter._breakdowns(schedule, lambda name: f"{name}="):
+            if skip_empty and not total:
+                continue
+            hour_str = Formatter._slot_label(day, hour, minute, multi_day)
+            # We preserve insertion order for determinism
+            if names:
+                out.write(f"{hour_str} total={total}; {', '.join([name + str(value) for name, value in zip(names, values)])}\n")
+            else:
+                out.write(f"{hour_str} total=0; none\n")
+
+    @staticmethod
+    def _write_json_entries(out: TextIO, schedule: List[HourlyStat], indent: str = "", skip_empty: bool = False):
+        # Writes the entry list exactly as json.dumps(..., indent=2) would, nested at `indent`.
+        # Hourly schedules keep the original shape; finer ones also say where in the hour a slot
+        # starts, and longer horizons which day it is on
+        sub_hourly = getattr(schedule, "resolution", 60) < 60
+        multi_day = getattr(schedule, "days", 1) > 1
+        entry_indent, field_indent, item_indent = indent + "  ", indent + "    ", indent + "      "
+        field_sep, item_sep = f",\n{field_indent}", f",\n{item_indent}"
+        empty = True
+        for day, hour, minute, total, names, values in Formatter._breakdowns(schedule, lambda name: json.dumps(name) + ": "):
+            if skip_empty and not total:
+                continue
+            out.write("[\n" if empty else ",\n")
+            empty = False
+            fields = [f'"day": {day}'] if multi_day else []
+            fields.append(f'"hour": {hour}')
+            if sub_hourly:
+                fields.append(f'"minute": {minute}')
+            fields.append(f'"total_agents": {total}')
+            if names:
+                items = item_sep.join([name + str(value) for name, value in zip(names, values)])
+                fields.append(f'"breakdown": {{\n{item_indent}{items}\n{field_indent}}}')
+            else:
+                fields.append('"breakdown": {}')
+            out.write(f"{entry_indent}{{\n{field_indent}{field_sep.join(fields)}\n{entry_indent}}}")
+        out.write("[]" if empty else f"\n{indent}]")
+
+    @staticmethod
+    def _write_json_list(out: TextIO, entries: Iterable[dict]):
+        # Writes the list (and a newline) exactly as json.dumps(list(entries), indent=2) would,
+        # holding one entry at a time; escaped strings never contain a raw newline to re-indent
+        empty = True
+        for entry in entries:
+            out.write("[\n  " if empty else ",\n  ")
+            empty = False
+            out.write(json.dumps(entry, indent=2).replace("\n", "\n  "))
+        out.write("[]\n" if empty else "\n]\n")
+
+    @staticmethod
+    def _breakdowns(schedule: List[HourlyStat], encode: Callable[[str], str]) -> Iterator[Tuple[int, int, int, int, List[str], List[int]]]:
+        """(day, hour, minute, total, encoded names, agents) of every slot, in breakdown order.
 
-            writer.writeheader()
+        For a `ScheduleMatrix` each customer name is encoded once, and breakdowns come from
+        the non-zero cells of a slot instead of a dict per slot.
+        """
+        if not isinstance(schedule, ScheduleMatrix):
             for slot in schedule:
-                row = {
-                    'hour': f"{slot.hour:02d}:00",
-                    'total_agents': slot.total_agents
-                }
-                # Add breakdown for each customer
-                for customer in all_customers:
-                    row[customer] = slot.breakdown.get(customer, 0)
-                writer.writerow(row)
+                yield (slot.day, slot.hour, slot.minute, slot.total_agents,
+                       [encode(name) for name in slot.breakdown], list(slot.breakdown.values()))
+            return
+        encoded = [encode(name) for name in schedule.customer_names]
+        cells, totals = schedule.cells, schedule.totals.tolist()
+        for index in range(schedule.slots):
+            row = cells[index]
+            active = np.flatnonzero(row)
+            day, hour, minute = split_offset(index * schedule.resolution)
+            yield day, hour, minute, totals[index], [encoded[c] for c in active.tolist()], row[active].tolist()
 
-        print(f"CSV output saved to {output_file}")
+    @staticmethod
+    def _csv_rows(schedule: List[HourlyStat], customers: List[str]) -> Iterator[list]:
+        # One [label, total, agents per customer...] row per slot, customers in the given order
+        multi_day = getattr(schedule, "days", 1) > 1
+        if not isinstance(schedule, ScheduleMatrix):
+            for slot in schedule:
+                label = Formatter._slot_label(slot.day, slot.hour, slot.minute, multi_day)
+                yield [label, slot.total_agents] + [slot.breakdown.get(customer, 0) for customer in customers]
+            return
+        columns = [schedule.customer_index(customer) for customer in customers]
+        cells = schedule.cells
+        if None in columns:
+            # Customers the schedule has never seen read from an extra all-zero column
+            cells = np.hstack([cells, np.zeros((schedule.slots, 1), dtype=cells.dtype)])
+            columns = [-1 if column is None else column for column in columns]
+        order = np.asarray(columns, dtype=np.int64)
+        totals = schedule.totals.tolist()
+        for index in range(schedule.slots):
+            day, hour, minute = split_offset(index * schedule.resolution)
+            yield [Formatter._slot_label(day, hour, minute, multi_day), totals[index]] + cells[index, order].tolist()
+
+    @staticmethod
+    def _slot_label(day: int, hour: int, minute: int, multi_day: bool = False) -> str:
+        label = f"{hour:02d}:{minute:02d}"
+        return f"d{day} {label}" if multi_day else label
+
+    @staticmethod
+    def _peak(schedule: ScheduleMatrix) -> Tuple[int, str]:
+        # The peak total and the label of its first slot
+        totals = schedule.totals
+        slot = int(totals.argmax()) if totals.size else 0
+        day, minutes = divmod(slot * schedule.resolution, MINUTES_PER_DAY)
+        return (int(totals[slot]) if totals.size else 0,
+                Formatter._slot_label(day, minutes // 60, minutes % 60, schedule.days > 1))
+
+    @staticmethod
+    def _scenario_rows(results: List[ScenarioResult]) -> Iterator[list]:
+        # scenario, utilization, peak, its first slot, agent hours and the changes from the first result
+        baseline = results[0] if results else None
+        for result in results:
+            day, minutes = divmod(result.peak_slot * result.resolution, MINUTES_PER_DAY)
+            peak_at = Formatter._slot_label(day, minutes // 60, minutes % 60, result.days > 1)
+            yield [result.name, result.utilization, result.peak_agents, peak_at, result.agent_hours,
+                   result.peak_agents - baseline.peak_agents, result.agent_hours - baseline.agent_hours]
+
+    @staticmethod
+    def _sweep_labels(sweep: UtilizationSweep) -> List[str]:
+        labels = []
+        for offset in range(0, sweep.slots * sweep.resolution, sweep.resolution):
+            day, minutes = divmod(offset, MINUTES_PER_DAY)
+            label = f"{minutes // 60:02d}:{minutes % 60:02d}"
+            labels.append(f"d{day} {label}" if sweep.days > 1 else label)
+        return labels
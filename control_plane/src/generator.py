@@ -0,0 +1,174 @@
+import argparse
+import sys
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence, TextIO, Tuple
+import numpy as np
+
+HEADER = "CustomerName, AverageCallDurationSeconds, StartTimePT, EndTimePT, NumberOfCalls, Priority"
+# Rows generated and written per step, so memory stays flat up to tens of millions of rows
+CHUNK_ROWS = 65536
+# Relative weight of each start hour: most windows open during business hours
+START_HOUR_WEIGHTS = np.array([1, 1, 1, 1, 1, 2, 6, 10, 14, 14, 10, 8, 8, 6, 4, 3, 2, 2, 1, 1, 1, 1, 1, 1], dtype=float)
+
+
+def _meridiem(minutes: int, spaced: bool = False, dotted: bool = False) -> str:
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    suffix = ("a.m." if dotted else "AM") if hour < 12 else ("p.m." if dotted else "PM")
+    hour = hour % 12 or 12
+    time = f"{hour}:{minute:02d}" if minute or spaced else str(hour)
+    return f"{time} {suffix}" if spaced or dotted else f"{time}{suffix}"
+
+
+# Time spellings seen in real inputs (see `TimeNormalizer`); each maps minutes after midnight
+# to a string, where 1440 is the end of the day
+TIME_STYLES = {
+    "meridiem": lambda m: _meridiem(m),
+    "spaced": lambda m: _meridiem(m, spaced=True),
+    "dotted": lambda m: _meridiem(m, dotted=True),
+    "24h": lambda m: f"{m // 60 % 24:02d}:{m % 60:02d}",
+    "seconds": lambda m: f"{m // 60 % 24:02d}:{m % 60:02d}:00",
+    "hour": lambda m: str(m // 60),
+}
+# Ways a malformed row is broken, one chosen per row; every one is reported by the parser
+MALFORMED_KINDS = ("short", "duration", "time", "window", "priority", "calls")
+
+
+@dataclass
+class Workload:
+    """Counts of what `WorkloadGenerator.write` produced."""
+    rows: int
+    customers: int
+    malformed: int
+
+
+class WorkloadGenerator:
+    """Seeded generator of synthetic requirement CSVs in the input format.
+
+    The same seed and options always produce the same bytes. Rows share `customers`
+    distinct names (every name appears at least once when there are enough rows, the
+    rest repeat names at random), spell their times in a mix of `time_styles`, start on a
+    quarter hour with probability `sub_hour`, and a `malformed` share of rows is broken in
+    one of the `MALFORMED_KINDS` ways. Rows are produced in chunks, so any size streams
+    to disk in constant memory.
+    """
+
+    def __init__(self, seed: int = 0, customers: Optional[int] = None, malformed: float = 0.0, sub_hour: float = 0.2,
+                 time_styles: Sequence[str] = tuple(TIME_STYLES)):
+        if customers is not None and customers < 1:
+            raise ValueError(f"customers must be at least 1, got {customers}")
+        if not 0 <= malformed <= 1:
+            raise ValueError(f"malformed must be between 0 and 1, got {malformed}")
+        if not 0 <= sub_hour <= 1:
+            raise ValueError(f"sub_hour must be between 0 and 1, got {sub_hour}")
+        unknown = [style for style in time_styles if style not in TIME_STYLES]
+        if unknown or not time_styles:
+            raise ValueError(f"Unknown time styles {unknown}, expected some of {list(TIME_STYLES)}")
+        self.seed = seed
+        self.customers = customers
+        self.malformed = malformed
+        self.sub_hour = sub_hour
+        self.time_styles = list(time_styles)
+        # One lookup table per style: index by minutes after midnight (0-1440)
+        self._times = [[TIME_STYLES[style](m) for m in range(24 * 60 + 1)] for style in self.time_styles]
+
+    def customer_count(self, rows: int) -> int:
+        # One distinct customer per ten rows unless told otherwise
+        return min(rows, self.customers if self.customers is not None else max(1, rows // 10))
+
+    def lines(self, rows: int) -> Iterator[List[str]]:
+        """Yield the data lines (without the header) in chunks of up to `CHUNK_ROWS`."""
+        for lines, _ in self._chunks(rows):
+            yield lines
+
+    def _chunks(self, rows: int) -> Iterator[Tuple[List[str], int]]:
+        # (lines, number of them that are malformed)
+        rng = np.random.default_rng(self.seed)
+        customers = self.customer_count(rows)
+        width = len(str(customers))
+        names = [f"Customer {i:0{width}d}" for i in rng.permutation(customers).tolist()]
+        start_weights = START_HOUR_WEIGHTS / START_HOUR_WEIGHTS.sum()
+        for offset in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - offset)
+            row_index = np.arange(offset, offset + n)
+            # The first `customers` rows name every customer once, the rest repeat them
+            customer = np.where(row_index < customers, row_index, rng.integers(0, customers, size=n))
+            duration = rng.integers(30, 1201, size=n)
+            style = rng.integers(0, len(self.time_styles), size=n)
+            quarter = np.where(rng.random(n) < self.sub_hour, rng.integers(1, 4, size=n) * 15, 0)
+            # The 'hour' style has no minutes
+            if "hour" in self.time_styles:
+                quarter[style == self.time_styles.index("hour")] = 0
+            start = rng.choice(24, size=n, p=start_weights) * 60 + quarter
+            end = np.minimum(start + rng.integers(1, 13, size=n) * 60, 24 * 60)
+            calls = rng.integers(10, 50001, size=n)
+            priority = rng.integers(1, 6, size=n)
+            broken = np.flatnonzero(rng.random(n) < self.malformed)
+            kinds = rng.integers(0, len(MALFORMED_KINDS), size=len(broken))
+
+            times = self._times
+            lines = [
+                f"{names[c]}, {d}, {times[s][a]}, {times[s][b]}, {k}, {p}"
+                for c, d, s, a, b, k, p in zip(customer.tolist(), duration.tolist(), style.tolist(), start.tolist(),
+                                               end.tolist(), calls.tolist(), priority.tolist())
+            ]
+            for i, kind in zip(broken.tolist(), kinds.tolist()):
+                lines[i] = self._break(lines[i], MALFORMED_KINDS[kind], times[style[i]])
+            yield lines, len(broken)
+
+    def write(self, out: TextIO, rows: int) -> Workload:
+        out.write(HEADER + "\n")
+        malformed = 0
+        for lines, broken in self._chunks(rows):
+            out.write("\n".join(lines))
+            out.write("\n")
+            malformed += broken
+        return Workload(rows=rows, customers=self.customer_count(rows), malformed=malformed)
+
+    @staticmethod
+    def _break(line: str, kind: str, times: List[str]) -> str:
+        name, duration, start, end, calls, priority = line.split(", ")
+        if kind == "short":
+            return f"{name}, {duration}, {start}, {end}"
+        if kind == "duration":
+            duration = "abc"
+        elif kind == "time":
+            start = "25PM"
+        elif kind == "window":
+            start, end = times[20 * 60], times[9 * 60]
+        elif kind == "priority":
+            priority = "9"
+        else:
+            calls = "0"
+        return ", ".join((name, duration, start, end, calls, priority))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic requirements CSV")
+    parser.add_argument("--rows", type=int, required=True, help="Number of data rows")
+    parser.add_argument("--output", help="Path to write the CSV to (default: stdout)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same file")
+    parser.add_argument("--customers", type=int, help="Distinct customer names (default: one per ten rows)")
+    parser.add_argument("--malformed", type=float, default=0.0, help="Share of rows to break (0 to 1)")
+    parser.add_argument("--sub-hour", type=float, default=0.2, help="Share of windows starting on a quarter hour")
+    parser.add_argument("--time-styles", default=",".join(TIME_STYLES),
+                        help=f"Comma separated time spellings to mix, from {', '.join(TIME_STYLES)}")
+    args = parser.parse_args()
+    if args.rows < 0:
+        parser.error("--rows must not be negative")
+    try:
+        generator = WorkloadGenerator(args.seed, args.customers, args.malformed, args.sub_hour,
+                                      args.time_styles.split(","))
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output is None:
+        generator.write(sys.stdout, args.rows)
+        return
+    with open(args.output, "w", newline="") as f:
+        workload = generator.write(f, args.rows)
+    print(f"Wrote {workload.rows} rows ({workload.customers} customers, {workload.malformed} malformed) to {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
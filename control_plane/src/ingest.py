@@ -0,0 +1,214 @@
+import asyncio
+import csv
+import glob
+import gzip
+import io
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+import numpy as np
+from . import metrics
+from .models import RequirementBatch
+from .parser import InputParser, RejectReport
+
+# Data rows handed to a parse worker at a time
+CHUNK_ROWS = 65536
+# Chunks read but not yet scheduled, per worker, when `max_pending` is not given
+PENDING_PER_WORKER = 2
+# A source of "-" is read from stdin
+STDIN = "-"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SourceError(ValueError):
+    """A source that cannot be read: missing, not a CSV with the expected header, or corrupt."""
+
+
+class MultiSourceIngest:
+    """Parses many input sources concurrently into one schedule.
+
+    Sources are CSV files, gzip compressed or not (told apart by their first bytes, so
+    stdin works too), directories (their *.csv and *.csv.gz files) and glob patterns.
+    Every source is read by its own asyncio task, `chunk_rows` lines at a time in a
+    thread; the chunks are parsed in a pool of `workers` processes and handed to
+    `consume` in the order they finish. A reader only reads on once fewer than
+    `max_pending` chunks are read but not yet consumed, so memory stays bounded however
+    many and large the sources are, and the run takes about as long as its largest
+    source (or the scheduling in this process, if that is slower).
+
+    Row numbers and rejected rows are per source, as if each were parsed on its own.
+    Since chunks finish in any order, `customer_names` lists the customers by their first
+    accepted row over the sources in turn, the order the python engine schedules them in
+    when the sources are read one after the other, for `Scheduler.order_customers`.
+    """
+
+    def __init__(self, sources: Sequence[str], allow_wrap: bool = False, workers: Optional[int] = None,
+                 chunk_rows: int = CHUNK_ROWS, max_pending: Optional[int] = None, days: Optional[int] = None):
+        self.sources = self.expand(sources)
+        self.allow_wrap = allow_wrap
+        # Horizon the windows must fit, rejecting longer ones as bad rows (see `InputParser.extract_window`)
+        self.days = days
+        self.workers = max(1, workers if workers is not None else os.cpu_count() or 1)
+        self.chunk_rows = chunk_rows
+        self.max_pending = max(1, max_pending if max_pending is not None else PENDING_PER_WORKER * self.workers)
+        self.customer_names: List[str] = []
+        self.rows = 0
+        self.rejected = 0
+        # Most chunks read but not yet consumed at once over the run
+        self.peak_pending = 0
+        self._pending = 0
+        # (source index, first row) -> customers with rows in that chunk, by their first row
+        self._chunk_names: Dict[Tuple[int, int], List[str]] = {}
+
+    @staticmethod
+    def expand(sources: Sequence[str]) -> List[str]:
+        """Files of `sources`, with directories and glob patterns expanded (each sorted) and duplicates dropped."""
+        paths = []
+        for source in sources:
+            if source == STDIN:
+                paths.append(source)
+            elif Path(source).is_dir():
+                directory = Path(source)
+                paths.extend(sorted(str(path) for pattern in ("*.csv", "*.csv.gz")
+                                    for path in directory.glob(pattern) if path.is_file()))
+            elif glob.has_magic(source):
+                matches = sorted(path for path in glob.glob(source) if Path(path).is_file())
+                if not matches:
+                    raise SourceError(f"No files match {source}")
+                paths.extend(matches)
+            elif Path(source).is_file():
+                paths.append(source)
+            else:
+                raise SourceError(f"File {source} not found.")
+        return list(dict.fromkeys(paths))
+
+    def run(self, consume: Callable[[RequirementBatch], None]):
+        """Parse every source and pass each chunk's validated batch to `consume`; raises `SourceError`."""
+        with ProcessPoolExecutor(self.workers) as pool:
+            # Start the workers (all at once where they are forked) before any reader thread
+            # exists: a child forked while another thread holds a lock can hang on it
+            pool.submit(int).result()
+            try:
+                asyncio.run(self._run(pool, consume))
+            finally:
+                pool.shutdown(cancel_futures=True)
+        chunks = (self._chunk_names[key] for key in sorted(self._chunk_names))
+        self.customer_names = list(dict.fromkeys(name for names in chunks for name in names))
+
+    async def _run(self, pool: Executor, consume: Callable[[RequirementBatch], None]):
+        pending = asyncio.Semaphore(self.max_pending)
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                for index, source in enumerate(self.sources):
+                    tasks.create_task(self._read(index, source, pool, pending, tasks, consume))
+        except BaseExceptionGroup as group:
+            # The first failure cancelled the other tasks; report it like a sequential parse would
+            raise group.exceptions[0] from None
+
+    async def _read(self, index: int, source: str, pool: Executor, pending: asyncio.Semaphore,
+                    tasks: asyncio.TaskGroup, consume: Callable[[RequirementBatch], None]):
+        try:
+            f, raw = await asyncio.to_thread(_open, source)
+        except OSError as e:
+            raise SourceError(f"{source}: {e}") from None
+        try:
+            header, _ = await asyncio.to_thread(_read_chunk, source, f, 1)
+            try:
+                InputParser.validate_columns(next(csv.reader([header]), None) if header else None)
+            except ValueError as e:
+                raise SourceError(f"{source}: {e}") from None
+            first_row = 0
+            while True:
+                await pending.acquire()
+                text, rows = await asyncio.to_thread(_read_chunk, source, f, self.chunk_rows)
+                if not rows:
+                    pending.release()
+                    break
+                self._pending += 1
+                self.peak_pending = max(self.peak_pending, self._pending)
+                tasks.create_task(self._parse(index, source, header + text, first_row, rows, pool, pending, consume))
+                first_row += rows
+        finally:
+            if source != STDIN:
+                f.close()
+                raw.close()
+
+    async def _parse(self, index: int, source: str, text: str, first_row: int, rows: int, pool: Executor,
+                     pending: asyncio.Semaphore, consume: Callable[[RequirementBatch], None]):
+        # Parse one chunk (`text` starts with the header) in the pool, then schedule it here
+        try:
+            loop = asyncio.get_running_loop()
+            batch, names, rejected = await loop.run_in_executor(pool, _parse_chunk, text, first_row,
+                                                                  self.allow_wrap, self.days)
+            self._report(source, rows, rejected)
+            self._chunk_names[(index, first_row)] = names
+            consume(batch)
+        finally:
+            self._pending -= 1
+            pending.release()
+
+    def _report(self, source: str, rows: int, rejected: List[Tuple[int, Optional[str]]]):
+        self.rows += rows
+        self.rejected += len(rejected)
+        run_metrics = metrics.current()
+        if run_metrics is not None:
+            run_metrics.count("rows_read", rows)
+            run_metrics.count("rows_rejected", len(rejected))
+        if not rejected:
+            return
+        report = RejectReport(source=source)
+        for row_idx, error in sorted(rejected):
+            if error is None:
+                report.skipped(row_idx)
+            else:
+                report.error(row_idx, error)
+        report.flush()
+
+
+class _Collected:
+    # Keeps the rows a worker's parse rejects, numbered within the source, to report them in the main process
+    def __init__(self, first_row: int):
+        self.first_row = first_row
+        self.rows: List[Tuple[int, Optional[str]]] = []
+
+    def reject(self, row_idx: int, error: Optional[str], row: Optional[List[str]] = None):
+        self.rows.append((self.first_row + row_idx, error))
+
+    def flush(self):
+        # The rows are reported together once the parse is done
+        pass
+
+
+def _parse_chunk(text: str, first_row: int, allow_wrap: bool,
+                 days: Optional[int]) -> Tuple[RequirementBatch, List[str], List[Tuple[int, Optional[str]]]]:
+    # Runs in a pool worker: (batch, its customers with rows by their first row, rejected rows)
+    rejected = _Collected(first_row)
+    batch = InputParser.parse_csv_batch(io.StringIO(text), allow_wrap=allow_wrap, dead_letters=rejected, days=days)
+    present, first = np.unique(batch.customer_ids, return_index=True)
+    names = [batch.customer_names[c] for c in present[np.argsort(first)].tolist()]
+    return batch, names, rejected.rows
+
+
+def _open(source: str) -> Tuple[TextIO, BinaryIO]:
+    # (text stream, underlying binary stream) of a source, decompressing gzip
+    raw = sys.stdin.buffer if source == STDIN else open(source, "rb")
+    try:
+        stream = gzip.GzipFile(fileobj=raw, mode="rb") if raw.peek(2)[:2] == GZIP_MAGIC else raw
+    except BaseException:
+        raw.close()
+        raise
+    return io.TextIOWrapper(stream, encoding="utf-8-sig"), raw
+
+
+def _read_chunk(source: str, f: TextIO, n: int) -> Tuple[str, int]:
+    # (text, lines) of the next `n` lines of a source; the text always ends its last line
+    try:
+        lines = list(islice(f, n))
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        raise SourceError(f"{source}: {e}") from None
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    return "".join(lines), len(lines)
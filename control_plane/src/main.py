@@ -1,32 +1,667 @@
 import argparse
-from .parser import InputParser
-from .scheduler import Scheduler
-from .formatter import Formatter
+import sys
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Union
+from . import metrics
+
+# Everything below imports numpy (and the row validation pydantic), so those modules are
+# imported where they are used: `--help` and argument errors return without loading them.
+if TYPE_CHECKING:
+    from .cache import CachedSchedule, ScheduleCache
+    from .dead_letters import DeadLetterQueue
+    from .ingest import MultiSourceIngest
+
+# Bucket sizes in minutes; each divides an hour evenly
+RESOLUTIONS = [1, 2, 3, 4, 5, 6, 10, 12, 15, 20, 30, 60]
+# Copies of Scheduler.ENGINES, ScheduleMatrix.FOLDS and ColumnarStore.FORMATS for the
+# argument choices (tests/test_startup.py keeps them in step)
+ENGINES = ("python", "numpy")
+FOLDS = ("sum", "max")
+COLUMNAR_FORMATS = ("parquet", "arrow", "npy")
+# Functions listed after a --profile run
+PROFILE_TOP = 25
+
+
+def utilization_arg(value: str):
+    # A single utilization, or a start:stop:step range for a sweep
+    try:
+        if ":" in value:
+            from .sweep import UtilizationSweep
+            return UtilizationSweep.parse_range(value)
+        return float(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
 def main():
     parser = argparse.ArgumentParser(description="Call Scheduler Control Plane")
-    parser.add_argument("--input", required=True, help="Path to input CSV")
-    parser.add_argument("--utilization", type=float, default=1.0, help="Agent utilization (0.1 to 1.0)") # do validation on the this
-    parser.add_argument("--format", choices=["text", "json", "csv"], default="text", help="Output format")
-    parser.add_argument("--output", help="Path to output CSV file (only used when --format=csv)")
-    
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("--input", help="Path to input CSV (or, with --watch, a directory of them)")
+    inputs.add_argument("--source", action="append",
+                        help="Input CSV (gzip compressed or not), directory of them, glob pattern or - for stdin; "
+                             "repeatable, and all sources are read and parsed concurrently")
+    parser.add_argument("--utilization", type=utilization_arg, default=1.0, help="Agent utilization (0.1 to 1.0), or a start:stop:step range to sweep") # do validation on the this
+    parser.add_argument("--format", choices=["text", "json", "csv"] + list(COLUMNAR_FORMATS), default="text",
+                        help="Output format (parquet and arrow need pyarrow)")
+    parser.add_argument("--output", help="Path to output file (only used when --format is csv, parquet, arrow or npy)")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="Scheduling engine (numpy is vectorized)")
+    parser.add_argument("--resolution", type=int, choices=RESOLUTIONS, default=60, help="Minutes per schedule bucket")
+    parser.add_argument("--days", type=int, default=1, help="Length of the schedule horizon in days (7 for a weekly plan)")
+    parser.add_argument("--wrap", action="store_true", help="Read an end time before the start time as the next day (e.g. 10PM-6AM)")
+    parser.add_argument("--fold", choices=FOLDS, help="Fold a multi-day horizon into one day by summing or taking the peak of each slot")
+    parser.add_argument("--service-level", type=float, help="Staff each hour with Erlang C for this share of calls answered in time (e.g. 0.8)")
+    parser.add_argument("--answer-time", type=float, default=20, help="Target answer time in seconds for --service-level")
+    parser.add_argument("--pooled", action="store_true", help="With --service-level, staff the pooled traffic of all customers per hour")
+    parser.add_argument("--capacity", type=int, help="Agents available per slot; shares them out by priority and reports the shortfall")
+    parser.add_argument("--stream", action="store_true", help="Stream rows from the input instead of loading them all first")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="Merge rows with the same customer, window, duration and priority before scheduling, summing their calls")
+    parser.add_argument("--cache-dir", help="Cache parsed requirements in this directory, keyed by the input's content")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="Size cap of --cache-dir; least recently used entries go first")
+    parser.add_argument("--cache-schedule", action="store_true", help="Also cache finished schedules in --cache-dir")
+    parser.add_argument("--report-rss", action="store_true", help="Print peak resident memory to stderr when done")
+    parser.add_argument("--metrics-out", help="Write per-stage timings and row counters of this run to this file")
+    parser.add_argument("--metrics-format", choices=metrics.FORMATS, default="json", help="Format of --metrics-out")
+    parser.add_argument("--profile", help="Profile the run with cProfile, save the stats to this file and list the hottest functions")
+    parser.add_argument("--dlq", help="Write rejected rows (row number, error, original fields) to this CSV instead of printing each one")
+    parser.add_argument("--replay", action="append", default=[],
+                        help="Corrected dead letter file whose rows replace the input's rows with the same numbers; repeatable")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running: apply each change of --input (a file or a directory of CSVs) to the schedule and write the output again")
+    parser.add_argument("--watch-interval", type=float, default=1.0, help="Seconds between checks of --watch")
+    parser.add_argument("--debounce", type=float, default=0.5,
+                        help="With --watch, wait until the input has not changed for this many seconds before applying a change")
+    parser.add_argument("--shards", type=int,
+                        help="Split the requirements into this many shards and schedule them in parallel processes")
+    parser.add_argument("--scenarios",
+                        help="Evaluate the what-if scenarios of this JSON file against the input and compare their peaks")
+    parser.add_argument("--smooth",
+                        help="Move the windows of the flexible customers listed in this JSON file to lower the peak, "
+                             "and report the moves")
+    parser.add_argument("--workers", type=int,
+                        help="Processes parsing --source chunks, scheduling --shards or evaluating --scenarios "
+                             "(default: one per CPU)")
+
     args = parser.parse_args()
+    if args.days < 1:
+        parser.error("--days must be at least 1")
+    if args.capacity is not None and args.capacity < 0:
+        parser.error("--capacity must not be negative")
+    if args.cache_max_mb <= 0:
+        parser.error("--cache-max-mb must be positive")
+    if args.cache_schedule and not args.cache_dir:
+        parser.error("--cache-schedule needs --cache-dir")
+    if args.source:
+        for flag in ("stream", "aggregate", "cache_dir", "replay", "dlq", "watch"):
+            if getattr(args, flag):
+                parser.error(f"--source cannot be combined with --{flag.replace('_', '-')}; use --input")
+    if args.shards is not None:
+        if args.shards < 1:
+            parser.error("--shards must be at least 1")
+        if isinstance(args.utilization, list):
+            parser.error("--shards cannot be combined with a utilization range")
+        for flag in ("stream", "source", "watch"):
+            if getattr(args, flag):
+                parser.error(f"--shards cannot be combined with --{flag}")
+    if args.scenarios:
+        if isinstance(args.utilization, list):
+            parser.error("--scenarios cannot be combined with a utilization range")
+        for flag in ("capacity", "fold", "stream", "watch", "source", "shards"):
+            if getattr(args, flag):
+                parser.error(f"--scenarios cannot be combined with --{flag}")
+        if args.format in COLUMNAR_FORMATS:
+            parser.error(f"--format {args.format} cannot be combined with --scenarios")
+    if args.smooth:
+        if isinstance(args.utilization, list):
+            parser.error("--smooth cannot be combined with a utilization range")
+        for flag in ("capacity", "fold", "stream", "watch", "source", "shards", "scenarios", "pooled"):
+            if getattr(args, flag):
+                parser.error(f"--smooth cannot be combined with --{flag}")
+        if args.format in COLUMNAR_FORMATS:
+            parser.error(f"--format {args.format} cannot be combined with --smooth")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.replay and args.cache_dir:
+        parser.error("--replay cannot be combined with --cache-dir")
+    if args.watch:
+        if isinstance(args.utilization, list):
+            parser.error("--watch cannot be combined with a utilization range")
+        for flag in ("stream", "aggregate", "cache_dir", "replay", "dlq"):
+            if getattr(args, flag):
+                parser.error(f"--watch cannot be combined with --{flag.replace('_', '-')}")
+        if args.watch_interval <= 0 or args.debounce < 0:
+            parser.error("--watch-interval must be positive and --debounce not negative")
+        if not Path(args.input).exists():
+            parser.error(f"File {args.input} not found.")
+    if args.dlq and any(Path(args.dlq).resolve() == Path(path).resolve() for path in [args.input] + args.replay):
+        parser.error("--dlq must not overwrite --input or a --replay file")
+    if args.format in ("parquet", "arrow"):
+        # Fail before scheduling when the optional dependency is missing
+        from .columnar import ColumnarStore
+        try:
+            ColumnarStore.require_pyarrow(args.format)
+        except ValueError as e:
+            parser.error(str(e))
+
+    erlang = None
+    if args.service_level is not None:
+        from .erlang import ErlangC
+        try:
+            erlang = ErlangC(args.service_level, args.answer_time, pooled=args.pooled)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.pooled:
+        parser.error("--pooled needs --service-level")
+    if args.pooled and args.capacity is not None:
+        # The allocator shares out per-customer demand, which pooled staffing does not have
+        parser.error("--capacity cannot be combined with --pooled")
+
+    if isinstance(args.utilization, list):
+        if args.capacity is not None or erlang is not None:
+            parser.error("--capacity and --service-level cannot be combined with a utilization range")
+        if args.format in COLUMNAR_FORMATS:
+            parser.error(f"--format {args.format} cannot be combined with a utilization range")
+
+    run_metrics = None
+    if args.metrics_out:
+        run_metrics = metrics.Metrics(engine=args.engine, format=args.format, input=args.input or ",".join(args.source),
+                                      stream=args.stream)
+    try:
+        with profiled(args.profile), run_metrics.activate() if run_metrics is not None else nullcontext(), \
+                dead_letter_queue(args) as dead_letters:
+            if args.watch:
+                run_watch(args, erlang)
+            elif args.scenarios:
+                run_scenarios(args, erlang, dead_letters)
+            elif args.smooth:
+                run_smoothing(args, erlang, dead_letters)
+            elif isinstance(args.utilization, list):
+                run_sweep(args, dead_letters)
+            else:
+                run(args, erlang, dead_letters)
+    finally:
+        # Also on a failed run: the counters say how far it got
+        if run_metrics is not None:
+            run_metrics.set_gauge("peak_rss_bytes", int(peak_rss_mb() * 1024 * 1024))
+            run_metrics.save(args.metrics_out, args.metrics_format)
+
+
+def run(args, erlang, dead_letters=None):
+    result = run_schedule(args, erlang, schedule_cache(args), dead_letters)
+    write_output(args, result)
+
+
+def run_watch(args, erlang):
+    # Schedule the input, then keep the schedule and the output in step with its changes
+    from termcolor import colored
+    from .cache import CachedSchedule
+    from .scheduler import Scheduler
+    from .watch import InputWatcher
+    scheduler = Scheduler(utilization=args.utilization, engine=args.engine, resolution=args.resolution,
+                          days=args.days, erlang=erlang, by_priority=args.capacity is not None)
+    watcher = InputWatcher(args.input, scheduler, allow_wrap=args.wrap)
+
+    def emit():
+        result = CachedSchedule(scheduler.schedule, scheduler.priorities,
+                                scheduler.pooled_schedule() if args.pooled else None,
+                                levels=scheduler.priority_schedules)
+        write_output(args, result)
+        sys.stdout.flush()
+
+    # Files that cannot be scheduled (e.g. a window longer than --days) are reported and
+    # skipped, here and on every later change
+    with metrics.stage("schedule"):
+        watcher.update()
+        scheduler.schedule.cells
+    emit()
+    print(colored(f"Watching {args.input} for changes (Ctrl+C to stop)", 'green'), file=sys.stderr)
+    try:
+        watcher.watch(emit, interval=args.watch_interval, debounce=args.debounce)
+    except KeyboardInterrupt:
+        pass
+
+
+def write_output(args, result: "CachedSchedule"):
+    from .allocator import Allocation, CapacityAllocator
+    from .columnar import ColumnarStore
+    from .formatter import Formatter
+    customers = result.schedule.active_customers()
+    schedule = result.pooled if args.pooled else result.schedule
+    if args.fold:
+        schedule = schedule.fold(args.fold)
+
+    if args.capacity is not None:
+        with metrics.stage("allocate"):
+            allocation = CapacityAllocator(args.capacity).allocate(result.schedule, result.priorities, result.levels)
+            if args.fold:
+                allocation = Allocation(allocation.allocated.fold(args.fold), allocation.shortfall.fold(args.fold))
+        with metrics.stage("output"), counted_output() as written:
+            if args.format == "json":
+                Formatter.print_allocation_json(allocation)
+            elif args.format == "csv":
+                written += Formatter.save_allocation_csv(allocation, output=args.output, customers=customers)
+            elif args.format in ColumnarStore.FORMATS:
+                written.append(ColumnarStore.save(allocation.allocated, args.format, output=args.output,
+                                                  customers=customers))
+                shortfall_output = None
+                if args.output:
+                    path = Path(args.output)
+                    shortfall_output = str(path.with_name(f"{path.stem}_shortfall{path.suffix}"))
+                written.append(ColumnarStore.save(allocation.shortfall, args.format, output=shortfall_output,
+                                                  customers=customers, prefix="shortfall"))
+            else:
+                Formatter.print_allocation_text(allocation)
+        report_rss(args)
+        return
 
-    # 1. Parse
-    requirements = InputParser.parse_csv(args.input)
-    
-    # 2. Schedule
-    scheduler = Scheduler(utilization=args.utilization)
-    scheduler.process_requirements(requirements)
-    
     # 3. Output
-    if args.format == "json":
-        Formatter.print_json(scheduler.schedule)
-    elif args.format == "csv":
-        Formatter.save_csv(scheduler.schedule, output=args.output)
-    else:
-        Formatter.print_text(scheduler.schedule)
+    with metrics.stage("output"), counted_output() as written:
+        if args.format == "json":
+            Formatter.print_json(schedule)
+        elif args.format == "csv":
+            written.append(Formatter.save_csv(schedule, output=args.output, customers=customers))
+        elif args.format in ColumnarStore.FORMATS:
+            written.append(ColumnarStore.save(schedule, args.format, output=args.output, customers=customers))
+        else:
+            Formatter.print_text(schedule)
+
+    report_rss(args)
+
+
+def run_schedule(args, erlang, cache, dead_letters: Optional["DeadLetterQueue"] = None) -> "CachedSchedule":
+    # The finished schedule, straight from the cache when this input was already scheduled with these options
+    from .cache import CachedSchedule, ScheduleCache
+    from .parser import InputParser
+    from .scheduler import Scheduler
+    if args.source:
+        return ingest_schedule(args, erlang)
+    digest = input_digest(args.input) if cache is not None else None
+    key = None
+    if cache is not None and args.cache_schedule:
+        key = ScheduleCache.schedule_key(digest, args.wrap, args.utilization, args.resolution, args.days,
+                                         args.service_level, args.answer_time, args.pooled, args.aggregate,
+                                         args.capacity is not None, parse_engine(args))
+        with metrics.stage("schedule"):
+            cached = cache.load_schedule(key)
+        if cached is not None:
+            InputParser.report_errors(cached.errors, dead_letters)
+            return cached
+
+    # 1. Parse (lazily when streaming: rows are consumed while scheduling).
+    # The numpy engine reads columnar batches and skips the per-row pydantic models.
+    # With --stream nothing is read yet, and the parse is timed as part of the schedule stage
+    batches, errors = load_batches(args, Scheduler.CHUNK_SIZE, dead_letters, cache, digest)
+
+    # 2. Schedule
+    with metrics.stage("schedule"):
+        scheduler = Scheduler(utilization=args.utilization, engine=args.engine, resolution=args.resolution,
+                              days=args.days, erlang=erlang, by_priority=args.capacity is not None)
+        try:
+            for requirements in batches:
+                if args.shards:
+                    scheduler.process_sharded(requirements, args.shards, args.workers)
+                else:
+                    scheduler.process_requirements(requirements)
+        except ValueError as e:
+            # A window longer than the horizon (e.g. several days into a one day schedule)
+            print(f"Error: {e}; pass a longer --days", file=sys.stderr)
+            sys.exit(1)
+        result = CachedSchedule(scheduler.schedule, scheduler.priorities,
+                                scheduler.pooled_schedule() if args.pooled else None, errors,
+                                scheduler.priority_schedules)
+        # Run the lazy prefix sums here rather than in the output stage
+        result.schedule.cells
+    if key is not None:
+        cache.store_schedule(key, result)
+    return result
+
+
+def ingest_schedule(args, erlang) -> "CachedSchedule":
+    # Schedule every --source, parsed concurrently; the parse is timed as part of the schedule stage
+    from .cache import CachedSchedule
+    from .scheduler import Scheduler
+    scheduler = Scheduler(utilization=args.utilization, engine=args.engine, resolution=args.resolution,
+                          days=args.days, erlang=erlang, by_priority=args.capacity is not None)
+    with metrics.stage("schedule"):
+        ingested = ingest(args, scheduler.process_requirements)
+        # Chunks were scheduled as they finished; the columns follow the sources instead
+        scheduler.order_customers(ingested.customer_names)
+        result = CachedSchedule(scheduler.schedule, scheduler.priorities,
+                                scheduler.pooled_schedule() if args.pooled else None,
+                                levels=scheduler.priority_schedules)
+        result.schedule.cells
+    return result
+
+
+def ingest(args, consume) -> "MultiSourceIngest":
+    """Parse every --source concurrently into `consume`, exiting on a source that cannot be read."""
+    from .ingest import MultiSourceIngest, SourceError
+    try:
+        ingested = MultiSourceIngest(args.source, allow_wrap=args.wrap, workers=args.workers, days=args.days)
+        ingested.run(consume)
+    except SourceError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}; pass a longer --days", file=sys.stderr)
+        sys.exit(1)
+    run_metrics = metrics.current()
+    if run_metrics is not None:
+        run_metrics.set_gauge("sources", len(ingested.sources))
+        run_metrics.set_gauge("peak_pending_chunks", ingested.peak_pending)
+    return ingested
+
+
+def schedule_cache(args) -> Optional["ScheduleCache"]:
+    # The --cache-dir cache of parsed requirements and schedules, if any
+    from .cache import ScheduleCache
+    return ScheduleCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+
+
+def load_batches(args, chunk_size: int, dead_letters: Optional["DeadLetterQueue"] = None,
+                 cache: Optional["ScheduleCache"] = None, digest: Optional[str] = None):
+    """(requirement batches, row errors) of the input, timed as the parse and aggregate stages.
+
+    Goes through the --cache-dir cache (opened here unless `cache` is given) and, with
+    --aggregate, merges the batches into one of distinct groups.
+    """
+    if cache is None:
+        cache = schedule_cache(args)
+    if cache is not None and digest is None:
+        digest = input_digest(args.input)
+    with metrics.stage("parse"):
+        batches, errors = parse_input(args, cache, digest, chunk_size, dead_letters)
+    if args.aggregate:
+        with metrics.stage("aggregate"):
+            batches = [aggregate_input(batches, chunk_size)]
+    return batches, errors
+
+
+def parse_input(args, cache, digest, chunk_size, dead_letters: Optional["DeadLetterQueue"] = None):
+    """(requirement batches, row errors) of the input.
+
+    With a cache, a hit loads the memory-mapped snapshot and repeats the row errors of the
+    original parse; a miss parses the whole file in one batch, with the errors a run without
+    the cache reports, and stores it. Rejected rows go to `dead_letters` when given.
+    """
+    from .cache import ScheduleCache
+    from .models import RequirementBatch
+    from .parser import InputParser
+    engine = parse_engine(args)
+    if cache is not None:
+        key = ScheduleCache.requirements_key(digest, args.wrap, args.days, engine)
+        entry = cache.load_requirements(key)
+        if entry is not None:
+            batch, errors = entry
+            InputParser.report_errors(errors, dead_letters)
+            return [batch], errors
+        errors = []
+        if engine == "python":
+            batch = RequirementBatch.from_requirements(InputParser.parse_csv(
+                args.input, allow_wrap=args.wrap, dead_letters=dead_letters, days=args.days, errors=errors))
+        else:
+            batch = InputParser.parse_csv_batch(args.input, allow_wrap=args.wrap, errors=errors,
+                                                  dead_letters=dead_letters, days=args.days)
+        cache.store_requirements(key, batch, errors)
+        return [batch], errors
+
+    source = input_lines(args)
+    if engine == "numpy":
+        if args.stream:
+            return InputParser.iter_csv_batches(source, batch_size=chunk_size, allow_wrap=args.wrap,
+                                                dead_letters=dead_letters, days=args.days), []
+        return [InputParser.parse_csv_batch(source, allow_wrap=args.wrap, dead_letters=dead_letters, days=args.days)], []
+    if args.stream:
+        return [InputParser.iter_csv(source, allow_wrap=args.wrap, dead_letters=dead_letters, days=args.days)], []
+    return [InputParser.parse_csv(source, allow_wrap=args.wrap, dead_letters=dead_letters, days=args.days)], []
+
+
+def parse_engine(args) -> str:
+    # The engine whose parser reads the input; the two word their row errors differently.
+    # Shards and scenarios are sent to the workers as batches, and smoothing moves the rows' windows, so they are parsed into one whatever the engine
+    if args.engine == "numpy" or isinstance(args.utilization, list) or args.shards or args.scenarios or args.smooth:
+        return "numpy"
+    return "python"
+
+
+def aggregate_input(batches, chunk_size: int):
+    """The parsed requirements merged into one batch of distinct groups (see `RequirementBatch.aggregate`).
+
+    Chunks are aggregated as they arrive and merged into the running result whenever they
+    outgrow it, so a streamed input is held as its groups rather than its rows.
+    """
+    from .models import RequirementBatch
+
+    def chunks() -> Iterator[RequirementBatch]:
+        # The python engine parses into requirements, which are batched here
+        for requirements in batches:
+            if isinstance(requirements, RequirementBatch):
+                yield requirements
+                continue
+            iterator = iter(requirements)
+            while True:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                yield RequirementBatch.from_requirements(chunk)
+
+    merged = RequirementBatch.from_columns([], [], [], [], [], [])
+    pending, pending_rows = [], 0
+    for chunk in chunks():
+        chunk = chunk.aggregate()
+        pending.append(chunk)
+        pending_rows += len(chunk)
+        if pending_rows > len(merged):
+            merged = RequirementBatch.concat([merged] + pending).aggregate()
+            pending, pending_rows = [], 0
+    if pending:
+        merged = RequirementBatch.concat([merged] + pending).aggregate()
+    run_metrics = metrics.current()
+    if run_metrics is not None:
+        run_metrics.set_gauge("requirement_groups", len(merged))
+    return merged
+
+
+def input_lines(args) -> Union[str, Iterable[str]]:
+    # The input path, or with --replay its lines with the corrected rows swapped in
+    if not args.replay:
+        return args.input
+    from .dead_letters import DeadLetterQueue
+    for path in [args.input] + args.replay:
+        if not Path(path).is_file():
+            print(f"Error: File {path} not found.", file=sys.stderr)
+            sys.exit(1)
+    return DeadLetterQueue.replay(args.input, args.replay)
+
+
+@contextmanager
+def dead_letter_queue(args) -> Iterator[Optional["DeadLetterQueue"]]:
+    """The --dlq queue of the run, closed (and summarized on stderr) when the run ends."""
+    if not args.dlq:
+        yield None
+        return
+    from termcolor import colored
+    from .dead_letters import DeadLetterQueue
+
+    def source():
+        lines = input_lines(args)
+        return open(lines, encoding="utf-8-sig", newline="") if isinstance(lines, str) else lines
+
+    with DeadLetterQueue(args.dlq, source) as dead_letters:
+        yield dead_letters
+    print(colored(dead_letters.summary(), 'yellow' if dead_letters.rejected else 'green'), file=sys.stderr)
+
+
+def input_digest(path: str) -> str:
+    from .cache import ScheduleCache
+    try:
+        return ScheduleCache.file_digest(path)
+    except FileNotFoundError:
+        print(f"Error: File {path} not found.", file=sys.stderr)
+        sys.exit(1)
+
+
+def report_rss(args):
+    if args.report_rss:
+        mode = "stream" if args.stream else "batch"
+        print(f"Peak RSS ({mode}): {peak_rss_mb():.1f} MiB", file=sys.stderr)
+
+
+def run_sweep(args, dead_letters=None):
+    # Parse once, then compute every utilization in one batched pass
+    from .formatter import Formatter
+    from .sweep import UtilizationSweep
+    sweep = UtilizationSweep(args.utilization, resolution=args.resolution, days=args.days)
+    batches = []
+    if not args.source:
+        batches, _ = load_batches(args, UtilizationSweep.CHUNK_SIZE, dead_letters)
+    with metrics.stage("schedule"):
+        if args.source:
+            ingest(args, sweep.process_batch)
+        try:
+            for batch in batches:
+                sweep.process_batch(batch)
+        except ValueError as e:
+            print(f"Error: {e}; pass a longer --days", file=sys.stderr)
+            sys.exit(1)
+        if args.fold:
+            sweep.fold(args.fold)
+
+    with metrics.stage("output"), counted_output() as written:
+        if args.format == "json":
+            Formatter.print_sweep_json(sweep)
+        elif args.format == "csv":
+            written.append(Formatter.save_sweep_csv(sweep, output=args.output))
+        else:
+            Formatter.print_sweep_text(sweep)
+
+
+def run_scenarios(args, erlang, dead_letters=None):
+    # Parse once, then schedule the baseline and every scenario's changes to it in a process pool
+    from .formatter import Formatter
+    from .models import RequirementBatch
+    from .scenarios import ScenarioEngine
+    from .scheduler import Scheduler
+    try:
+        scenarios = ScenarioEngine.load(args.scenarios)
+    except OSError as e:
+        print(f"Error: cannot read {args.scenarios}: {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    batches, _ = load_batches(args, Scheduler.CHUNK_SIZE, dead_letters)
+    base = batches[0] if len(batches) == 1 else RequirementBatch.concat(batches)
+
+    with metrics.stage("schedule"):
+        engine = ScenarioEngine(base, utilization=args.utilization, engine=args.engine, resolution=args.resolution,
+                                days=args.days, erlang=erlang)
+        try:
+            results = engine.run(scenarios, args.workers)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    run_metrics = metrics.current()
+    if run_metrics is not None:
+        run_metrics.set_gauge("scenarios", len(scenarios))
+
+    with metrics.stage("output"), counted_output() as written:
+        if args.format == "json":
+            Formatter.print_scenarios_json(results)
+        elif args.format == "csv":
+            written.append(Formatter.save_scenarios_csv(results, output=args.output))
+        else:
+            Formatter.print_scenarios_text(results)
+
+
+def run_smoothing(args, erlang, dead_letters=None):
+    # Parse once, schedule, then move the flexible customers' windows to lower the peak
+    from .formatter import Formatter
+    from .models import RequirementBatch
+    from .scheduler import Scheduler
+    from .smoothing import PeakSmoother
+    try:
+        smoother = PeakSmoother(PeakSmoother.load(args.smooth), utilization=args.utilization, engine=args.engine,
+                                resolution=args.resolution, days=args.days, erlang=erlang)
+    except OSError as e:
+        print(f"Error: cannot read {args.smooth}: {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    batches, _ = load_batches(args, Scheduler.CHUNK_SIZE, dead_letters)
+    batch = batches[0] if len(batches) == 1 else RequirementBatch.concat(batches)
+
+    with metrics.stage("schedule"):
+        try:
+            smoothing = smoother.smooth(batch)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        smoothing.after.cells
+    run_metrics = metrics.current()
+    if run_metrics is not None:
+        run_metrics.set_gauge("moves", len(smoothing.moves))
+        run_metrics.set_gauge("peak_before", int(smoothing.before.totals.max(initial=0)))
+        run_metrics.set_gauge("peak_after", int(smoothing.after.totals.max(initial=0)))
+
+    with metrics.stage("output"), counted_output() as written:
+        if args.format == "json":
+            Formatter.print_smoothing_json(smoothing)
+        elif args.format == "csv":
+            written.extend(Formatter.save_smoothing_csv(smoothing, output=args.output))
+        else:
+            Formatter.print_smoothing_text(smoothing)
+
+
+@contextmanager
+def counted_output() -> Iterator[list]:
+    """Count the bytes of stdout and of the files whose paths are added to the yielded list into `output_bytes`."""
+    run_metrics = metrics.current()
+    written = []
+    if run_metrics is None:
+        yield written
+        return
+    stdout = sys.stdout = metrics.CountingWriter(sys.stdout)
+    try:
+        yield written
+    finally:
+        sys.stdout = stdout.stream
+        run_metrics.count("output_bytes", stdout.bytes_written + sum(metrics.disk_usage(path) for path in written))
+
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    # cProfile the block, dump the stats to `path` and list the functions with the most own time
+    if path is None:
+        yield
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile saved to {path} (open with python -m pstats); hottest functions:", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("tottime").print_stats(PROFILE_TOP)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (0.0 where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
 
 
 if __name__ == "__main__":
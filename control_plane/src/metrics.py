@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+FORMATS = ("json", "openmetrics")
+# Per-row timers time one row in this many and extrapolate to every row read, so leaving
+# metrics on costs a modulo per row instead of two clock reads
+SAMPLE_EVERY = 64
+# Prefix of every OpenMetrics family
+NAMESPACE = "scheduler"
+
+_current: Optional["Metrics"] = None
+
+
+def current() -> Optional["Metrics"]:
+    """The metrics of the run in progress, or None when nobody is collecting."""
+    return _current
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current run; does nothing when no metrics are active."""
+    if _current is None:
+        yield
+        return
+    with _current.stage(name):
+        yield
+
+
+class Metrics:
+    """Wall and CPU time per stage plus counters of one run.
+
+    `main` activates an instance around a run; the parser reports into `current()` with a
+    None check per call or per batch, and per-row timers (`time_parse_seconds`,
+    `validation_seconds` on the python engine) are sampled one row in `SAMPLE_EVERY`.
+    Exported as JSON or OpenMetrics text.
+    """
+
+    def __init__(self, **info: str):
+        self.info = {name: str(value) for name, value in info.items()}
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        # name -> [seconds, rows] of the sampled timers
+        self._samples: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def activate(self) -> Iterator["Metrics"]:
+        global _current
+        previous, _current = _current, self
+        try:
+            yield self
+        finally:
+            _current = previous
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+            totals["wall_seconds"] += time.perf_counter() - wall
+            totals["cpu_seconds"] += time.process_time() - cpu
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def add_sample(self, name: str, started: float):
+        # The time of one sampled row, started at `started`
+        sample = self._samples.setdefault(name, [0.0, 0])
+        sample[0] += time.perf_counter() - started
+        sample[1] += 1
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def to_dict(self) -> dict:
+        counters = dict(self.counters)
+        rows = counters.get("rows_read", 0)
+        if "rows_read" in counters:
+            counters["rows_accepted"] = rows - counters.get("rows_rejected", 0)
+        timers = dict(self.timers)
+        for name, (seconds, samples) in self._samples.items():
+            # Mean of the sampled rows times every row read
+            timers[name] = timers.get(name, 0.0) + seconds / samples * max(rows, samples)
+        return {
+            "info": self.info,
+            "stages": self.stages,
+            "counters": counters,
+            "timers": timers,
+            "sampled_every": SAMPLE_EVERY,
+            "gauges": self.gauges,
+        }
+
+    def to_openmetrics(self) -> str:
+        data = self.to_dict()
+        lines = [f"# TYPE {NAMESPACE}_run info"]
+        labels = ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(data["info"].items()))
+        lines.append(f"{NAMESPACE}_run_info{{{labels}}} 1")
+        for kind in ("wall_seconds", "cpu_seconds"):
+            family = f"{NAMESPACE}_stage_{kind}"
+            lines += [f"# TYPE {family} gauge", f"# UNIT {family} seconds"]
+            lines += [f'{family}{{stage="{_escape(name)}"}} {totals[kind]}' for name, totals in data["stages"].items()]
+        for name, value in data["counters"].items():
+            lines += [f"# TYPE {NAMESPACE}_{name} counter", f"{NAMESPACE}_{name}_total {value}"]
+        for name, value in data["timers"].items():
+            lines += [f"# TYPE {NAMESPACE}_{name} gauge", f"# UNIT {NAMESPACE}_{name} seconds",
+                      f"{NAMESPACE}_{name} {value}"]
+        for name, value in data["gauges"].items():
+            lines += [f"# TYPE {NAMESPACE}_{name} gauge", f"{NAMESPACE}_{name} {value}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str, fmt: str = "json"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown metrics format '{fmt}', expected one of {FORMATS}")
+        with open(path, "w") as f:
+            if fmt == "json":
+                json.dump(self.to_dict(), f, indent=2)
+                f.write("\n")
+            else:
+                f.write(self.to_openmetrics())
+
+
+def disk_usage(path: str) -> int:
+    """Size of a file, or of all files under a directory (e.g. an npy schedule), in bytes."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class CountingWriter:
+    """Text stream proxy that counts the encoded bytes written through it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+        self._encoding = getattr(stream, "encoding", None) or "utf-8"
+
+    def write(self, text: str) -> int:
+        self.bytes_written += len(text.encode(self._encoding, errors="replace"))
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
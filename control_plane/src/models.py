@@ -1,37 +1,480 @@
-from collections import defaultdict
-from dataclasses import dataclass, field
-from typing import List, Dict, Literal
-from pydantic import BaseModel, Field, field_validator
-
-class CallRequirement(BaseModel):
-    customer_name: str
-    avg_duration_sec: int = Field(gt=0)
-    start_hour: int = Field(ge=0, le=23)
-    end_hour: int = Field(ge=0, le=24)
-    total_calls: int = Field(gt=0)
-    priority: Literal[1, 2, 3, 4, 5]
-
-    @field_validator("end_hour")
-    def validate_hours(cls, v, info):
-        start = info.data.get("start_hour")
-        if start is not None and v <= start:
-            # Allow end_hour == 24 even when start_hour == 0 (full day coverage)
-            if not (v == 24 and start == 0):
-                raise ValueError("end_hour must be > start_hour")
-        return v
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Sequence, Set, Tuple
+import numpy as np
+
+if TYPE_CHECKING:
+    from .schemas import CallRequirement, HourlyStat
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def split_offset(offset: int, end: bool = False) -> Tuple[int, int, int]:
+    """(day, hour, minute) of an offset in minutes after midnight of day 0.
+
+    With `end`, an offset on a day boundary is reported as hour 24 of the day before,
+    which is how requirements spell "until midnight".
+    """
+    day, minutes = divmod(offset, MINUTES_PER_DAY)
+    if end and minutes == 0 and day > 0:
+        day, minutes = day - 1, MINUTES_PER_DAY
+    hour, minute = divmod(minutes, 60)
+    return day, hour, minute
+
+
+def __getattr__(name: str):
+    # The pydantic models live in `schemas` and are only imported on first use
+    if name in ("CallRequirement", "HourlyStat"):
+        from . import schemas
+        return getattr(schemas, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ScheduleMatrix:
+    """Dense slots x customers table of scheduled agents.
+
+    The horizon is `days` days split into slots of `resolution` minutes (24 hourly slots
+    by default, 96 for 15-minute intervals, 168 for an hourly week). It is cyclic, like a
+    plan that repeats: a range running past the last slot continues from the first, so an
+    overnight window on the last day wraps to the morning of day 0.
+
+    Customer names are interned once (`customer_names`, in first-seen order) and each
+    customer owns one column of `cells`; rows for the same customer accumulate in it.
+    Updates go into a difference array, so a range fill costs O(1) however many slots it
+    covers; `cells` and `totals` are rebuilt with a prefix sum over the changed columns the
+    next time they are read. Indexing or iterating yields `HourlyStat` views that are built
+    on first access and cached until a change reaches their slot; they are read-only
+    snapshots, so updates must go through `add`.
+    """
+    FOLDS = ("sum", "max")
+
+    def __init__(self, resolution: int = 60, days: int = 1):
+        if resolution <= 0 or 60 % resolution:
+            raise ValueError(f"resolution must divide an hour evenly, got {resolution} minutes")
+        if days < 1:
+            raise ValueError(f"days must be at least 1, got {days}")
+        self.resolution = resolution
+        self.days = days
+        self.slots_per_day = MINUTES_PER_DAY // resolution
+        self.slots = days * self.slots_per_day
+        self.customer_names: List[str] = []
+        self._customer_index: Dict[str, int] = {}
+        # The extra row is the end sentinel of the difference arrays
+        self._diff = np.zeros((self.slots + 1, 16), dtype=np.int64)
+        self._totals_diff = np.zeros(self.slots + 1, dtype=np.int64)
+        self._cells = np.zeros((self.slots, 16), dtype=np.int64)
+        self._totals = np.zeros(self.slots, dtype=np.int64)
+        self._dirty: Set[int] = set()
+        self._views: Dict[int, HourlyStat] = {}
 
     @property
-    def active_duration_hours(self):
-        return self.end_hour - self.start_hour
+    def cells(self) -> np.ndarray:
+        """The slots x customers array (a view; columns follow `customer_names`)."""
+        self._refresh()
+        return self._cells[:, :len(self.customer_names)]
 
     @property
-    def calls_per_hour(self):
-        if self.active_duration_hours <= 0:
-            return 0
-        return self.total_calls / self.active_duration_hours
-    
-
-class HourlyStat(BaseModel):
-    hour: int = Field(ge=0, le=23, strict=True)
-    total_agents: int = Field(default=0, ge=0, strict=True)
-    breakdown: Dict[str, int] = Field(default_factory=dict)
+    def totals(self) -> np.ndarray:
+        """Total agents per slot."""
+        self._refresh()
+        return self._totals
+
+    def customer_id(self, name: str) -> int:
+        customer_id = self._customer_index.get(name)
+        if customer_id is None:
+            customer_id = self._add_customer(name)
+        return customer_id
+
+    def intern(self, names: Sequence[str]) -> np.ndarray:
+        """Column index of every name, adding the unknown ones."""
+        return np.fromiter((self.customer_id(name) for name in names), dtype=np.int64, count=len(names))
+
+    def customer_index(self, name: str) -> Optional[int]:
+        """Column of an already known customer, or None."""
+        return self._customer_index.get(name)
+
+    def column_range(self, customer_id: int, first: int, last: int) -> np.ndarray:
+        """`cells[first:last, customer_id]`, without rebuilding the other changed columns or dropping cached views.
+
+        A slice of the cached cells when the column is unchanged, else a prefix sum of its
+        difference array up to `last`.
+        """
+        if customer_id in self._dirty:
+            return np.cumsum(self._diff[:last, customer_id])[first:]
+        return self._cells[first:last, customer_id]
+
+    def add(self, customer_id: int, start: int, end: int, agents: int):
+        # Start inclusive, End exclusive. Negative agents retract an earlier add.
+        for first, last in self.wrap_range(start, end):
+            self._diff[first, customer_id] += agents
+            self._diff[last, customer_id] -= agents
+            self._totals_diff[first] += agents
+            self._totals_diff[last] -= agents
+        self._dirty.add(customer_id)
+
+    def add_many(self, customer_ids: np.ndarray, start: np.ndarray, end: np.ndarray, agents: np.ndarray):
+        """`add` for many requirements at once."""
+        if len(customer_ids) == 0:
+            return
+        start, end, source = self.wrap_ranges(start, end, self.slots)
+        customer_ids, agents = customer_ids[source], agents[source]
+        np.add.at(self._diff, (start, customer_ids), agents)
+        np.add.at(self._diff, (end, customer_ids), -agents)
+        np.add.at(self._totals_diff, start, agents)
+        np.add.at(self._totals_diff, end, -agents)
+        self._dirty.update(np.unique(customer_ids).tolist())
+
+    def wrap_range(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """The slot ranges `start:end` covers on the cyclic horizon (two if it wraps)."""
+        if end - start > self.slots:
+            raise ValueError(f"A range of {end - start} slots does not fit the {self.slots} slot horizon")
+        shift = start - start % self.slots
+        start, end = start - shift, end - shift
+        if end <= self.slots:
+            return [(start, end)]
+        return [(start, self.slots), (0, end - self.slots)]
+
+    @staticmethod
+    def wrap_ranges(start: np.ndarray, end: np.ndarray, slots: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized `wrap_range` over a horizon of `slots` slots.
+
+        Returns `(start, end, source)`, where ranges that wrap are split in two and
+        `source[i]` is the input range that range `i` came from.
+        """
+        if np.any(end - start > slots):
+            raise ValueError(f"A range of {int((end - start).max())} slots does not fit the {slots} slot horizon")
+        shift = start - start % slots
+        start, end = start - shift, end - shift
+        source = np.arange(len(start))
+        wrapped = np.flatnonzero(end > slots)
+        if wrapped.size == 0:
+            return start, end, source
+        return (
+            np.concatenate([start, np.zeros(wrapped.size, dtype=start.dtype)]),
+            np.concatenate([np.minimum(end, slots), end[wrapped] - slots]),
+            np.concatenate([source, wrapped]),
+        )
+
+    def clear_customer(self, customer_id: int):
+        """Drop everything scheduled for one customer."""
+        column = self._diff[:, customer_id]
+        if not column.any():
+            return
+        self._totals_diff -= column
+        column[:] = 0
+        self._dirty.add(customer_id)
+
+    def merge(self, other: "ScheduleMatrix"):
+        """Add `other`'s agents into this matrix, matching customers by name and adding unknown ones.
+
+        Addition is associative and exact, so partial schedules of disjoint rows merge into
+        the schedule of all the rows in any order. Costs O(slots x other's customers).
+        """
+        if other.slots != self.slots:
+            raise ValueError(f"Cannot merge a {other.slots} slot schedule into a {self.slots} slot one")
+        n = len(other.customer_names)
+        columns = self.intern(other.customer_names)
+        self._diff[:, columns] += other._diff[:, :n]
+        self._totals_diff += other._totals_diff
+        self._dirty.update(columns.tolist())
+
+    def __reduce__(self):
+        # Pickled as names and cells rather than difference arrays with spare columns and cached
+        # views, e.g. to send partial schedules between processes
+        return ScheduleMatrix.from_cells, (self.customer_names, self.cells.copy(), self.totals.copy(),
+                                           self.resolution, self.days)
+
+    def reorder(self, names: Sequence[str]):
+        """Renumber the customers to follow `names`, which must list every known customer once."""
+        n = len(self.customer_names)
+        order = np.fromiter((self._customer_index.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+        if len(order) != n or np.any(order < 0) or len(np.unique(order)) != n:
+            raise ValueError("reorder needs every customer of the schedule exactly once")
+        self._refresh()
+        self._diff[:, :n] = self._diff[:, order]
+        self._cells[:, :n] = self._cells[:, order]
+        self.customer_names = list(names)
+        self._customer_index = {name: i for i, name in enumerate(self.customer_names)}
+        self._views.clear()
+
+    def active_customers(self) -> List[str]:
+        """Customers with at least one scheduled agent, in first-seen order."""
+        names = self.customer_names
+        return [names[c] for c in np.flatnonzero(self.cells.any(axis=0)).tolist()]
+
+    def fold(self, how: str = "sum") -> "ScheduleMatrix":
+        """Collapse the horizon into a one-day profile.
+
+        `sum` adds the days up slot by slot; `max` keeps each slot's peak over the days,
+        both for the totals and for every customer on its own, so a folded breakdown may
+        add up to more than its total.
+        """
+        if how not in self.FOLDS:
+            raise ValueError(f"Unknown fold '{how}', expected one of {self.FOLDS}")
+        reduce = np.sum if how == "sum" else np.max
+        cells = self.cells.reshape(self.days, self.slots_per_day, -1)
+        totals = self.totals.reshape(self.days, self.slots_per_day)
+        return ScheduleMatrix.from_cells(self.customer_names, reduce(cells, axis=0), reduce(totals, axis=0),
+                                         resolution=self.resolution)
+
+    @classmethod
+    def from_cells(cls, customer_names: Sequence[str], cells: np.ndarray, totals: Optional[np.ndarray] = None,
+                   resolution: int = 60, days: int = 1) -> "ScheduleMatrix":
+        """A matrix holding precomputed slots x customers `cells`.
+
+        `totals` defaults to the row sums of `cells`.
+        """
+        matrix = cls(resolution=resolution, days=days)
+        n = len(customer_names)
+        if cells.shape != (matrix.slots, n):
+            raise ValueError(f"Expected cells of shape {(matrix.slots, n)}, got {cells.shape}")
+        if totals is None:
+            totals = cells.sum(axis=1)
+        matrix.customer_names = list(customer_names)
+        matrix._customer_index = {name: i for i, name in enumerate(matrix.customer_names)}
+        capacity = max(16, n)
+        matrix._cells = np.zeros((matrix.slots, capacity), dtype=np.int64)
+        matrix._cells[:, :n] = cells
+        matrix._diff = np.zeros((matrix.slots + 1, capacity), dtype=np.int64)
+        matrix._diff[:, :n] = np.diff(cells, axis=0, prepend=0, append=0)
+        matrix._totals = np.array(totals, dtype=np.int64)
+        matrix._totals_diff = np.diff(matrix._totals, prepend=0, append=0)
+        return matrix
+
+    def _refresh(self):
+        # Rebuild the changed columns from their difference arrays, dropping the cached views
+        # of the slots whose values changed
+        if not self._dirty:
+            return
+        columns = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+        cells = np.cumsum(self._diff[:-1, columns], axis=0)
+        if self._views:
+            for slot in np.flatnonzero((cells != self._cells[:, columns]).any(axis=1)).tolist():
+                self._views.pop(slot, None)
+        self._cells[:, columns] = cells
+        self._totals = np.cumsum(self._totals_diff[:-1])
+        self._dirty.clear()
+
+    def __len__(self) -> int:
+        return self.slots
+
+    def __getitem__(self, slot: int) -> HourlyStat:
+        self._refresh()
+        if slot < 0:
+            slot += self.slots
+        view = self._views.get(slot)
+        if view is None:
+            from .schemas import HourlyStat
+            row = self._cells[slot, :len(self.customer_names)]
+            active = np.flatnonzero(row)
+            names = self.customer_names
+            day, hour, minute = split_offset(slot * self.resolution)
+            view = HourlyStat.model_construct(
+                hour=hour,
+                minute=minute,
+                day=day,
+                total_agents=int(self._totals[slot]),
+                breakdown={names[c]: v for c, v in zip(active.tolist(), row[active].tolist())},
+            )
+            self._views[slot] = view
+        return view
+
+    def __iter__(self) -> Iterator[HourlyStat]:
+        for slot in range(self.slots):
+            yield self[slot]
+
+    def _add_customer(self, name: str) -> int:
+        customer_id = len(self.customer_names)
+        if customer_id == self._cells.shape[1]:
+            # Grow geometrically so interning n customers costs O(n) amortized
+            for attr in ("_diff", "_cells"):
+                current = getattr(self, attr)
+                grown = np.zeros((current.shape[0], 2 * customer_id), dtype=np.int64)
+                grown[:, :customer_id] = current
+                setattr(self, attr, grown)
+        self.customer_names.append(name)
+        self._customer_index[name] = customer_id
+        return customer_id
+
+
+@dataclass
+class RequirementBatch:
+    """Struct-of-arrays form of many `CallRequirement`s.
+
+    Column `i` of every array describes one requirement. Customer names are interned:
+    `customer_ids[i]` indexes into `customer_names`. Start and end are stored as minutes
+    after midnight of day 0 (`end_minute` is 1440 for the end of day 0, and past it for
+    windows that run overnight or over several days). `row_numbers` keeps the source
+    row of each requirement so validation errors can point back at the input.
+    """
+    customer_names: List[str]
+    customer_ids: np.ndarray
+    avg_duration_sec: np.ndarray
+    start_minute: np.ndarray
+    end_minute: np.ndarray
+    total_calls: np.ndarray
+    priority: np.ndarray
+    row_numbers: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    @classmethod
+    def from_columns(cls, names: Sequence[str], avg_duration_sec: Sequence[int], start_minute: Sequence[int],
+                     end_minute: Sequence[int], total_calls: Sequence[int], priority: Sequence[int],
+                     row_numbers: Optional[Sequence[int]] = None) -> "RequirementBatch":
+        index: Dict[str, int] = {}
+        customer_ids = np.fromiter((index.setdefault(name, len(index)) for name in names), dtype=np.int32, count=len(names))
+        if row_numbers is None:
+            row_numbers = range(len(names))
+        return cls(
+            customer_names=list(index),
+            customer_ids=customer_ids,
+            avg_duration_sec=np.asarray(avg_duration_sec, dtype=np.int64),
+            start_minute=np.asarray(start_minute, dtype=np.int64),
+            end_minute=np.asarray(end_minute, dtype=np.int64),
+            total_calls=np.asarray(total_calls, dtype=np.int64),
+            priority=np.asarray(priority, dtype=np.int64),
+            row_numbers=np.asarray(row_numbers, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_requirements(cls, requirements: Sequence[CallRequirement]) -> "RequirementBatch":
+        return cls.from_columns(
+            [r.customer_name for r in requirements],
+            [r.avg_duration_sec for r in requirements],
+            [r.start_offset for r in requirements],
+            [r.end_offset for r in requirements],
+            [r.total_calls for r in requirements],
+            [r.priority for r in requirements],
+        )
+
+    def slot_range(self, resolution: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+        """First and one-past-last slot of every requirement.
+
+        Times are floored to slots, except that a window starting and ending inside the
+        same slot covers that slot rather than none.
+        """
+        start = self.start_minute // resolution
+        return start, np.maximum(self.end_minute // resolution, start + 1)
+
+    def calls_per_hour(self, resolution: int = 60) -> np.ndarray:
+        # Spread over the slots actually covered, like `Scheduler._agents_needed`
+        start, end = self.slot_range(resolution)
+        active_hours = (end - start) * resolution / 60
+        return np.divide(self.total_calls, active_hours, out=np.zeros(len(self)), where=active_hours > 0)
+
+    def validate(self) -> Tuple["RequirementBatch", List[Tuple[int, str]]]:
+        """Check the `CallRequirement` rules for every row in one vectorized pass.
+
+        Returns the batch of valid rows and a `(row_number, message)` list for the others.
+        """
+        start, end = self.start_minute, self.end_minute
+        checks = [
+            (self.avg_duration_sec <= 0, "avg_duration_sec must be > 0"),
+            (start < 0, "start time must not be before day 0"),
+            (end <= start, "end time must be after start time"),
+            (self.total_calls <= 0, "total_calls must be > 0"),
+            ((self.priority < 1) | (self.priority > 5), "priority must be one of 1, 2, 3, 4, 5"),
+        ]
+        invalid = np.zeros(len(self), dtype=bool)
+        for failed, _ in checks:
+            invalid |= failed
+        if not invalid.any():
+            return self, []
+
+        errors = []
+        for i in np.flatnonzero(invalid).tolist():
+            messages = [message for failed, message in checks if failed[i]]
+            errors.append((int(self.row_numbers[i]), "; ".join(messages)))
+        return self.select(~invalid), errors
+
+    def select(self, mask: np.ndarray) -> "RequirementBatch":
+        # Keeps the intern table as is; names with no remaining rows are harmless
+        return RequirementBatch(
+            customer_names=self.customer_names,
+            customer_ids=self.customer_ids[mask],
+            avg_duration_sec=self.avg_duration_sec[mask],
+            start_minute=self.start_minute[mask],
+            end_minute=self.end_minute[mask],
+            total_calls=self.total_calls[mask],
+            priority=self.priority[mask],
+            row_numbers=self.row_numbers[mask],
+        )
+
+    def aggregate(self) -> "RequirementBatch":
+        """Merge the rows with the same customer, window, duration and priority, summing their calls.
+
+        Each group keeps the row number of its first row, and groups stay in the order they
+        were first seen. A group's calls are then staffed as one demand, so its agents are
+        rounded up once instead of once per row.
+        """
+        if len(self) == 0:
+            return self
+        keys = (self.customer_ids, self.avg_duration_sec, self.start_minute, self.end_minute, self.priority)
+        # One stable sort on all keys (several times faster than a 2-D np.unique, which sorts
+        # rows as bytes); a group starts wherever any key changes
+        order = np.lexsort(keys[::-1])
+        starts = np.zeros(len(order), dtype=bool)
+        starts[0] = True
+        for key in keys:
+            ordered = key[order]
+            starts[1:] |= ordered[1:] != ordered[:-1]
+        group = np.empty(len(order), dtype=np.int64)
+        group[order] = np.cumsum(starts) - 1
+        # The sort is stable, so each group's first sorted row is its first row in the input
+        first = order[starts]
+        # Sums of int64 calls stay exact in float64 far beyond any real call volume
+        total_calls = np.bincount(group, weights=self.total_calls, minlength=len(first)).astype(np.int64)
+        order = np.argsort(first, kind="stable")
+        rows = first[order]
+        return RequirementBatch(
+            customer_names=self.customer_names,
+            customer_ids=self.customer_ids[rows],
+            avg_duration_sec=self.avg_duration_sec[rows],
+            start_minute=self.start_minute[rows],
+            end_minute=self.end_minute[rows],
+            total_calls=total_calls[order],
+            priority=self.priority[rows],
+            row_numbers=self.row_numbers[rows],
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["RequirementBatch"]) -> "RequirementBatch":
+        """One batch with the rows of all `batches`, their customer names interned again."""
+        index: Dict[str, int] = {}
+        customer_ids = []
+        for batch in batches:
+            mapping = np.fromiter((index.setdefault(name, len(index)) for name in batch.customer_names),
+                                  dtype=np.int32, count=len(batch.customer_names))
+            customer_ids.append(mapping[batch.customer_ids])
+        if not batches:
+            return cls.from_columns([], [], [], [], [], [])
+        return cls(
+            customer_names=list(index),
+            customer_ids=np.concatenate(customer_ids),
+            **{name: np.concatenate([getattr(batch, name) for batch in batches])
+               for name in ("avg_duration_sec", "start_minute", "end_minute", "total_calls", "priority", "row_numbers")},
+        )
+
+    def to_requirements(self) -> Iterator[CallRequirement]:
+        """Yield one `CallRequirement` per row, skipping validation (the batch is already validated)."""
+        from .schemas import CallRequirement
+        names = self.customer_names
+        columns = zip(self.customer_ids.tolist(), self.avg_duration_sec.tolist(), self.start_minute.tolist(),
+                      self.end_minute.tolist(), self.total_calls.tolist(), self.priority.tolist())
+        for customer_id, duration, start, end, calls, priority in columns:
+            start_day, start_hour, start_minute = split_offset(start)
+            end_day, end_hour, end_minute = split_offset(end, end=True)
+            yield CallRequirement.model_construct(
+                customer_name=names[customer_id],
+                avg_duration_sec=duration,
+                start_hour=start_hour,
+                end_hour=end_hour,
+                total_calls=calls,
+                priority=priority,
+                start_minute=start_minute,
+                end_minute=end_minute,
+                start_day=start_day,
+                end_day=end_day,
+            )
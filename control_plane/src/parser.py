@@ -1,80 +1,327 @@
 
-import argparse
+from __future__ import annotations
 import csv
-import math
 import sys
-import json
-from typing import List, Dict
-from .models import CallRequirement
-from termcolor import colored
-from dateutil.parser import parse
-from datetime import datetime
+import time
+from typing import TYPE_CHECKING, List, Iterable, Iterator, Optional, TextIO, Tuple, Union
+from . import metrics
+from .models import MINUTES_PER_DAY, RequirementBatch, split_offset
+from .time_normalizer import TimeNormalizer
+
+if TYPE_CHECKING:
+    from .dead_letters import DeadLetterQueue
+    from .schemas import CallRequirement
+
+# Rejected rows reported on stderr are written this many lines at a time
+REPORT_LINES = 1024
+
 
 class InputParser:
+    COLUMNS = ('CustomerName', 'AverageCallDurationSeconds', 'StartTimePT', 'EndTimePT', 'NumberOfCalls', 'Priority')
+
+    # Shared so that the memoized time strings are reused across files and calls
+    time_normalizer = TimeNormalizer()
+
     @staticmethod
     def extract_hour(time_string: str) -> int:
-        try:
-            # check if time_string is int and raise error if not in 0-24 (allow 24 for end_hour)
-            if time_string.isdigit():
-                hour = int(time_string)
-                if 0 > hour or hour > 24:
-                    raise ValueError
-            # dateutil intelligently guesses the format and returns a full datetime object
-            dt_object = parse(time_string)
-            return dt_object.hour
-        except ValueError:
-            raise ValueError(f"Invalid time format: {time_string}")
+        # Raises ValueError("Invalid time format: ...") for anything that is not a time of day
+        return InputParser.time_normalizer.hour(time_string)
+
+    @staticmethod
+    def extract_minutes(time_string: str) -> int:
+        # Like extract_hour, but keeps the minutes: '7:45 PM' -> 1185
+        return InputParser.time_normalizer.minutes(time_string)
+
+    @staticmethod
+    def extract_window(start_string: str, end_string: str, allow_wrap: bool = False,
+                       days: Optional[int] = None) -> Tuple[int, int]:
+        """Start and end of a calling window as minutes after midnight of day 0.
+
+        Times may carry a day prefix ('Mon 22:00', 'd2 6AM'); an end without one falls on
+        the start's day, and an end of midnight means the end of that day. With `allow_wrap`,
+        an end at or before the start is on the next day, so 10PM-6AM runs overnight, or in
+        the next week when the end has its own day (Sun 20:00-Mon 2:00). With `days`, a
+        window longer than a horizon of that many days raises ValueError.
+        """
+        start_day, start = InputParser.time_normalizer.day_and_minutes(start_string)
+        end_day, end = InputParser.time_normalizer.day_and_minutes(end_string)
+        if start >= MINUTES_PER_DAY:
+            raise ValueError("start time must be between 00:00 and 23:59")
+        start += (start_day or 0) * MINUTES_PER_DAY
+        if end_day is not None:
+            end += end_day * MINUTES_PER_DAY
+            if end <= start and allow_wrap:
+                end += 7 * MINUTES_PER_DAY
+        else:
+            end += start - start % MINUTES_PER_DAY
+            # using assumption there is 24th hour of the day
+            if end <= start and (allow_wrap or end % MINUTES_PER_DAY == 0):
+                end += MINUTES_PER_DAY
+        if days is not None and end - start > days * MINUTES_PER_DAY:
+            raise ValueError(f"window is longer than the {days} day horizon")
+        return start, end
         
     
     @staticmethod
     def validate_columns(row: List[str]):
-        expected_columns = ['CustomerName', 'AverageCallDurationSeconds', 'StartTimePT', 'EndTimePT', 'NumberOfCalls', 'Priority']
         if row is None:
             raise ValueError("CSV file is missing a header row.")
-        for i, col in enumerate(expected_columns):
+        for i, col in enumerate(InputParser.COLUMNS):
             if i >= len(row) or row[i].strip() != col:
                 raise ValueError(f"Expected column '{col}' at position {i}, but got '{row[i] if i < len(row) else 'N/A'}'")
 
         
     @staticmethod
-    def parse_csv(filepath: str) -> List[CallRequirement]:
-        requirements = []
+    def parse_csv(filepath: str, allow_wrap: bool = False, dead_letters: Optional[DeadLetterQueue] = None,
+                  days: Optional[int] = None,
+                  errors: Optional[List[Tuple[int, Optional[str]]]] = None) -> List[CallRequirement]:
+        return list(InputParser.iter_csv(filepath, allow_wrap, dead_letters, days, errors))
+
+    @staticmethod
+    def iter_csv(filepath: str, allow_wrap: bool = False, dead_letters: Optional[DeadLetterQueue] = None,
+                 days: Optional[int] = None,
+                 errors: Optional[List[Tuple[int, Optional[str]]]] = None) -> Iterator[CallRequirement]:
+        """Yield validated requirements one row at a time.
+
+        Only the current row is held in memory, so callers that fold each requirement as it
+        arrives (see `Scheduler.process_requirements`) run in memory bounded by their own state.
+        `allow_wrap` accepts windows that run past midnight, and with `days` windows longer
+        than the horizon are rejected (see `extract_window`). Rejected rows go to
+        `dead_letters` when given, else to stderr, and are also appended to `errors` like
+        `iter_csv_batches` does.
+        """
+        from .schemas import CallRequirement
+        run_metrics = metrics.current()
+        report = RejectReport(dead_letters)
+        # Next row to time for the metrics; never when nobody collects them
+        next_sample = 0 if run_metrics is not None else sys.maxsize
+        try:
+            for row_idx, row in InputParser._iter_rows(filepath, errors, report):
+                sampled = row_idx >= next_sample
+                try:
+                    # Column based mapping: Name, Duration, Start, End, Calls, Priority
+                    name = row[0].strip()
+                    duration = int(row[1].strip())
+                    if sampled:
+                        next_sample = row_idx + metrics.SAMPLE_EVERY
+                        started = time.perf_counter()
+                        start, end = InputParser.extract_window(row[2].strip(), row[3].strip(), allow_wrap, days)
+                        run_metrics.add_sample("time_parse_seconds", started)
+                    else:
+                        start, end = InputParser.extract_window(row[2].strip(), row[3].strip(), allow_wrap, days)
+                    start_day, start_hour, start_minute = split_offset(start)
+                    end_day, end_hour, end_minute = split_offset(end, end=True)
+                    calls = int(row[4].strip())
+                    priority = int(row[5].strip())
+
+                    if sampled:
+                        started = time.perf_counter()
+                    req = CallRequirement(
+                        customer_name=name,
+                        avg_duration_sec=duration,
+                        start_hour=start_hour,
+                        end_hour=end_hour,
+                        total_calls=calls,
+                        priority=priority,
+                        start_minute=start_minute,
+                        end_minute=end_minute,
+                        start_day=start_day,
+                        end_day=end_day
+                    )
+                    if sampled:
+                        run_metrics.add_sample("validation_seconds", started)
+                    yield req
+                
+                except ValueError as e:
+                    report.error(row_idx, e, row)
+                    if errors is not None:
+                        errors.append((row_idx, str(e)))
+                    if run_metrics is not None:
+                        run_metrics.count("rows_rejected")
+                    continue
+        finally:
+            report.flush()
+
+    @staticmethod
+    def parse_csv_batch(filepath: Union[str, TextIO], allow_wrap: bool = False,
+                        errors: Optional[List[Tuple[int, Optional[str]]]] = None,
+                        dead_letters: Optional[DeadLetterQueue] = None,
+                        days: Optional[int] = None) -> RequirementBatch:
+        """Parse the whole file (a path or an open text stream) into a single validated `RequirementBatch`."""
+        batches = list(InputParser.iter_csv_batches(filepath, batch_size=sys.maxsize, allow_wrap=allow_wrap,
+                                                    errors=errors, dead_letters=dead_letters, days=days))
+        if not batches:
+            return RequirementBatch.from_columns([], [], [], [], [], [])
+        return batches[0]
+
+    @staticmethod
+    def iter_csv_batches(filepath: Union[str, TextIO], batch_size: int = 65536, allow_wrap: bool = False,
+                         errors: Optional[List[Tuple[int, Optional[str]]]] = None,
+                         dead_letters: Optional[DeadLetterQueue] = None,
+                         days: Optional[int] = None) -> Iterator[RequirementBatch]:
+        """Yield validated `RequirementBatch`es of up to `batch_size` rows.
+
+        Rows are only converted to typed columns here; the `CallRequirement` rules are then
+        checked once per batch (see `RequirementBatch.validate`) instead of once per row.
+        Every problem reported on stderr is also appended to `errors`, when given, as
+        `(row_idx, message)`, with a None message for skipped incomplete rows; see
+        `report_errors`. With `dead_letters`, rejected rows go there instead of to stderr, and
+        with `days` windows longer than the horizon are rejected like any other bad row.
+        """
+        extract_window = InputParser.extract_window
+        row_numbers, names, durations, starts, ends, calls, priorities = [], [], [], [], [], [], []
+        row_errors = []
+        # row_idx -> fields of the rows in row_errors, kept only for the dead letter queue
+        rejected_rows = {}
+        run_metrics = metrics.current()
+        report = RejectReport(dead_letters)
+
+        def flush() -> RequirementBatch:
+            started = time.perf_counter()
+            batch, invalid = RequirementBatch.from_columns(
+                names, durations, starts, ends, calls, priorities, row_numbers
+            ).validate()
+            # Report in row order, interleaving conversion and validation errors
+            reported = sorted(row_errors + invalid)
+            if run_metrics is not None:
+                run_metrics.add_time("validation_seconds", time.perf_counter() - started)
+                run_metrics.count("rows_rejected", len(reported))
+            for row_idx, message in reported:
+                # Rows that failed validation were already converted; the queue looks them up itself
+                report.error(row_idx, message, rejected_rows.get(row_idx))
+            report.flush()
+            if errors is not None:
+                errors.extend(reported)
+            for column in (row_numbers, names, durations, starts, ends, calls, priorities, row_errors):
+                column.clear()
+            rejected_rows.clear()
+            return batch
+
+        next_sample = 0 if run_metrics is not None else sys.maxsize
+        for row_idx, row in InputParser._iter_rows(filepath, errors, report):
+            try:
+                duration = int(row[1].strip())
+                if row_idx >= next_sample:
+                    # Time one row in SAMPLE_EVERY for the metrics
+                    next_sample = row_idx + metrics.SAMPLE_EVERY
+                    started = time.perf_counter()
+                    start, end = extract_window(row[2].strip(), row[3].strip(), allow_wrap, days)
+                    run_metrics.add_sample("time_parse_seconds", started)
+                else:
+                    start, end = extract_window(row[2].strip(), row[3].strip(), allow_wrap, days)
+                call_count = int(row[4].strip())
+                priority = int(row[5].strip())
+            except ValueError as e:
+                row_errors.append((row_idx, str(e)))
+                if dead_letters is not None:
+                    rejected_rows[row_idx] = row
+                continue
+            row_numbers.append(row_idx)
+            names.append(row[0].strip())
+            durations.append(duration)
+            starts.append(start)
+            ends.append(end)
+            calls.append(call_count)
+            priorities.append(priority)
+            if len(row_numbers) >= batch_size:
+                yield flush()
+
+        if row_numbers or row_errors:
+            batch = flush()
+            if len(batch):
+                yield batch
+        # Incomplete rows after the last batch
+        report.flush()
+
+    @staticmethod
+    def report_errors(errors: List[Tuple[int, Optional[str]]], dead_letters: Optional[DeadLetterQueue] = None):
+        """Report problems collected by `iter_csv_batches` again, as the parse reported them."""
+        report = RejectReport(dead_letters)
+        for row_idx, message in errors:
+            if message is None:
+                report.skipped(row_idx)
+            else:
+                report.error(row_idx, message)
+        report.flush()
+
+    @staticmethod
+    def _iter_rows(filepath: Union[str, TextIO, Iterable[str]], errors: Optional[List[Tuple[int, Optional[str]]]],
+                   report: RejectReport) -> Iterator[Tuple[int, List[str]]]:
+        # Yields (row_idx, row) for every data row with enough columns; `filepath` may also be an
+        # open text stream or any iterable of lines (see `DeadLetterQueue.replay`)
+        if not isinstance(filepath, str):
+            yield from InputParser._read_rows(filepath, errors, report)
+            return
         try:
             with open(filepath, mode='r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                header = next(reader, None)
-                InputParser.validate_columns(header)
-
-                for row_idx, row in enumerate(reader):
-                    if not row or len(row) < 6:
-                        print(colored(f"Skipping invalid or incomplete row {row_idx}", 'yellow'), file=sys.stderr)
-                        continue # Skip incomplete lines
-                    try:
-                        # Column based mapping: Name, Duration, Start, End, Calls, Priority
-                        name = row[0].strip()
-                        duration = int(row[1].strip())
-                        start = InputParser.extract_hour(row[2].strip())
-                        end = InputParser.extract_hour(row[3].strip())
-                        if end == 0: end = 24 # using assumption there is 24th hour of the day
-                        calls = int(row[4].strip())
-                        priority = int(row[5].strip())
-
-                        req = CallRequirement(
-                            customer_name=name,
-                            avg_duration_sec=duration,
-                            start_hour=start,
-                            end_hour=end,
-                            total_calls=calls,
-                            priority=priority
-                        )
-                        requirements.append(req)
-                        
-                    except ValueError as e:
-                        print(colored(f"Error parsing row {row_idx}: {e}", 'red'), file=sys.stderr)
-                        continue
+                yield from InputParser._read_rows(f, errors, report)
 
         except FileNotFoundError:
             print(f"Error: File {filepath} not found.", file=sys.stderr)
             sys.exit(1)
-            
-        return requirements
+
+    @staticmethod
+    def _read_rows(f: Iterable[str], errors: Optional[List[Tuple[int, Optional[str]]]],
+                   report: RejectReport) -> Iterator[Tuple[int, List[str]]]:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        InputParser.validate_columns(header)
+        run_metrics = metrics.current()
+
+        row_idx = -1
+        for row_idx, row in enumerate(reader):
+            if not row or len(row) < 6:
+                report.skipped(row_idx, row)
+                if errors is not None:
+                    errors.append((row_idx, None))
+                if run_metrics is not None:
+                    run_metrics.count("rows_rejected")
+                continue # Skip incomplete lines
+            yield row_idx, row
+        if run_metrics is not None:
+            run_metrics.count("rows_read", row_idx + 1)
+
+
+class RejectReport:
+    """Where the rows a parse rejects go: a dead letter queue when one is given, else stderr.
+
+    Printing every rejected row on its own is slow on dirty inputs (stderr is unbuffered), so
+    the stderr lines are collected and written up to `REPORT_LINES` at a time; parsers
+    `flush` at the end of each batch, keeping the lines in the order they were reported, and
+    the dead letter queue writes that batch's rows there.
+    With `source`, every line starts with it, to tell the inputs of one run apart.
+    """
+
+    def __init__(self, dead_letters: Optional[DeadLetterQueue] = None, source: Optional[str] = None):
+        self.dead_letters = dead_letters
+        self.prefix = f"{source}: " if source is not None else ""
+        self.lines: List[str] = []
+        if dead_letters is None:
+            from termcolor import colored
+            self._colored = colored
+
+    def skipped(self, row_idx: int, row: Optional[List[str]] = None):
+        # An incomplete row (fewer than six fields)
+        if self.dead_letters is not None:
+            self.dead_letters.reject(row_idx, None, row)
+            return
+        self._add(self._colored(f"{self.prefix}Skipping invalid or incomplete row {row_idx}", 'yellow'))
+
+    def error(self, row_idx: int, error, row: Optional[List[str]] = None):
+        # A row that failed to convert or validate; `row` is its fields when the caller still has them
+        if self.dead_letters is not None:
+            self.dead_letters.reject(row_idx, str(error), row)
+            return
+        self._add(self._colored(f"{self.prefix}Error parsing row {row_idx}: {error}", 'red'))
+
+    def flush(self):
+        if self.dead_letters is not None:
+            self.dead_letters.flush()
+        if self.lines:
+            sys.stderr.write("\n".join(self.lines) + "\n")
+            self.lines.clear()
+
+    def _add(self, line: str):
+        self.lines.append(line)
+        if len(self.lines) >= REPORT_LINES:
+            self.flush()
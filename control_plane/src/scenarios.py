@@ -0,0 +1,224 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from fnmatch import fnmatchcase
+from typing import List, Optional, Sequence
+import numpy as np
+from .erlang import ErlangC
+from .models import RequirementBatch
+from .scheduler import Scheduler
+
+# Name of the unchanged input, evaluated first and compared against
+BASELINE = "baseline"
+# Keys of a change in a scenario file; `shift_hours` is converted to minutes
+CHANGE_KEYS = ("customers", "scale_calls", "shift_minutes", "shift_hours", "scale_duration")
+SCENARIO_KEYS = ("name", "utilization", "changes")
+
+
+@dataclass
+class Change:
+    """One transformation of the rows of the customers matching `customers` (every row when None).
+
+    `customers` are exact names or shell-style patterns (`Customer 0*`). Calls and
+    durations are scaled and rounded to whole numbers; windows move by `shift_minutes`,
+    wrapping around the cyclic horizon like any other window.
+    """
+    customers: Optional[List[str]] = None
+    scale_calls: float = 1.0
+    shift_minutes: int = 0
+    scale_duration: float = 1.0
+
+    def customer_ids(self, names: Sequence[str]) -> np.ndarray:
+        """Ids of the `names` matching `customers`; raises ValueError for a pattern matching none of them."""
+        return match_customers(self.customers, names)
+
+
+@dataclass
+class Scenario:
+    """A named variant of the input: changes applied in order, and optionally another utilization."""
+    name: str
+    changes: List[Change] = field(default_factory=list)
+    utilization: Optional[float] = None
+
+    def apply(self, batch: RequirementBatch) -> RequirementBatch:
+        """`batch` with the changes applied; rows scaled down to zero calls are dropped."""
+        calls, duration = batch.total_calls, batch.avg_duration_sec
+        start, end = batch.start_minute, batch.end_minute
+        for change in self.changes:
+            selected = True
+            if change.customers is not None:
+                selected = np.isin(batch.customer_ids, change.customer_ids(batch.customer_names))
+            if change.scale_calls != 1:
+                calls = np.where(selected, np.rint(calls * change.scale_calls).astype(calls.dtype), calls)
+            if change.scale_duration != 1:
+                scaled = np.maximum(np.rint(duration * change.scale_duration), 1).astype(duration.dtype)
+                duration = np.where(selected, scaled, duration)
+            if change.shift_minutes:
+                start = np.where(selected, start + change.shift_minutes, start)
+                end = np.where(selected, end + change.shift_minutes, end)
+        changed = replace(batch, total_calls=calls, avg_duration_sec=duration, start_minute=start, end_minute=end)
+        return changed.select(calls > 0) if np.any(calls <= 0) else changed
+
+
+@dataclass
+class ScenarioResult:
+    """Total agents per slot of one evaluated scenario."""
+    name: str
+    utilization: float
+    totals: np.ndarray
+    resolution: int = 60
+    days: int = 1
+
+    @property
+    def peak_agents(self) -> int:
+        return int(self.totals.max()) if self.totals.size else 0
+
+    @property
+    def peak_slot(self) -> int:
+        # First slot with the peak
+        return int(self.totals.argmax()) if self.totals.size else 0
+
+    @property
+    def agent_hours(self) -> float:
+        return float(self.totals.sum()) * self.resolution / 60
+
+
+class ScenarioEngine:
+    """Evaluates what-if scenarios against one parsed input.
+
+    The input is parsed once into `base`; every scenario applies its changes to the
+    columns of that batch (see `Scenario.apply`) and schedules the result. With more than
+    one worker, scenarios run in a process pool whose workers get the engine once, when
+    they start (inherited without a copy where processes are forked), rather than once per
+    scenario, and only each scenario's slot totals come back.
+    """
+
+    def __init__(self, base: RequirementBatch, utilization: float = 1.0, engine: str = "numpy",
+                 resolution: int = 60, days: int = 1, erlang: Optional[ErlangC] = None):
+        self.base = base
+        self.utilization = utilization
+        self.engine = engine
+        self.resolution = resolution
+        self.days = days
+        self.erlang = erlang
+
+    @staticmethod
+    def load(path: str) -> List[Scenario]:
+        """Read a JSON scenario file: a list of scenarios, or an object with a `scenarios` list.
+
+        A scenario is `{"name": ..., "utilization": 0.85, "changes": [...]}`, and a change
+        is `{"customers": ["CVS"], "scale_calls": 1.3, "shift_hours": -1, "scale_duration": 1.1}`,
+        every key optional but the name.
+        """
+        with open(path, encoding="utf-8-sig") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not valid JSON: {e}")
+        if isinstance(data, dict):
+            data = data.get("scenarios")
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a list of scenarios or an object with a 'scenarios' list")
+        scenarios = [_scenario(entry, i) for i, entry in enumerate(data)]
+        names = [scenario.name for scenario in scenarios]
+        for name in names:
+            if name == BASELINE or names.count(name) > 1:
+                raise ValueError(f"{path}: scenario name '{name}' is reserved or used twice")
+        return scenarios
+
+    def evaluate(self, scenario: Scenario) -> ScenarioResult:
+        utilization = scenario.utilization if scenario.utilization is not None else self.utilization
+        scheduler = Scheduler(utilization=utilization, engine=self.engine, resolution=self.resolution,
+                              days=self.days, erlang=self.erlang)
+        scheduler.process_requirements(scenario.apply(self.base))
+        pooled = self.erlang is not None and self.erlang.pooled
+        totals = scheduler.pooled_schedule().totals if pooled else scheduler.schedule.totals
+        return ScenarioResult(scenario.name, utilization, totals.copy(), self.resolution, self.days)
+
+    def run(self, scenarios: Sequence[Scenario], workers: Optional[int] = None) -> List[ScenarioResult]:
+        """The baseline and then every scenario, in order; raises ValueError before any is evaluated."""
+        scenarios = [Scenario(BASELINE)] + list(scenarios)
+        for scenario in scenarios:
+            for change in scenario.changes:
+                if change.customers is not None:
+                    try:
+                        change.customer_ids(self.base.customer_names)
+                    except ValueError as e:
+                        raise ValueError(f"Scenario '{scenario.name}': {e}")
+        workers = min(len(scenarios), workers or os.cpu_count() or 1)
+        if workers <= 1:
+            return [self.evaluate(scenario) for scenario in scenarios]
+        with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(self,)) as pool:
+            # A few scenarios per task, so the slot totals of many small ones share a round trip
+            return list(pool.map(_evaluate, scenarios, chunksize=max(1, len(scenarios) // (4 * workers))))
+
+
+def match_customers(patterns: Sequence[str], names: Sequence[str]) -> np.ndarray:
+    """Sorted ids of the `names` matching any of `patterns` (exact names or shell-style patterns).
+
+    Raises ValueError for a pattern matching none of them.
+    """
+    matched = []
+    for pattern in patterns:
+        ids = [c for c, name in enumerate(names) if fnmatchcase(name, pattern)]
+        if not ids:
+            raise ValueError(f"customer '{pattern}' matches no customer of the input")
+        matched.extend(ids)
+    return np.unique(np.array(matched, dtype=np.int64))
+
+
+_engine: Optional[ScenarioEngine] = None
+
+
+def _start_worker(engine: ScenarioEngine):
+    global _engine
+    _engine = engine
+
+
+def _evaluate(scenario: Scenario) -> ScenarioResult:
+    return _engine.evaluate(scenario)
+
+
+def _scenario(entry, index: int) -> Scenario:
+    # One scenario of a scenario file, checked key by key
+    if not isinstance(entry, dict) or not isinstance(entry.get("name"), str) or not entry["name"]:
+        raise ValueError(f"Scenario {index + 1}: expected an object with a non-empty 'name'")
+    name = entry["name"]
+    unknown = set(entry) - set(SCENARIO_KEYS)
+    if unknown:
+        raise ValueError(f"Scenario '{name}': unknown keys {sorted(unknown)}, expected {list(SCENARIO_KEYS)}")
+    utilization = entry.get("utilization")
+    if utilization is not None and (not _is_number(utilization) or not 0 < utilization <= 1):
+        raise ValueError(f"Scenario '{name}': utilization must be a number in (0, 1], got {utilization!r}")
+    changes = entry.get("changes", [])
+    if not isinstance(changes, list):
+        raise ValueError(f"Scenario '{name}': 'changes' must be a list")
+    return Scenario(name, [_change(change, name) for change in changes], utilization)
+
+
+def _change(entry, scenario: str) -> Change:
+    if not isinstance(entry, dict):
+        raise ValueError(f"Scenario '{scenario}': every change must be an object")
+    unknown = set(entry) - set(CHANGE_KEYS)
+    if unknown:
+        raise ValueError(f"Scenario '{scenario}': unknown change keys {sorted(unknown)}, expected {list(CHANGE_KEYS)}")
+    customers = entry.get("customers")
+    if isinstance(customers, str):
+        customers = [customers]
+    if customers is not None and (not isinstance(customers, list) or not all(isinstance(c, str) for c in customers)):
+        raise ValueError(f"Scenario '{scenario}': 'customers' must be a name or a list of names")
+    for key in ("scale_calls", "shift_minutes", "shift_hours", "scale_duration"):
+        if key in entry and not _is_number(entry[key]):
+            raise ValueError(f"Scenario '{scenario}': {key} must be a number, got {entry[key]!r}")
+    scale_calls, scale_duration = entry.get("scale_calls", 1.0), entry.get("scale_duration", 1.0)
+    if scale_calls < 0 or scale_duration <= 0:
+        raise ValueError(f"Scenario '{scenario}': scale_calls must not be negative and scale_duration must be positive")
+    shift = entry.get("shift_minutes", 0) + entry.get("shift_hours", 0) * 60
+    if shift != int(shift):
+        raise ValueError(f"Scenario '{scenario}': windows can only shift by whole minutes, got {shift}")
+    return Change(customers, scale_calls, int(shift), scale_duration)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -1,26 +1,271 @@
-import argparse
-import csv
+from __future__ import annotations
 import math
-import sys
-import json
-from typing import List, Dict
-from .models import CallRequirement, HourlyStat
+import os
+from itertools import islice, repeat
+from typing import TYPE_CHECKING, List, Dict, Iterable, Optional, Tuple, Union
+import numpy as np
+from .models import RequirementBatch, ScheduleMatrix
+from .erlang import MICRO, ErlangC
+
+if TYPE_CHECKING:
+    from .schemas import CallRequirement
 
 class Scheduler:
-    def __init__(self, utilization: float = 1.0):
+    ENGINES = ("python", "numpy")
+    # Requirements vectorized together by the numpy engine; bounds memory when streaming
+    CHUNK_SIZE = 8192
+
+    def __init__(self, utilization: float = 1.0, engine: str = "python", resolution: int = 60, days: int = 1,
+                 erlang: Optional[ErlangC] = None, by_priority: bool = False):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
         self.utilization = utilization
-        # 0-23 hour buckets
-        self.schedule = [HourlyStat(hour=h) for h in range(24)]
+        self.engine = engine
+        # Minutes per bucket: 0-23 hour buckets by default, 96 buckets for 15 minutes
+        self.resolution = resolution
+        # Length of the (cyclic) horizon; windows past its end wrap to day 0
+        self.days = days
+        self.schedule = ScheduleMatrix(resolution=resolution, days=days)
+        # Most urgent priority (1 = highest) among each customer's requirements
+        self.priorities: Dict[str, int] = {}
+        # Requirements scheduled per customer and priority (index 0 = priority 1), so that
+        # retracting one can restore the priority of the others
+        self._priority_rows: Dict[str, List[int]] = {}
+        # With `by_priority`, each customer's agents at every priority (index 0 = priority 1),
+        # for `CapacityAllocator` to serve a customer's rows at their own priorities
+        self.priority_schedules: Optional[List[ScheduleMatrix]] = None
+        if by_priority:
+            self.priority_schedules = [ScheduleMatrix(resolution=resolution, days=days) for _ in range(5)]
+        # Staff for a service level with Erlang C; the linear formula then only caps occupancy
+        self.erlang = erlang
+        if erlang is not None and erlang.pooled:
+            # Per-customer traffic (Erlangs) and call rates, in millionths, for pooled staffing
+            self._traffic = ScheduleMatrix(resolution=resolution, days=days)
+            self._call_rate = ScheduleMatrix(resolution=resolution, days=days)
+
+    @property
+    def customers(self) -> List[str]:
+        # Distinct customers with scheduled agents, in first-seen order
+        return self.schedule.active_customers()
+
+    def process_requirements(self, requirements: Union[RequirementBatch, Iterable[CallRequirement]]):
+        """Fold requirements into the schedule.
+
+        `requirements` may be a `RequirementBatch` or any iterable of `CallRequirement`s,
+        including a generator from `InputParser.iter_csv`; it is consumed incrementally and
+        never materialized as a whole.
+        """
+        if self.engine == "numpy":
+            if isinstance(requirements, RequirementBatch):
+                self._schedule_batch(requirements)
+                return
+            iterator = iter(requirements)
+            while True:
+                chunk = list(islice(iterator, self.CHUNK_SIZE))
+                if not chunk:
+                    return
+                self._schedule_batch(RequirementBatch.from_requirements(chunk))
+        if isinstance(requirements, RequirementBatch):
+            requirements = requirements.to_requirements()
+        if self.erlang is not None:
+            # Solve the Erlang C pairs of each chunk together; every row then hits the memo
+            iterator = iter(requirements)
+            while True:
+                chunk = list(islice(iterator, self.CHUNK_SIZE))
+                if not chunk:
+                    return
+                self._erlang_agents(RequirementBatch.from_requirements(chunk))
+                for req in chunk:
+                    self._schedule_requirement(req)
+        for req in requirements:
+            self._schedule_requirement(req)
+
+    def process_sharded(self, requirements: Union[RequirementBatch, Iterable[CallRequirement]], shards: int,
+                        workers: Optional[int] = None):
+        """`process_requirements` as a map-reduce over `shards` slices of the rows.
+
+        Each slice is scheduled by a partial Scheduler in a pool of `workers` processes
+        (default: one per shard, at most one per CPU). The partial schedules travel back as
+        customer names and int64 cells (see `ScheduleMatrix.__reduce__`) and are added into
+        this one, as are the requirement counts per priority; both sums are exact, and the
+        customers are interned in the serial order first, so the result equals the serial
+        one, column order included. Worth it where scheduling dominates, i.e. the python
+        engine and Erlang C staffing; the numpy engine is usually faster than the transfer.
+        """
+        batch = requirements
+        if not isinstance(batch, RequirementBatch):
+            batch = RequirementBatch.from_requirements(list(batch))
+        shards = min(shards, len(batch))
+        if shards <= 1:
+            self.process_requirements(batch)
+            return
+        from concurrent.futures import ProcessPoolExecutor
+
+        names = self._serial_order(batch)
+        self.schedule.intern(names)
+        if self._pooled:
+            self._traffic.intern(names)
+            self._call_rate.intern(names)
+        bounds = np.linspace(0, len(batch), shards + 1).astype(np.int64).tolist()
+        # Re-interned so that a slice only carries the names of its own customers
+        slices = [RequirementBatch.concat([batch.select(slice(start, end))]) for start, end in zip(bounds, bounds[1:])]
+        erlang = None
+        if self.erlang is not None:
+            erlang = (self.erlang.service_level, self.erlang.answer_time, self.erlang.pooled, self.erlang.max_entries)
+        options = (self.utilization, self.engine, self.resolution, self.days, erlang,
+                   self.priority_schedules is not None)
+        priority_rows: Dict[str, List[int]] = {}
+        with ProcessPoolExecutor(min(shards, workers or os.cpu_count() or 1)) as pool:
+            for schedule, traffic, call_rate, partial, levels in pool.map(_schedule_shard, repeat(options), slices):
+                self.schedule.merge(schedule)
+                for level, partial_level in zip(self.priority_schedules or (), levels or ()):
+                    level.merge(partial_level)
+                if self._pooled:
+                    self._traffic.merge(traffic)
+                    self._call_rate.merge(call_rate)
+                for name, rows in partial.items():
+                    total = priority_rows.setdefault(name, [0] * 5)
+                    for i, count in enumerate(rows):
+                        total[i] += count
+        for name in names:
+            self._count_priorities(name, priority_rows[name])
+
+    def _serial_order(self, batch: RequirementBatch) -> List[str]:
+        # The customers of `batch` in the order `process_requirements` interns them: by id
+        # within the batch for the numpy engine, by first row for the python engine
+        if self.engine == "numpy":
+            present = np.flatnonzero(np.bincount(batch.customer_ids, minlength=len(batch.customer_names)))
+        else:
+            present, first = np.unique(batch.customer_ids, return_index=True)
+            present = present[np.argsort(first)]
+        return [batch.customer_names[c] for c in present.tolist()]
+
+    def add_requirement(self, req: CallRequirement):
+        """Schedule one more requirement. Costs O(1) whatever the length of its window."""
+        self._schedule_requirement(req)
 
-    def process_requirements(self, requirements: List[CallRequirement]):
+    def remove_requirement(self, req: CallRequirement):
+        """Retract a requirement that was scheduled earlier.
+
+        Costs O(slots it covers), plus a prefix sum over the customer's own column when it
+        changed since the schedule was last read (see `ScheduleMatrix.column_range`).
+        """
+        customer_id = self.schedule.customer_index(req.customer_name)
+        if customer_id is None:
+            raise ValueError(f"Customer '{req.customer_name}' is not scheduled")
+        agents_needed = self._agents_needed(req)
+        start, end = self._slot_range(req)
+        for first, last in self.schedule.wrap_range(start, end):
+            if (self.schedule.column_range(customer_id, first, last) < agents_needed).any():
+                raise ValueError(f"Requirement for '{req.customer_name}' ({req.start_hour}-{req.end_hour}) is not scheduled")
+        self.schedule.add(customer_id, start, end, -agents_needed)
+        self._add_priority(req, start, end, -agents_needed)
+        self._pool(req, -1)
+        self._count_priorities(req.customer_name, self._priority_counts(req.priority, -1))
+
+    def remove_requirements(self, requirements: Union[RequirementBatch, Iterable[CallRequirement]]):
+        """Retract many requirements scheduled earlier, e.g. the rows deleted from an input.
+
+        The numpy engine subtracts a batch in one vectorized pass, after checking that the
+        batch's agents are all scheduled for their customers (raising ValueError before
+        anything is retracted); the python engine removes them one at a time.
+        """
+        if self.engine == "numpy":
+            if not isinstance(requirements, RequirementBatch):
+                requirements = RequirementBatch.from_requirements(list(requirements))
+            self._schedule_batch(requirements, sign=-1)
+            return
+        if isinstance(requirements, RequirementBatch):
+            requirements = requirements.to_requirements()
+        for req in requirements:
+            self.remove_requirement(req)
+
+    def replace_requirement(self, old: CallRequirement, new: CallRequirement):
+        self.remove_requirement(old)
+        self.add_requirement(new)
+
+    def replace_customer(self, customer_name: str, requirements: Iterable[CallRequirement]):
+        """Replace everything scheduled for `customer_name` with `requirements`."""
+        requirements = list(requirements)
+        for req in requirements:
+            if req.customer_name != customer_name:
+                raise ValueError(f"Requirement for '{req.customer_name}' passed when replacing '{customer_name}'")
+        customer_id = self.schedule.customer_index(customer_name)
+        if customer_id is not None:
+            self.schedule.clear_customer(customer_id)
+            if self._pooled:
+                self._traffic.clear_customer(customer_id)
+                self._call_rate.clear_customer(customer_id)
+        for level in self.priority_schedules or ():
+            level_id = level.customer_index(customer_name)
+            if level_id is not None:
+                level.clear_customer(level_id)
+        self.priorities.pop(customer_name, None)
+        self._priority_rows.pop(customer_name, None)
         for req in requirements:
             self._schedule_requirement(req)
 
+    def order_customers(self, names: Iterable[str]):
+        """Put the customers in the order of `names`, e.g. the order a sequential parse would have seen them in.
+
+        Customers missing from `names` follow in their current order; unknown names are ignored.
+        """
+        known = [name for name in dict.fromkeys(names) if self.schedule.customer_index(name) is not None]
+        listed = set(known)
+        order = known + [name for name in self.schedule.customer_names if name not in listed]
+        self.schedule.reorder(order)
+        if self._pooled:
+            self._traffic.reorder(order)
+            self._call_rate.reorder(order)
+        self.priorities = {name: self.priorities[name] for name in order if name in self.priorities}
+
     def _schedule_requirement(self, req: CallRequirement):
+        agents_needed = self._agents_needed(req)
+
+        # 2. Fill the buckets 
+        # Start inclusive, End exclusive
+        customer_id = self.schedule.customer_id(req.customer_name)
+        start, end = self._slot_range(req)
+        self.schedule.add(customer_id, start, end, agents_needed)
+        self._add_priority(req, start, end, agents_needed)
+        self._count_priorities(req.customer_name, self._priority_counts(req.priority, 1))
+        self._pool(req, 1)
+
+    def _add_priority(self, req: CallRequirement, start: int, end: int, agents: int):
+        if self.priority_schedules is None:
+            return
+        level = self.priority_schedules[req.priority - 1]
+        level.add(level.customer_id(req.customer_name), start, end, agents)
+
+    @staticmethod
+    def _priority_counts(priority: int, count: int) -> List[int]:
+        counts = [0] * 5
+        counts[priority - 1] = count
+        return counts
+
+    def _count_priorities(self, name: str, counts: Iterable[int]):
+        # Add requirements per priority (negative to retract) and update the customer's priority
+        rows = self._priority_rows.setdefault(name, [0] * 5)
+        for i, count in enumerate(counts):
+            rows[i] += count
+        urgent = next((i + 1 for i, count in enumerate(rows) if count > 0), None)
+        if urgent is None:
+            # Nothing left scheduled for the customer
+            self._priority_rows.pop(name)
+            self.priorities.pop(name, None)
+        else:
+            self.priorities[name] = urgent
+
+    def _slot_range(self, req: CallRequirement):
+        # Times are floored to the bucket they fall in; a window inside one bucket still covers that bucket
+        start = req.start_offset // self.resolution
+        return start, max(req.end_offset // self.resolution, start + 1)
+
+    def _agents_needed(self, req: CallRequirement) -> int:
         # 1. Calculate agents needed per hour for this specific customer
         # Formula: ceil(calls_per_hour * avg_duration / 3600 / utilization) 
         
-        calls_per_hour = req.calls_per_hour
+        calls_per_hour = self._calls_per_hour(req)
         
         # Protect against div by zero if utilization is passed as 0.0
         util_factor = max(self.utilization, 0.01)
@@ -31,11 +276,143 @@ class Scheduler:
         # Capacity of one agent in seconds (3600 * utilization)
         agent_capacity = 3600 * util_factor
         
-        agents_needed = math.ceil(workload_seconds / agent_capacity)
+        agents = math.ceil(workload_seconds / agent_capacity)
+        if self.erlang is not None:
+            agents = max(agents, self.erlang.agents(workload_seconds / 3600, req.avg_duration_sec))
+        return agents
 
-        # 2. Fill the buckets 
-        # Start inclusive, End exclusive
-        for hour in range(req.start_hour, req.end_hour):
-            bucket = self.schedule[hour]
-            bucket.total_agents += agents_needed
-            bucket.breakdown[req.customer_name] = agents_needed
+    def _calls_per_hour(self, req: CallRequirement) -> float:
+        # Calls are spread evenly over the buckets the requirement covers
+        start, end = self._slot_range(req)
+        active_hours = (end - start) * self.resolution / 60
+        return req.total_calls / active_hours if active_hours > 0 else 0
+
+    @property
+    def _pooled(self) -> bool:
+        return self.erlang is not None and self.erlang.pooled
+
+    def _pool(self, req: CallRequirement, sign: int):
+        if not self._pooled:
+            return
+        calls_per_hour = self._calls_per_hour(req)
+        start, end = self._slot_range(req)
+        traffic = round(calls_per_hour * req.avg_duration_sec / 3600 * MICRO)
+        self._traffic.add(self._traffic.customer_id(req.customer_name), start, end, sign * traffic)
+        self._call_rate.add(self._call_rate.customer_id(req.customer_name), start, end, sign * round(calls_per_hour * MICRO))
+
+    def pooled_schedule(self) -> ScheduleMatrix:
+        """The schedule with every slot's total staffed for the pooled traffic of all customers.
+
+        Breakdowns still show what each customer would need on its own; one shared queue
+        needs fewer agents than separate ones, so a total is usually below its breakdown.
+        """
+        if not self._pooled:
+            raise ValueError("pooled_schedule needs a pooled ErlangC model")
+        traffic = self._traffic.totals / MICRO
+        calls_per_hour = self._call_rate.totals / MICRO
+        # Handle time of the pooled calls, weighted by call rate
+        handle_time = np.divide(traffic * 3600, calls_per_hour, out=np.ones_like(traffic), where=calls_per_hour > 0)
+        util_factor = max(self.utilization, 0.01)
+        agents = np.ceil(traffic * 3600 / (3600 * util_factor)).astype(np.int64)
+        agents = np.maximum(agents, self.erlang.agents_array(traffic, handle_time))
+        return ScheduleMatrix.from_cells(self.schedule.customer_names, self.schedule.cells, totals=agents,
+                                         resolution=self.resolution, days=self.days)
+
+    def _schedule_batch(self, batch: RequirementBatch, sign: int = 1):
+        # Same formula as _schedule_requirement, evaluated for every requirement at once.
+        # The float operations are applied in the same order so results are bit-identical.
+        # A sign of -1 retracts the batch instead.
+        n = len(batch)
+        if n == 0:
+            return
+
+        start, end = batch.slot_range(self.resolution)
+        agents = self.agents_needed_array(batch, self.utilization, self.resolution)
+        if self.erlang is not None:
+            agents = np.maximum(agents, self._erlang_agents(batch))
+
+        # Map batch-local customer ids to schedule columns, interning only customers with rows
+        present = np.flatnonzero(np.bincount(batch.customer_ids, minlength=len(batch.customer_names)))
+        columns = np.zeros(len(batch.customer_names), dtype=np.int64)
+        names = [batch.customer_names[c] for c in present.tolist()]
+        if sign < 0:
+            self._check_scheduled(batch, present, names, start, end, agents)
+        columns[present] = self.schedule.intern(names)
+        customer_ids = columns[batch.customer_ids]
+        self.schedule.add_many(customer_ids, start, end, sign * agents)
+        if self.priority_schedules is not None:
+            for priority in np.unique(batch.priority).tolist():
+                rows = batch.priority == priority
+                level = self.priority_schedules[priority - 1]
+                level_columns = np.zeros(len(batch.customer_names), dtype=np.int64)
+                level_present = np.unique(batch.customer_ids[rows])
+                level_columns[level_present] = level.intern([batch.customer_names[c] for c in level_present.tolist()])
+                level.add_many(level_columns[batch.customer_ids[rows]], start[rows], end[rows], sign * agents[rows])
+        if self._pooled:
+            calls_per_hour = batch.calls_per_hour(self.resolution)
+            traffic = np.rint(calls_per_hour * batch.avg_duration_sec / 3600 * MICRO).astype(np.int64)
+            # Interned in the same order as the schedule, so the columns line up
+            self._traffic.intern(names)
+            self._call_rate.intern(names)
+            self._traffic.add_many(customer_ids, start, end, sign * traffic)
+            self._call_rate.add_many(customer_ids, start, end, sign * np.rint(calls_per_hour * MICRO).astype(np.int64))
+
+        counts = np.zeros((len(batch.customer_names), 5), dtype=np.int64)
+        np.add.at(counts, (batch.customer_ids, batch.priority - 1), sign)
+        for c, row in zip(present.tolist(), counts[present].tolist()):
+            self._count_priorities(batch.customer_names[c], row)
+
+    def _check_scheduled(self, batch: RequirementBatch, present: np.ndarray, names: List[str], start: np.ndarray,
+                         end: np.ndarray, agents: np.ndarray):
+        # The check of `remove_requirement` for a whole batch: its agents summed per customer
+        # and slot must not exceed what each customer's column holds
+        columns = []
+        for name in names:
+            customer_id = self.schedule.customer_index(name)
+            if customer_id is None:
+                raise ValueError(f"Customer '{name}' is not scheduled")
+            columns.append(customer_id)
+        local = np.zeros(len(batch.customer_names), dtype=np.int64)
+        local[present] = np.arange(len(present))
+        start, end, source = ScheduleMatrix.wrap_ranges(start, end, self.schedule.slots)
+        rows, agents = local[batch.customer_ids][source], agents[source]
+        diff = np.zeros((self.schedule.slots + 1, len(present)), dtype=np.int64)
+        np.add.at(diff, (start, rows), agents)
+        np.add.at(diff, (end, rows), -agents)
+        short = self.schedule.cells[:, columns] < np.cumsum(diff[:-1], axis=0)
+        if short.any():
+            name = names[int(np.flatnonzero(short.any(axis=0))[0])]
+            raise ValueError(f"Requirements for '{name}' are not all scheduled")
+
+    def _erlang_agents(self, batch: RequirementBatch) -> np.ndarray:
+        # Same traffic as `_agents_needed` (workload_seconds / 3600), so the memo keys match
+        traffic = batch.calls_per_hour(self.resolution) * batch.avg_duration_sec / 3600
+        return self.erlang.agents_array(traffic, batch.avg_duration_sec)
+
+    @staticmethod
+    def agents_needed_array(batch: RequirementBatch, utilization, resolution: int = 60) -> np.ndarray:
+        """Agents per hour for every requirement in `batch`.
+
+        `utilization` may be a single value, giving one agent count per requirement, or a
+        1-D array, giving a (utilizations x requirements) table. The float operations match
+        `_agents_needed` step for step, so the results are identical.
+        """
+        # Protect against div by zero if utilization is passed as 0.0
+        util_factor = np.maximum(np.asarray(utilization, dtype=np.float64), 0.01)
+        workload_seconds = batch.calls_per_hour(resolution) * batch.avg_duration_sec
+        agent_capacity = 3600 * util_factor
+        return np.ceil(workload_seconds / agent_capacity[..., np.newaxis]).astype(np.int64)
+
+
+def _schedule_shard(options: tuple, batch: RequirementBatch) -> Tuple[ScheduleMatrix, Optional[ScheduleMatrix],
+                                                                      Optional[ScheduleMatrix], Dict[str, List[int]],
+                                                                      Optional[List[ScheduleMatrix]]]:
+    # Runs in a pool worker of `Scheduler.process_sharded`: the partial schedule of one slice
+    utilization, engine, resolution, days, erlang, by_priority = options
+    scheduler = Scheduler(utilization=utilization, engine=engine, resolution=resolution, days=days,
+                          erlang=ErlangC(*erlang) if erlang is not None else None, by_priority=by_priority)
+    scheduler.process_requirements(batch)
+    if scheduler._pooled:
+        return (scheduler.schedule, scheduler._traffic, scheduler._call_rate, scheduler._priority_rows,
+                scheduler.priority_schedules)
+    return scheduler.schedule, None, None, scheduler._priority_rows, scheduler.priority_schedules
@@ -0,0 +1,61 @@
+from typing import Dict, Literal
+from pydantic import BaseModel, Field, model_validator
+from .models import MINUTES_PER_DAY
+
+# Pydantic models, kept out of `models` so that runs which never validate a row (the numpy
+# engine, cache hits, `--help`) do not import pydantic; `models` re-exports them on first use.
+
+
+class CallRequirement(BaseModel):
+    customer_name: str
+    avg_duration_sec: int = Field(gt=0)
+    start_hour: int = Field(ge=0, le=23)
+    end_hour: int = Field(ge=0, le=24)
+    total_calls: int = Field(gt=0)
+    priority: Literal[1, 2, 3, 4, 5]
+    # Minutes past start_hour / end_hour, for sub-hour schedules
+    start_minute: int = Field(default=0, ge=0, le=59)
+    end_minute: int = Field(default=0, ge=0, le=59)
+    # Day of the horizon the window starts / ends on; an overnight window ends a day later
+    start_day: int = Field(default=0, ge=0)
+    end_day: int = Field(default=0, ge=0)
+
+    @model_validator(mode="after")
+    def validate_window(self):
+        if self.end_day == self.start_day and self.end_hour < self.start_hour:
+            raise ValueError("end_hour must be > start_hour")
+        if self.end_hour == 24 and self.end_minute:
+            raise ValueError("end_minute must be 0 when end_hour is 24")
+        if self.end_offset <= self.start_offset:
+            raise ValueError("end time must be after start time")
+        return self
+
+    @property
+    def start_offset(self) -> int:
+        """Start as minutes after midnight of day 0."""
+        return self.start_day * MINUTES_PER_DAY + self.start_hour * 60 + self.start_minute
+
+    @property
+    def end_offset(self) -> int:
+        """End as minutes after midnight of day 0 (1440 for the end of day 0)."""
+        return self.end_day * MINUTES_PER_DAY + self.end_hour * 60 + self.end_minute
+
+    @property
+    def active_duration_hours(self):
+        return (self.end_offset - self.start_offset) / 60
+
+    @property
+    def calls_per_hour(self):
+        if self.active_duration_hours <= 0:
+            return 0
+        return self.total_calls / self.active_duration_hours
+    
+
+class HourlyStat(BaseModel):
+    hour: int = Field(ge=0, le=23, strict=True)
+    total_agents: int = Field(default=0, ge=0, strict=True)
+    breakdown: Dict[str, int] = Field(default_factory=dict)
+    # Start of the slot within the hour when the schedule is finer than hourly
+    minute: int = Field(default=0, ge=0, le=59, strict=True)
+    # Day of the horizon for schedules longer than a day
+    day: int = Field(default=0, ge=0, strict=True)
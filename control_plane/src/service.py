@@ -0,0 +1,501 @@
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlsplit
+from pydantic import ValidationError
+from .allocator import CapacityAllocator, Allocation
+from .erlang import ErlangC
+from .formatter import Formatter
+from .main import RESOLUTIONS
+from .models import RequirementBatch, ScheduleMatrix
+from .parser import InputParser
+from .scheduler import Scheduler
+from .schemas import CallRequirement
+
+FORMATS = ("text", "json", "csv")
+CONTENT_TYPES = {"text": "text/plain; charset=utf-8", "json": "application/json", "csv": "text/csv; charset=utf-8"}
+# Largest request body accepted
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# Seconds the rest of a turned away request may take to arrive before its connection is closed
+BUSY_TIMEOUT = 1.0
+# Turned away connections whose rest is read off at once; beyond that they are closed straight away
+BUSY_CONNECTIONS = 64
+# Seconds a session may go unused before it is dropped
+SESSION_TTL = 3600.0
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Expose-Headers": "X-Skipped-Rows",
+}
+
+
+class RequestError(Exception):
+    """A request the service rejects, with the HTTP status to answer it with."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes = b""
+    content_type: str = CONTENT_TYPES["json"]
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = HTTPStatus.OK) -> "Response":
+        return cls(status, json.dumps(data).encode())
+
+
+class Session:
+    """A scheduler kept between requests so requirements can be sent as deltas."""
+
+    def __init__(self, scheduler: Scheduler):
+        self.scheduler = scheduler
+        self.lock = threading.Lock()
+        # time.monotonic() of the last request to the session
+        self.last_used = time.monotonic()
+
+
+class SchedulerService:
+    """Scheduling over a local HTTP/JSON API, without paying interpreter start-up per run.
+
+    `POST /schedule` schedules an uploaded input (the CSV format of the command line, or a
+    JSON list of `CallRequirement` objects) and answers with the schedule. Sessions keep
+    a `Scheduler` between requests and take deltas:
+
+        POST   /sessions                          new session (scheduler options)
+        GET    /sessions/<id>/schedule            the current schedule
+        POST   /sessions/<id>/requirements        add requirements
+        DELETE /sessions/<id>/requirements        retract requirements added earlier
+        PUT    /sessions/<id>/customers/<name>    replace one customer's requirements
+        DELETE /sessions/<id>/customers/<name>    drop one customer
+        DELETE /sessions/<id>                     end the session
+
+    Options are query parameters named like the command line flags (`utilization`,
+    `engine`, `resolution`, `days`, `wrap`, `service_level`, `answer_time`, `pooled`, and
+    for output `format`, `fold`, `capacity`). `ErlangC` instances are shared between
+    requests with the same service level, so their memo stays warm (their memo writes
+    are locked, as requests run on several worker threads).
+
+    Sessions unused for `session_ttl` seconds are dropped, so abandoned ones do not hold
+    `max_sessions` slots forever.
+    """
+
+    def __init__(self, max_sessions: int = 64, session_ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self._sessions: Dict[str, Session] = {}
+        self._erlang: Dict[Tuple[float, float, bool], ErlangC] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, body: bytes = b"", content_type: str = "") -> Response:
+        """Answer one request; never raises."""
+        url = urlsplit(path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            return self._route(method, parts, query, body, content_type)
+        except RequestError as e:
+            return Response.json({"error": str(e)}, e.status)
+        except Exception:
+            traceback.print_exc()
+            return Response.json({"error": "internal error"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def _route(self, method: str, parts: List[str], query: Dict[str, str], body: bytes, content_type: str) -> Response:
+        if parts == ["health"] and method == "GET":
+            return Response.json({"status": "ok", "sessions": len(self._sessions)})
+        if parts == ["schedule"] and method == "POST":
+            scheduler = self._scheduler(query, "capacity" in query)
+            requirements, skipped = self._requirements(body, content_type, query, scheduler.days)
+            self._process(scheduler, requirements)
+            response = self._render(scheduler, query)
+            response.headers["X-Skipped-Rows"] = str(skipped)
+            return response
+        if parts == ["sessions"] and method == "POST":
+            # The capacity comes with each later read of the schedule, so sessions always keep the priorities
+            scheduler = self._scheduler(query, True)
+            skipped = 0
+            if body:
+                requirements, skipped = self._requirements(body, content_type, query, scheduler.days)
+                self._process(scheduler, requirements)
+            session_id = uuid.uuid4().hex
+            with self._lock:
+                self._expire_sessions()
+                if len(self._sessions) >= self.max_sessions:
+                    raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, f"Too many sessions (at most {self.max_sessions})")
+                self._sessions[session_id] = Session(scheduler)
+            return Response.json({"id": session_id, "skipped_rows": skipped}, HTTPStatus.CREATED)
+        if len(parts) >= 2 and parts[0] == "sessions":
+            return self._session_route(method, parts[1], parts[2:], query, body, content_type)
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} /{'/'.join(parts)}")
+
+    def _session_route(self, method: str, session_id: str, rest: List[str], query: Dict[str, str], body: bytes,
+                       content_type: str) -> Response:
+        with self._lock:
+            self._expire_sessions()
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown session '{session_id}'")
+        session.last_used = time.monotonic()
+        if not rest and method == "DELETE":
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            return Response(HTTPStatus.NO_CONTENT)
+        if rest == ["schedule"] and method == "GET":
+            with session.lock:
+                return self._render(session.scheduler, query)
+
+        skipped = 0
+        if rest == ["requirements"] and method in ("POST", "DELETE"):
+            requirements, skipped = self._requirements(body, content_type, query, session.scheduler.days)
+            with session.lock:
+                if method == "POST":
+                    self._process(session.scheduler, requirements)
+                else:
+                    self._retract(session.scheduler, requirements)
+        elif len(rest) == 2 and rest[0] == "customers" and method in ("PUT", "DELETE"):
+            requirements = []
+            if method == "PUT":
+                requirements, skipped = self._requirements(body, content_type, query, session.scheduler.days)
+            with session.lock:
+                try:
+                    session.scheduler.replace_customer(rest[1], self._each(requirements))
+                except ValueError as e:
+                    raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        else:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} /sessions/{session_id}/{'/'.join(rest)}")
+        with session.lock:
+            customers = len(session.scheduler.customers)
+        return Response.json({"id": session_id, "customers": customers, "skipped_rows": skipped})
+
+    def _expire_sessions(self):
+        # Called with self._lock held
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id in [key for key, session in self._sessions.items() if session.last_used < cutoff]:
+            del self._sessions[session_id]
+
+    def _scheduler(self, query: Dict[str, str], by_priority: bool) -> Scheduler:
+        resolution = self._option(query, "resolution", int, 60)
+        if resolution not in RESOLUTIONS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"resolution must be one of {RESOLUTIONS}")
+        utilization = self._option(query, "utilization", float, 1.0)
+        if utilization <= 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "utilization must be positive")
+        service_level = self._option(query, "service_level", float, None)
+        pooled = self._flag(query, "pooled")
+        erlang = None
+        if service_level is not None:
+            erlang = self._shared_erlang(service_level, self._option(query, "answer_time", float, 20.0), pooled)
+        elif pooled:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "pooled needs service_level")
+        try:
+            return Scheduler(utilization=utilization, engine=query.get("engine", "numpy"), resolution=resolution,
+                             days=self._option(query, "days", int, 1), erlang=erlang, by_priority=by_priority)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+
+    def _shared_erlang(self, service_level: float, answer_time: float, pooled: bool) -> ErlangC:
+        key = (service_level, answer_time, pooled)
+        with self._lock:
+            erlang = self._erlang.get(key)
+            if erlang is None:
+                try:
+                    erlang = ErlangC(service_level, answer_time, pooled=pooled)
+                except ValueError as e:
+                    raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+                self._erlang[key] = erlang
+        return erlang
+
+    def _requirements(self, body: bytes, content_type: str, query: Dict[str, str],
+                      days: int) -> Tuple[Union[RequirementBatch, List[CallRequirement]], int]:
+        """Requirements of a request body, and how many CSV rows were skipped as invalid (or longer than `days`)."""
+        if len(body) > MAX_BODY_BYTES:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body is larger than {MAX_BODY_BYTES} bytes")
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be UTF-8")
+        if content_type.split(";")[0].strip() == "application/json":
+            try:
+                items = json.loads(text)
+                if not isinstance(items, list):
+                    raise ValueError("expected a list of requirements")
+                return [CallRequirement.model_validate(item) for item in items], 0
+            except ValidationError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid requirement: {e}")
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {e}")
+        # Anything else is the CSV input of the command line; bad rows are skipped like there
+        errors = []
+        try:
+            batch = InputParser.parse_csv_batch(io.StringIO(text, newline=""), allow_wrap=self._flag(query, "wrap"),
+                                                errors=errors, days=days)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        return batch, len(errors)
+
+    @staticmethod
+    def _process(scheduler: Scheduler, requirements: Union[RequirementBatch, List[CallRequirement]]):
+        try:
+            scheduler.process_requirements(requirements)
+        except ValueError as e:
+            # A window longer than the horizon
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{e}; pass a longer days")
+
+    @staticmethod
+    def _retract(scheduler: Scheduler, requirements: Union[RequirementBatch, List[CallRequirement]]):
+        # All or nothing: on the first requirement that is not scheduled, restore the ones already retracted
+        removed = []
+        for req in SchedulerService._each(requirements):
+            try:
+                scheduler.remove_requirement(req)
+            except ValueError as e:
+                for done in removed:
+                    scheduler.add_requirement(done)
+                raise RequestError(HTTPStatus.CONFLICT, str(e))
+            removed.append(req)
+
+    @staticmethod
+    def _each(requirements: Union[RequirementBatch, List[CallRequirement]]) -> List[CallRequirement]:
+        if isinstance(requirements, RequirementBatch):
+            return list(requirements.to_requirements())
+        return requirements
+
+    def _render(self, scheduler: Scheduler, query: Dict[str, str]) -> Response:
+        fmt = query.get("format", "json")
+        if fmt not in FORMATS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"format must be one of {FORMATS}")
+        fold = query.get("fold")
+        if fold is not None and fold not in ScheduleMatrix.FOLDS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"fold must be one of {ScheduleMatrix.FOLDS}")
+        capacity = self._option(query, "capacity", int, None)
+
+        out = io.StringIO(newline="")
+        if capacity is not None:
+            if capacity < 0 or fmt == "csv":
+                raise RequestError(HTTPStatus.BAD_REQUEST, "capacity must not be negative and needs format text or json")
+            if scheduler.erlang is not None and scheduler.erlang.pooled:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "capacity cannot be combined with pooled")
+            allocation = CapacityAllocator(capacity).allocate(scheduler.schedule, scheduler.priorities,
+                                                              scheduler.priority_schedules)
+            if fold:
+                allocation = Allocation(allocation.allocated.fold(fold), allocation.shortfall.fold(fold))
+            if fmt == "json":
+                Formatter.print_allocation_json(allocation, out)
+            else:
+                Formatter.print_allocation_text(allocation, out)
+        else:
+            pooled = scheduler.erlang is not None and scheduler.erlang.pooled
+            schedule = scheduler.pooled_schedule() if pooled else scheduler.schedule
+            if fold:
+                schedule = schedule.fold(fold)
+            if fmt == "json":
+                Formatter.print_json(schedule, out)
+            elif fmt == "csv":
+                Formatter.write_csv(schedule, out, scheduler.customers)
+            else:
+                Formatter.print_text(schedule, out)
+        return Response(HTTPStatus.OK, out.getvalue().encode(), CONTENT_TYPES[fmt])
+
+    @staticmethod
+    def _option(query: Dict[str, str], name: str, convert, default):
+        if name not in query:
+            return default
+        try:
+            return convert(query[name])
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid {name} '{query[name]}'")
+
+    @staticmethod
+    def _flag(query: Dict[str, str], name: str) -> bool:
+        return query.get(name, "false").lower() in ("1", "true", "yes")
+
+
+class SchedulerHTTPServer(HTTPServer):
+    """HTTP server that answers requests on a fixed pool of worker threads.
+
+    At most `workers` requests run at once and `backlog` more wait for a worker; beyond
+    that new connections get 503 straight away instead of queueing without bound. They
+    are answered before anything is read from them, so a client that is slow to send its
+    request cannot hold up the accept loop.
+    """
+
+    def __init__(self, address: Tuple[str, int], service: SchedulerService, workers: int = 4, backlog: int = 16,
+                 quiet: bool = False):
+        super().__init__(address, _Handler)
+        self.service = service
+        # Skip the per-request access log on stderr
+        self.quiet = quiet
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler")
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+        # Reads off what turned away clients still send (see `_turn_away`), off the accept thread
+        self._busy_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="busy")
+        self._busy = threading.BoundedSemaphore(BUSY_CONNECTIONS)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._turn_away(request)
+            return
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _turn_away(self, request):
+        # Answer 503 without reading the request, which would let a slow client stall the
+        # accept loop; the answer fits the empty send buffer, so sending it never waits
+        request.setblocking(False)
+        try:
+            request.send(BUSY_RESPONSE)
+        except OSError:
+            pass
+        if self._busy.acquire(blocking=False):
+            # Closing with the request unread would reset the connection before the client reads the answer
+            self._busy_pool.submit(self._discard, request)
+        else:
+            self.shutdown_request(request)
+
+    def _discard(self, request):
+        # Read until the client is done or BUSY_TIMEOUT has passed, then close
+        deadline = time.monotonic() + BUSY_TIMEOUT
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                request.settimeout(remaining)
+                if not request.recv(1 << 16):
+                    break
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+            self._busy.release()
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+        self._busy_pool.shutdown(wait=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "SchedulerService"
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_OPTIONS(self):
+        # CORS preflight
+        self._send(Response(HTTPStatus.NO_CONTENT))
+
+    def _content_length(self) -> Optional[int]:
+        # The declared body length, or None when it is not a non-negative integer
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return None
+        return length if length >= 0 else None
+
+    def _dispatch(self):
+        length = self._content_length()
+        if length is None:
+            # The body cannot be told apart from a next request, so the connection ends here
+            self.close_connection = True
+            self._send(Response.json({"error": "Content-Length must be a non-negative integer"},
+                                     HTTPStatus.BAD_REQUEST))
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(Response.json({"error": f"Request body is larger than {MAX_BODY_BYTES} bytes"},
+                                     HTTPStatus.REQUEST_ENTITY_TOO_LARGE))
+            return
+        body = self.rfile.read(length) if length else b""
+        self._send(self.server.service.handle(self.command, self.path, body, self.headers.get("Content-Type", "")))
+
+    def _send(self, response: Response):
+        self.send_response(response.status)
+        for name, value in {**CORS_HEADERS, **response.headers}.items():
+            self.send_header(name, value)
+        if response.status != HTTPStatus.NO_CONTENT:
+            self.send_header("Content-Type", response.content_type)
+            self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+
+def _encode(response: Response) -> bytes:
+    # The whole HTTP/1.1 message of a response that closes its connection
+    lines = [f"HTTP/1.1 {response.status} {HTTPStatus(response.status).phrase}"]
+    headers = {**CORS_HEADERS, **response.headers, "Content-Type": response.content_type,
+               "Content-Length": str(len(response.body)), "Connection": "close"}
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + response.body
+
+
+# Sent to connections that arrive while every worker and backlog slot is taken
+BUSY_RESPONSE = _encode(Response.json({"error": "All workers are busy, try again later"},
+                                      HTTPStatus.SERVICE_UNAVAILABLE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Call Scheduler service")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8081, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=4, help="Requests handled at once")
+    parser.add_argument("--backlog", type=int, default=16, help="Requests that may wait for a worker before new ones get 503")
+    parser.add_argument("--max-sessions", type=int, default=64, help="Sessions kept at once")
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL,
+                        help="Seconds a session may go unused before it is dropped")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request to stderr")
+    args = parser.parse_args()
+    if args.workers < 1 or args.backlog < 0 or args.max_sessions < 1:
+        parser.error("--workers and --max-sessions must be at least 1, --backlog must not be negative")
+    if args.session_ttl <= 0:
+        parser.error("--session-ttl must be positive")
+
+    server = SchedulerHTTPServer((args.host, args.port), SchedulerService(args.max_sessions, args.session_ttl), args.workers, args.backlog,
+                                 args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
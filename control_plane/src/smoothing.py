@@ -0,0 +1,243 @@
+import json
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .erlang import ErlangC
+from .models import MINUTES_PER_DAY, RequirementBatch, ScheduleMatrix
+from .scenarios import match_customers
+from .scheduler import Scheduler
+
+# Keys of an entry in a flexibility file; the `_hours` keys are converted to minutes
+FLEXIBLE_KEYS = ("customers", "max_shift_minutes", "max_shift_hours", "max_stretch_minutes", "max_stretch_hours")
+# Passes over the flexible customers without a move of a more urgent one before giving up
+# on reaching a fixed point
+MAX_PASSES = 8
+
+
+@dataclass
+class Flexibility:
+    """How far the windows of the customers matching `customers` may move.
+
+    Every window of a customer moves together: earlier or later by up to
+    `max_shift_minutes`, and its end later by up to `max_stretch_minutes`, spreading the
+    same calls over more slots. Both are used in whole slots of the schedule.
+    """
+    customers: List[str]
+    max_shift_minutes: int = 0
+    max_stretch_minutes: int = 0
+
+
+@dataclass
+class Move:
+    """The change made to one flexible customer's windows."""
+    customer: str
+    priority: int
+    shift_minutes: int
+    stretch_minutes: int
+
+
+@dataclass
+class Smoothing:
+    """The schedule before and after smoothing, and the moves between them."""
+    before: ScheduleMatrix
+    after: ScheduleMatrix
+    moves: List[Move] = field(default_factory=list)
+    priorities: Dict[str, int] = field(default_factory=dict)
+
+
+class PeakSmoother:
+    """Moves the windows of flexible customers to lower the peak of the schedule's totals.
+
+    A customer's agents per slot are additive, so each of its placements (a shift of
+    -S..S slots and a stretch of 0..K slots) is a rotation of one of K + 1 profiles,
+    scheduled once up front. The search is a greedy local search: the customers are
+    taken one at a time, lowest priority (5) first and larger demand first within a
+    priority. Each is taken out of the totals and put back at the placement with the
+    lowest peak, then the lowest sum of squared totals (the flattest schedule), then the
+    smallest move.
+
+    Priority is a constraint, not just an order: a pass only goes on to a more urgent
+    priority when nobody less urgent moved in it, so it is reached only once no less
+    urgent move can lower the peak, and customers other than the least urgent ones only
+    move when that lowers the peak. After such a move the pass starts over from the least
+    urgent customers. Every move lowers the peak or keeps it and flattens the schedule, so
+    the search ends; it gives up after `MAX_PASSES` passes without a more urgent move.
+
+    A pass costs O(customers x placements x slots), evaluated with numpy a customer at a
+    time. Pooled Erlang C staffing is not additive per customer and is not supported.
+    """
+
+    def __init__(self, flexible: Sequence[Flexibility], utilization: float = 1.0, engine: str = "numpy",
+                 resolution: int = 60, days: int = 1, erlang: Optional[ErlangC] = None):
+        if erlang is not None and erlang.pooled:
+            raise ValueError("peak smoothing needs per-customer staffing and cannot use pooled Erlang C")
+        self.flexible = list(flexible)
+        self.utilization = utilization
+        self.engine = engine
+        self.resolution = resolution
+        self.days = days
+        self.erlang = erlang
+
+    @staticmethod
+    def load(path: str) -> List[Flexibility]:
+        """Read a JSON flexibility file: a list of entries, or an object with a `flexible` list.
+
+        An entry is `{"customers": ["CVS", "Customer 0*"], "max_shift_hours": 2,
+        "max_stretch_hours": 1}`. A customer matched by several entries takes the last one.
+        """
+        with open(path, encoding="utf-8-sig") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not valid JSON: {e}")
+        if isinstance(data, dict):
+            data = data.get("flexible")
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a list of entries or an object with a 'flexible' list")
+        return [_flexibility(entry, i) for i, entry in enumerate(data)]
+
+    def smooth(self, batch: RequirementBatch) -> Smoothing:
+        """Schedule `batch`, then move the flexible customers' windows; raises ValueError."""
+        scheduler = self._scheduler(self.engine)
+        scheduler.process_requirements(batch)
+        before = scheduler.schedule
+        slots = before.slots
+        shifts, stretches = self._limits(batch, slots)
+        flexible = np.flatnonzero((shifts > 0) | (stretches > 0))
+        if flexible.size == 0:
+            return Smoothing(before, before, [], dict(scheduler.priorities))
+
+        profiles = self._profiles(batch, flexible, stretches, slots)
+        priorities = np.array([scheduler.priorities[batch.customer_names[c]] for c in flexible.tolist()])
+        placements = self._search(before.totals.astype(np.int64), profiles, shifts[flexible], stretches[flexible],
+                                  priorities, np.lexsort((-profiles[:, 0].max(axis=1), -priorities)))
+
+        moves = []
+        shift_minutes = np.zeros(len(batch.customer_names), dtype=np.int64)
+        stretch_minutes = np.zeros(len(batch.customer_names), dtype=np.int64)
+        for i, (shift, stretch) in enumerate(placements.tolist()):
+            if shift or stretch:
+                c = int(flexible[i])
+                shift_minutes[c], stretch_minutes[c] = shift * self.resolution, stretch * self.resolution
+                moves.append(Move(batch.customer_names[c], int(priorities[i]), int(shift_minutes[c]),
+                                  int(stretch_minutes[c])))
+        after = self._scheduler(self.engine)
+        after.process_requirements(self._moved(batch, shift_minutes, stretch_minutes))
+        return Smoothing(before, after.schedule, moves, dict(scheduler.priorities))
+
+    def _scheduler(self, engine: str) -> Scheduler:
+        return Scheduler(utilization=self.utilization, engine=engine, resolution=self.resolution, days=self.days,
+                         erlang=self.erlang)
+
+    def _limits(self, batch: RequirementBatch, slots: int):
+        # Slots every customer may shift and stretch by (0 for customers that are not flexible)
+        n = len(batch.customer_names)
+        shifts, stretches = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+        for flexibility in self.flexible:
+            ids = match_customers(flexibility.customers, batch.customer_names)
+            shifts[ids] = flexibility.max_shift_minutes // self.resolution
+            stretches[ids] = flexibility.max_stretch_minutes // self.resolution
+        # A shift all the way round the horizon changes nothing, and a stretched window must still fit it
+        shifts = np.minimum(shifts, slots // 2)
+        start, end = batch.slot_range(self.resolution)
+        longest = np.zeros(n, dtype=np.int64)
+        np.maximum.at(longest, batch.customer_ids, end - start)
+        return shifts, np.clip(slots - longest, 0, stretches)
+
+    def _profiles(self, batch: RequirementBatch, flexible: np.ndarray, stretches: np.ndarray,
+                  slots: int) -> np.ndarray:
+        # (flexible customers, stretch, slot) agents of every flexible customer with its windows stretched
+        profiles = np.zeros((flexible.size, int(stretches.max()) + 1, slots), dtype=np.int64)
+        column = np.full(len(batch.customer_names), -1, dtype=np.int64)
+        column[flexible] = np.arange(flexible.size)
+        columns = {batch.customer_names[c]: i for i, c in enumerate(flexible.tolist())}
+        row_stretches = np.where(column[batch.customer_ids] >= 0, stretches[batch.customer_ids], -1)
+        for stretch in range(profiles.shape[1]):
+            rows = batch.select(row_stretches >= stretch)
+            rows = replace(rows, end_minute=rows.end_minute + stretch * self.resolution)
+            # The numpy engine gives the same agents as the python one, and schedules many rows faster
+            scheduler = self._scheduler("numpy")
+            scheduler.process_requirements(rows)
+            names = scheduler.schedule.customer_names
+            if names:
+                profiles[[columns[name] for name in names], stretch] = scheduler.schedule.cells.T
+        return profiles
+
+    @staticmethod
+    def _search(totals: np.ndarray, profiles: np.ndarray, shifts: np.ndarray, stretches: np.ndarray,
+                priorities: np.ndarray, order: np.ndarray) -> np.ndarray:
+        # (shift, stretch) in slots of every flexible customer; `totals` includes them unmoved.
+        # `order` runs from the least urgent priority to the most urgent
+        slots = totals.size
+        placements = np.zeros((len(profiles), 2), dtype=np.int64)
+        least_urgent = int(priorities.max())
+        # Per (max shift, max stretch): the slots each shift reads from and how far each placement moves
+        layouts = {}
+        passes = 0
+        while passes < MAX_PASSES:
+            passes += 1
+            moved = False
+            for i in order.tolist():
+                urgent = int(priorities[i]) < least_urgent
+                if urgent and moved:
+                    # Settle the less urgent customers before a more urgent one may move
+                    break
+                limits = (int(shifts[i]), int(stretches[i]))
+                if limits not in layouts:
+                    offsets = np.arange(-limits[0], limits[0] + 1)
+                    distance = np.abs(offsets) + np.arange(limits[1] + 1)[:, np.newaxis]
+                    layouts[limits] = ((np.arange(slots) - offsets[:, np.newaxis]) % slots, distance.ravel())
+                rotations, distance = layouts[limits]
+                # candidates[stretch * shifts + shift, t] = profile[stretch, t - shift], rotating round the horizon
+                candidates = profiles[i, :limits[1] + 1][:, rotations].reshape(-1, slots)
+                shift, stretch = placements[i].tolist()
+                current = stretch * rotations.shape[0] + shift + limits[0]
+                rest = totals - candidates[current]
+                peak = (rest + candidates).max(axis=1)
+                squares = (candidates * (2 * rest + candidates)).sum(axis=1)
+                best = int(np.lexsort((distance, squares, peak))[0])
+                if best == current or (urgent and peak[best] >= peak[current]):
+                    continue
+                totals = rest + candidates[best]
+                new_stretch, new_shift = divmod(best, rotations.shape[0])
+                placements[i] = new_shift - limits[0], new_stretch
+                moved = True
+                if urgent:
+                    # Start over from the least urgent customers, whose best placements may have changed
+                    passes = 0
+                    break
+            if not moved:
+                break
+        return placements
+
+    def _moved(self, batch: RequirementBatch, shift_minutes: np.ndarray,
+               stretch_minutes: np.ndarray) -> RequirementBatch:
+        # `batch` with every customer's windows moved, starts kept within the horizon
+        horizon = self.days * MINUTES_PER_DAY
+        length = batch.end_minute - batch.start_minute + stretch_minutes[batch.customer_ids]
+        start = (batch.start_minute + shift_minutes[batch.customer_ids]) % horizon
+        return replace(batch, start_minute=start, end_minute=start + length)
+
+
+def _flexibility(entry, index: int) -> Flexibility:
+    # One entry of a flexibility file, checked key by key
+    if not isinstance(entry, dict):
+        raise ValueError(f"Flexible entry {index + 1}: expected an object")
+    unknown = set(entry) - set(FLEXIBLE_KEYS)
+    if unknown:
+        raise ValueError(f"Flexible entry {index + 1}: unknown keys {sorted(unknown)}, expected {list(FLEXIBLE_KEYS)}")
+    customers = entry.get("customers")
+    if isinstance(customers, str):
+        customers = [customers]
+    if not isinstance(customers, list) or not customers or not all(isinstance(c, str) for c in customers):
+        raise ValueError(f"Flexible entry {index + 1}: 'customers' must be a name or a non-empty list of names")
+    limits = []
+    for kind in ("shift", "stretch"):
+        minutes, hours = entry.get(f"max_{kind}_minutes", 0), entry.get(f"max_{kind}_hours", 0)
+        for value in (minutes, hours):
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"Flexible entry {index + 1}: max_{kind} must be a non-negative number, got {value!r}")
+        limits.append(int(minutes + hours * 60))
+    if not any(limits):
+        raise ValueError(f"Flexible entry {index + 1}: give a max_shift or a max_stretch")
+    return Flexibility(customers, *limits)
@@ -0,0 +1,63 @@
+from decimal import Decimal, InvalidOperation
+from typing import List, Sequence
+import numpy as np
+from .models import MINUTES_PER_DAY, RequirementBatch, ScheduleMatrix
+from .scheduler import Scheduler
+
+
+class UtilizationSweep:
+    """Per-slot totals for many utilization values from a single parse.
+
+    Agents for every (utilization, requirement) pair come out of one broadcast of
+    `Scheduler.agents_needed_array`, and the buckets of all utilizations are filled
+    together with a difference array, so each value matches a separate `Scheduler` run.
+    """
+    # Requirements per broadcast; bounds the (utilizations x requirements) intermediate
+    CHUNK_SIZE = 65536
+
+    def __init__(self, utilizations: Sequence[float], resolution: int = 60, days: int = 1):
+        self.utilizations = list(utilizations)
+        self.resolution = resolution
+        self.days = days
+        self.slots = days * MINUTES_PER_DAY // resolution
+        self.totals = np.zeros((len(self.utilizations), self.slots), dtype=np.int64)
+
+    @staticmethod
+    def parse_range(spec: str) -> List[float]:
+        """Expand 'start:stop:step' (stop inclusive) into utilization values.
+
+        Steps are taken in decimal so that '0.6:1.0:0.01' yields exactly the floats that
+        `--utilization 0.61` etc. would, with no binary rounding drift.
+        """
+        try:
+            start, stop, step = (Decimal(part) for part in spec.split(":"))
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"Invalid utilization range '{spec}', expected start:stop:step")
+        if step <= 0 or stop < start:
+            raise ValueError(f"Invalid utilization range '{spec}', expected start <= stop and step > 0")
+        values = []
+        value = start
+        while value <= stop:
+            values.append(float(value))
+            value += step
+        return values
+
+    def process_batch(self, batch: RequirementBatch):
+        for offset in range(0, len(batch), self.CHUNK_SIZE):
+            chunk = batch.select(slice(offset, offset + self.CHUNK_SIZE))
+            agents = Scheduler.agents_needed_array(chunk, self.utilizations, self.resolution)
+            start, end, source = ScheduleMatrix.wrap_ranges(*chunk.slot_range(self.resolution), self.slots)
+            agents = agents[:, source]
+            diff = np.zeros((len(self.utilizations), self.slots + 1), dtype=np.int64)
+            np.add.at(diff, (slice(None), start), agents)
+            np.add.at(diff, (slice(None), end), -agents)
+            self.totals += np.cumsum(diff[:, :-1], axis=1)
+
+    def fold(self, how: str = "sum"):
+        """Collapse the horizon into a one-day profile, like `ScheduleMatrix.fold`."""
+        if how not in ScheduleMatrix.FOLDS:
+            raise ValueError(f"Unknown fold '{how}', expected one of {ScheduleMatrix.FOLDS}")
+        reduce = np.sum if how == "sum" else np.max
+        self.totals = reduce(self.totals.reshape(len(self.utilizations), self.days, -1), axis=1)
+        self.slots //= self.days
+        self.days = 1
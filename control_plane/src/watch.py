@@ -0,0 +1,227 @@
+import io
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from .models import RequirementBatch, ScheduleMatrix
+from .parser import InputParser, RejectReport
+from .scheduler import Scheduler
+
+# Files are compared this many bytes at a time before narrowing down to the first difference
+BLOCK = 1 << 16
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.5
+
+
+class InputWatcher:
+    """Keeps a live schedule in step with an input file, or the CSV files of a directory.
+
+    The bytes of every file are kept from the last update. When a file changes, only the
+    lines between its common prefix and common suffix with the old bytes are parsed: the
+    old lines there are retracted from the scheduler and the new ones added, so a one-row
+    edit to a large file costs a read and a compare, not a re-parse. Edits far apart in
+    one file are handled as one region spanning both. A changed header, a new file or a
+    deleted one replaces all of that file's rows.
+    """
+
+    def __init__(self, path: str, scheduler: Scheduler, allow_wrap: bool = False):
+        self.path = Path(path)
+        self.scheduler = scheduler
+        self.allow_wrap = allow_wrap
+        # path -> (mtime_ns, size) and bytes as of the last update
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._contents: Dict[Path, bytes] = {}
+
+    def files(self) -> List[Path]:
+        if self.path.is_dir():
+            return sorted(path for path in self.path.glob("*.csv") if path.is_file())
+        return [self.path] if self.path.is_file() else []
+
+    def snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        stats = {}
+        for path in self.files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def update(self) -> bool:
+        """Apply the changes of every file since the last update; True when any file changed."""
+        stats = self.snapshot()
+        changed = False
+        for path in sorted(set(self._contents) - set(stats)):
+            print(f"{path}: removed", file=sys.stderr)
+            self._apply(path, self._contents.pop(path), b"")
+            del self._stats[path]
+            changed = True
+        for path, stat in stats.items():
+            if self._stats.get(path) == stat:
+                continue
+            try:
+                new = path.read_bytes()
+            except FileNotFoundError:
+                continue
+            old = self._contents.get(path, b"")
+            self._stats[path] = stat
+            if new == old:
+                continue
+            # When the new rows cannot be applied, the old ones stay and the next change is diffed against them
+            if self._apply(path, old, new):
+                self._contents[path] = new
+                changed = True
+        return changed
+
+    def watch(self, on_change: Callable[[], None], interval: float = DEFAULT_INTERVAL,
+              debounce: float = DEFAULT_DEBOUNCE, stop: Optional[Callable[[], bool]] = None):
+        """Poll every `interval` seconds and call `on_change` after each applied update.
+
+        A change is only applied once the files have stayed the same for `debounce`
+        seconds, so a burst of writes (or a file copied in several chunks) triggers one update.
+        """
+        # From the files as last applied, so changes made since (e.g. while the first output was written) count
+        seen = dict(self._stats)
+        while not (stop is not None and stop()):
+            time.sleep(interval)
+            current = self.snapshot()
+            if current == seen:
+                continue
+            while True:
+                time.sleep(debounce)
+                settled = self.snapshot()
+                if settled == current:
+                    break
+                current = settled
+            seen = current
+            if self.update():
+                on_change()
+
+    def _apply(self, path: Path, old: bytes, new: bytes) -> bool:
+        # Retract the changed rows of `old` and schedule those of `new`; False if `new` cannot be read
+        old_header, removed, new_header, added = _changed_rows(old, new)
+        try:
+            added_batch = self._parse(new_header, [line for _, line in added], [row for row, _ in added], report=True)
+            # Raises for a window longer than the horizon, before anything is retracted
+            ScheduleMatrix.wrap_ranges(*added_batch.slot_range(self.scheduler.resolution), self.scheduler.schedule.slots)
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"Error: {path}: {e}; keeping its previous rows", file=sys.stderr)
+            return False
+        removed_batch = self._parse(old_header, removed, None, report=False)
+        self.scheduler.remove_requirements(removed_batch)
+        self.scheduler.process_requirements(added_batch)
+        print(f"{path}: {len(removed_batch)} rows retracted, {len(added_batch)} scheduled", file=sys.stderr)
+        return True
+
+    def _parse(self, header: bytes, lines: List[bytes], row_numbers: Optional[List[int]],
+               report: bool) -> RequirementBatch:
+        # Parse some lines of a file; `row_numbers` are their rows in it, for the reported errors
+        if not lines:
+            return RequirementBatch.from_columns([], [], [], [], [], [])
+        rejected = _Rejected(row_numbers)
+        text = header.decode("utf-8-sig") + b"\n".join(lines).decode("utf-8") + "\n"
+        batch = InputParser.parse_csv_batch(io.StringIO(text), allow_wrap=self.allow_wrap, dead_letters=rejected,
+                                              days=self.scheduler.days)
+        if report:
+            rejected.report()
+        return batch
+
+
+class _Rejected:
+    # Collects the rows a parse of changed lines rejects, to report them under their row numbers in the file
+    def __init__(self, row_numbers: Optional[List[int]]):
+        self.row_numbers = row_numbers
+        self.rows: List[Tuple[int, Optional[str]]] = []
+
+    def reject(self, row_idx: int, error: Optional[str], row: Optional[List[str]] = None):
+        self.rows.append((self.row_numbers[row_idx], error))
+
+    def flush(self):
+        # The rows are reported together once the parse is done
+        pass
+
+    def report(self):
+        report = RejectReport()
+        for row_idx, error in sorted(self.rows):
+            if error is None:
+                report.skipped(row_idx)
+            else:
+                report.error(row_idx, error)
+        report.flush()
+
+
+def _changed_rows(old: bytes, new: bytes) -> Tuple[bytes, List[bytes], bytes, List[Tuple[int, bytes]]]:
+    """(old header, lines gone from `old`, new header, (row, line) added in `new`).
+
+    Only the region between the common prefix and suffix of the two is split into lines,
+    and within it only lines whose count changed are returned, so rows that merely moved
+    are left alone.
+    """
+    old_header, new_header = _header(old), _header(new)
+    if old_header != new_header:
+        # Every row of the file changes with its header (or the file is new or gone)
+        return old_header, _lines(old[len(old_header):]), new_header, list(enumerate(_lines(new[len(new_header):])))
+
+    start = max(_common_prefix(old, new), len(new_header))
+    # Back to the start of the line the first difference is on
+    start = new.rfind(b"\n", 0, start) + 1
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+    newline = ord("\n")
+    if suffix and (old[len(old) - suffix - 1] != newline or new[len(new) - suffix - 1] != newline):
+        # Forward to the start of the next line (the suffix is the same bytes in both)
+        line_end = old.find(b"\n", len(old) - suffix)
+        suffix = len(old) - line_end - 1 if line_end != -1 else 0
+    old_lines = _lines(old[start:len(old) - suffix])
+    new_lines = _lines(new[start:len(new) - suffix])
+
+    # Edits in place and appends leave the other lines where they were; rows inserted or
+    # deleted mid-region shift the rest, which the counts below still sort out
+    common = min(len(old_lines), len(new_lines))
+    moved = [i for i, (old_line, new_line) in enumerate(zip(old_lines, new_lines)) if old_line != new_line]
+    candidates = [(i, new_lines[i]) for i in moved] + list(enumerate(new_lines[common:], start=common))
+    counts = Counter([old_lines[i] for i in moved] + old_lines[common:])
+    counts.subtract(line for _, line in candidates)
+    wanted = -counts
+    first_row = new.count(b"\n", 0, start) - 1
+    added = []
+    for i, line in candidates:
+        if wanted[line] > 0:
+            wanted[line] -= 1
+            added.append((first_row + i, line))
+    return old_header, list((+counts).elements()), new_header, added
+
+
+def _lines(rows: bytes) -> List[bytes]:
+    lines = rows.split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    return lines
+
+
+def _header(content: bytes) -> bytes:
+    end = content.find(b"\n")
+    return content if end == -1 else content[:end + 1]
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i:i + BLOCK] == b[i:i + BLOCK]:
+        i += BLOCK
+    if i >= n:
+        return n
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    # Length of the common suffix, at most `limit`
+    la, lb = len(a), len(b)
+    j = 0
+    while j + BLOCK <= limit and a[la - j - BLOCK:la - j] == b[lb - j - BLOCK:lb - j]:
+        j += BLOCK
+    while j < limit and a[la - j - 1] == b[lb - j - 1]:
+        j += 1
+    return j
@@ -4,6 +4,7 @@
 import subprocess
 import sys
 import csv
+import shutil
 from pathlib import Path
 from termcolor import colored
 
@@ -14,6 +15,41 @@ def read_csv(path: Path):
     return rows
 
 
+def check_columnar(input_csv: Path, ground_truth: Path, data_dir: Path) -> bool:
+    """Write every available columnar format, read it back and compare its CSV to ground truth."""
+    formats = ["npy"]
+    try:
+        import pyarrow  # noqa: F401
+        formats += ["arrow", "parquet"]
+    except ImportError:
+        print("pyarrow not installed; checking npy output only")
+    for fmt in formats:
+        columnar_path = data_dir / f"e2e_output.{fmt}"
+        round_trip_path = data_dir / f"e2e_output_{fmt}.csv"
+        try:
+            subprocess.run(
+                [sys.executable, "-m", "src.main", "--input", str(input_csv), "--format", fmt, "--output", str(columnar_path)],
+                check=True, capture_output=True, text=True,
+            )
+            subprocess.run(
+                [sys.executable, "-m", "src.columnar", str(columnar_path), "--format", "csv", "--output", str(round_trip_path)],
+                check=True, capture_output=True, text=True,
+            )
+            matches = round_trip_path.read_bytes() == ground_truth.read_bytes()
+        except subprocess.CalledProcessError as e:
+            print(f"{fmt} round trip failed to run:\n", e.stdout, e.stderr)
+            matches = False
+        finally:
+            shutil.rmtree(columnar_path, ignore_errors=True)
+            for path in (columnar_path, round_trip_path):
+                if path.is_file():
+                    path.unlink()
+        if not matches:
+            print(colored(f"E2E Test FAILED: {fmt} output does not read back as the ground truth", 'red'))
+            return False
+    return True
+
+
 def main():
     script_dir = Path(__file__).resolve().parent
 
@@ -77,12 +113,24 @@ def main():
             pass
         sys.exit(1)
 
+    # The rows match; the bytes (quoting, line endings) must match as well
+    if produced.read_bytes() != ground_truth.read_bytes():
+        print(colored("E2E Test FAILED: produced CSV is not byte-identical to ground truth", 'red'))
+        try:
+            produced.unlink()
+        except Exception:
+            pass
+        sys.exit(1)
+
     # Clean up produced file
     try:
         produced.unlink()
     except Exception as e:
         print(f"Warning: could not delete produced file: {e}")
 
+    if not check_columnar(input_csv, ground_truth, data_dir):
+        sys.exit(1)
+
     print(colored("E2E Test PASSED: produced CSV matches ground truth", 'green'))
     sys.exit(0)
 
@@ -0,0 +1,20 @@
+"""Fixtures shared by the test modules."""
+import unittest
+import tempfile
+from pathlib import Path
+
+# Header line of an input CSV
+HEADER = "CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority\n"
+
+
+class TempDirTestCase(unittest.TestCase):
+    """A test case with a fresh temporary directory, `self.temp`, removed after every test."""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
@@ -0,0 +1,116 @@
+import unittest
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+from src.allocator import CapacityAllocator
+from src.models import CallRequirement, ScheduleMatrix
+from src.scheduler import Scheduler
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestCapacityAllocator(unittest.TestCase):
+    """Unit tests for the CapacityAllocator class"""
+
+    def _schedule(self, demand, days: int = 1) -> ScheduleMatrix:
+        # demand: {customer: agents wanted in every slot}
+        names = list(demand)
+        cells = np.tile(np.array([demand[name] for name in names], dtype=np.int64), (24 * days, 1))
+        return ScheduleMatrix.from_cells(names, cells, days=days)
+
+    def test_enough_capacity_allocates_demand(self):
+        """Test that nothing is cut when the cap covers all demand"""
+        schedule = self._schedule({"A": 5, "B": 7})
+        allocation = CapacityAllocator(12).allocate(schedule, {"A": 1, "B": 2})
+
+        self.assertEqual(allocation.allocated.cells.tolist(), schedule.cells.tolist())
+        self.assertEqual(allocation.shortfall.totals.sum(), 0)
+
+    def test_higher_priority_served_first(self):
+        """Test that priority 1 is met in full before priority 2 gets the rest"""
+        schedule = self._schedule({"Low": 10, "High": 8})
+        allocation = CapacityAllocator(12).allocate(schedule, {"Low": 2, "High": 1})
+
+        self.assertEqual(allocation.allocated[0].breakdown, {"Low": 4, "High": 8})
+        self.assertEqual(allocation.shortfall[0].breakdown, {"Low": 6})
+        self.assertEqual(allocation.allocated[0].total_agents, 12)
+
+    def test_fair_share_within_priority(self):
+        """Test max-min fair sharing, with rounding leftovers going to the first customers"""
+        schedule = self._schedule({"A": 2, "B": 10, "C": 10, "D": 10})
+        allocation = CapacityAllocator(13).allocate(schedule, {"A": 3, "B": 3, "C": 3, "D": 3})
+
+        # A is met in full; the remaining 11 agents split 4/4/3 between B, C and D
+        self.assertEqual(allocation.allocated[0].breakdown, {"A": 2, "B": 4, "C": 4, "D": 3})
+        self.assertEqual(allocation.shortfall[0].breakdown, {"B": 6, "C": 6, "D": 7})
+
+    def test_water_fill_matches_one_by_one_allocation(self):
+        """Test water filling against handing out one agent at a time to the neediest customer"""
+        rng = np.random.default_rng(3)
+        for _ in range(500):
+            demand = rng.integers(0, 20, size=rng.integers(1, 8))
+            if demand.sum() == 0:
+                continue
+            capacity = int(rng.integers(0, demand.sum()))
+            expected = np.zeros_like(demand)
+            for _ in range(capacity):
+                candidates = np.flatnonzero(expected < demand)
+                expected[candidates[np.argmin(expected[candidates])]] += 1
+
+            share = CapacityAllocator.water_fill(demand[np.newaxis, :], np.array([capacity]))[0]
+            self.assertEqual(share.tolist(), expected.tolist())
+
+    def test_capacity_per_slot(self):
+        """Test a cap that differs by slot over a multi-day horizon"""
+        schedule = self._schedule({"A": 6}, days=2)
+        capacity = np.arange(48) % 8
+        allocation = CapacityAllocator(capacity).allocate(schedule, {"A": 1})
+
+        self.assertEqual(allocation.allocated.totals.tolist(), np.minimum(capacity, 6).tolist())
+        self.assertEqual((allocation.allocated.totals + allocation.shortfall.totals).tolist(), schedule.totals.tolist())
+        with self.assertRaises(ValueError):
+            CapacityAllocator(-1).allocate(schedule, {"A": 1})
+
+    def test_scheduler_tracks_priority_per_requirement(self):
+        """Test that a customer's rows are allocated at their own priorities when the scheduler keeps them apart"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=3600, start_hour=9, end_hour=10, total_calls=5, priority=4),
+            CallRequirement(customer_name="A", avg_duration_sec=3600, start_hour=9, end_hour=10, total_calls=5, priority=2),
+            CallRequirement(customer_name="B", avg_duration_sec=3600, start_hour=9, end_hour=10, total_calls=5, priority=3),
+        ]
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine, by_priority=True)
+            scheduler.process_requirements(requirements)
+            self.assertEqual(scheduler.priorities, {"A": 2, "B": 3})
+
+            # Without the split, all of A's demand would be served at priority 2
+            whole = CapacityAllocator(12).allocate(scheduler.schedule, scheduler.priorities)
+            self.assertEqual(whole.allocated[9].breakdown, {"A": 10, "B": 2})
+            # A's priority 2 row, then B, then what is left for A's priority 4 row
+            allocation = CapacityAllocator(12).allocate(scheduler.schedule, scheduler.priorities,
+                                                        scheduler.priority_schedules)
+            self.assertEqual(allocation.allocated[9].breakdown, {"A": 7, "B": 5})
+            self.assertEqual(allocation.shortfall[9].breakdown, {"A": 3})
+
+            sharded = Scheduler(engine=engine, by_priority=True)
+            sharded.process_sharded(requirements, 3, workers=2)
+            self.assertEqual([level.cells.tolist() for level in sharded.priority_schedules],
+                             [level.cells.tolist() for level in scheduler.priority_schedules])
+
+            scheduler.remove_requirement(requirements[1])
+            allocation = CapacityAllocator(8).allocate(scheduler.schedule, scheduler.priorities,
+                                                       scheduler.priority_schedules)
+            self.assertEqual(allocation.allocated[9].breakdown, {"A": 3, "B": 5})
+
+    def test_command_line_rejects_pooled(self):
+        """--capacity shares out per-customer staffing and refuses --pooled, whose totals it would not match"""
+        result = subprocess.run([sys.executable, "-m", "src.main", "--input", str(ROOT / "tests" / "data" / "e2e_input.csv"),
+                                 "--capacity", "100", "--service-level", "0.8", "--pooled"],
+                                cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("--capacity cannot be combined with --pooled", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import io
+import json
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from src.benchmark import STAGES, Benchmark
+from src.generator import WorkloadGenerator
+
+
+def results(**seconds) -> dict:
+    """Results with one numpy case of 1000 rows and the given stage timings."""
+    stages = {stage: {"seconds": value, "rows_per_sec": 1000 / value} for stage, value in seconds.items()}
+    return {"cases": [{"rows": 1000, "engine": "numpy", "stages": stages}]}
+
+
+class TestBenchmark(unittest.TestCase):
+    """Unit tests for the Benchmark class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def test_compare(self):
+        """Throughput drops beyond the tolerance are regressions; noise-sized stages never are"""
+        baseline = results(parse=1.0, schedule=0.5, format=0.01)
+        self.assertEqual(Benchmark.compare(results(parse=1.2, schedule=0.4, format=0.01), baseline), [])
+
+        regressions = Benchmark.compare(results(parse=1.5, schedule=0.5, format=0.1), baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("numpy parse at 1000 rows", regressions[0])
+        self.assertEqual(Benchmark.compare(results(parse=1.5, schedule=0.5, format=0.1), baseline, tolerance=0.5), [])
+
+    def test_run(self):
+        """A small run times every stage of every engine and its results load back as JSON"""
+        with redirect_stdout(io.StringIO()):
+            run = Benchmark.run([50], data_dir=self.temp_dir.name, generator=WorkloadGenerator(malformed=0.1))
+            output = Benchmark.save(run, str(Path(self.temp_dir.name) / "results.json"))
+
+        self.assertEqual([(case["rows"], case["engine"]) for case in run["cases"]], [(50, "python"), (50, "numpy")])
+        for case in run["cases"]:
+            self.assertEqual(tuple(case["stages"]), STAGES)
+            self.assertGreater(case["peak_rss_mb"], 0)
+        self.assertEqual(json.loads(Path(output).read_text()), run)
+        self.assertEqual(Benchmark.compare(run, run), [])
+        # The generated input is kept for the next run
+        self.assertEqual(len(list(Path(self.temp_dir.name).glob("workload_50_*.csv"))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
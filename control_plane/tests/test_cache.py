@@ -0,0 +1,162 @@
+import unittest
+import io
+import os
+import subprocess
+import sys
+import time
+from contextlib import redirect_stderr
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from src import cache as cache_module
+from src.cache import CachedSchedule, ScheduleCache
+from src.erlang import ErlangC
+from src.parser import InputParser
+from src.scheduler import Scheduler
+from tests.helpers import HEADER, TempDirTestCase
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestScheduleCache(TempDirTestCase):
+    """Unit tests for the ScheduleCache class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        super().setUp()
+        self.input = self.temp / "input.csv"
+        self.input.write_text(HEADER + "Stanford Hospital,300,9AM,7PM,20000,1\nVNS,120,6AM,1PM,40500,2\nBad,abc,9AM,5PM,1,1\n")
+        self.cache = ScheduleCache(str(self.temp / "cache"))
+
+    def _parse(self):
+        errors = []
+        with redirect_stderr(io.StringIO()):
+            batch = InputParser.parse_csv_batch(str(self.input), errors=errors)
+        return batch, errors
+
+    def test_requirements_round_trip(self):
+        """A stored batch loads back memory-mapped with its columns and row errors"""
+        batch, errors = self._parse()
+        key = ScheduleCache.requirements_key(ScheduleCache.file_digest(str(self.input)))
+        self.assertIsNone(self.cache.load_requirements(key))
+
+        self.cache.store_requirements(key, batch, errors)
+        loaded, loaded_errors = self.cache.load_requirements(key)
+
+        self.assertEqual(loaded.customer_names, batch.customer_names)
+        for name in cache_module.BATCH_COLUMNS:
+            self.assertTrue(np.array_equal(getattr(loaded, name), getattr(batch, name)))
+        self.assertIsInstance(loaded.start_minute, np.memmap)
+        self.assertEqual(loaded_errors, errors)
+        self.assertEqual(list(loaded.to_requirements()), list(batch.to_requirements()))
+
+    def test_keys_follow_content_and_options(self):
+        """Keys change with the file contents, the options and the parser source, but not the path"""
+        digest = ScheduleCache.file_digest(str(self.input))
+        copy = self.temp / "copy.csv"
+        copy.write_bytes(self.input.read_bytes())
+        self.assertEqual(ScheduleCache.file_digest(str(copy)), digest)
+
+        self.input.write_text(self.input.read_text() + "VNS,120,1PM,3PM,10,2\n")
+        self.assertNotEqual(ScheduleCache.file_digest(str(self.input)), digest)
+
+        key = ScheduleCache.requirements_key(digest)
+        self.assertNotEqual(ScheduleCache.requirements_key(digest, allow_wrap=True), key)
+        with mock.patch.object(cache_module, "PARSER_VERSION", "edited parser"):
+            self.assertNotEqual(ScheduleCache.requirements_key(digest), key)
+
+        schedule_key = ScheduleCache.schedule_key(digest, False, 1.0, 60, 1)
+        self.assertNotEqual(ScheduleCache.schedule_key(digest, False, 0.9, 60, 1), schedule_key)
+        self.assertNotEqual(ScheduleCache.schedule_key(digest, False, 1.0, 60, 1, 0.8, 20), schedule_key)
+
+    def test_schedule_round_trip(self):
+        """A finished schedule, its priorities, the pooled schedule and the schedule per priority load back unchanged"""
+        batch, errors = self._parse()
+        scheduler = Scheduler(resolution=30, days=2, erlang=ErlangC(0.8, 20, pooled=True))
+        scheduler.process_requirements(batch)
+        cached = CachedSchedule(scheduler.schedule, scheduler.priorities, scheduler.pooled_schedule(), errors)
+        key = ScheduleCache.schedule_key("digest", False, 1.0, 30, 2, 0.8, 20, True)
+
+        self.cache.store_schedule(key, cached)
+        loaded = self.cache.load_schedule(key)
+
+        self.assertEqual(list(loaded.schedule), list(scheduler.schedule))
+        self.assertEqual(list(loaded.pooled), list(cached.pooled))
+        self.assertEqual((loaded.schedule.resolution, loaded.schedule.days), (30, 2))
+        self.assertEqual(loaded.priorities, {"Stanford Hospital": 1, "VNS": 2})
+        self.assertEqual(loaded.errors, errors)
+        self.assertIsNone(loaded.levels)
+
+        # The schedule per priority, kept for --capacity, is stored under its own key
+        split = Scheduler(resolution=30, days=2, by_priority=True)
+        split.process_requirements(batch)
+        key = ScheduleCache.schedule_key("digest", False, 1.0, 30, 2, by_priority=True)
+        self.cache.store_schedule(key, CachedSchedule(split.schedule, split.priorities, levels=split.priority_schedules))
+        loaded = self.cache.load_schedule(key)
+        self.assertEqual([(level.customer_names, level.cells.tolist()) for level in loaded.levels],
+                         [(level.customer_names, level.cells.tolist()) for level in split.priority_schedules])
+
+    def test_evicts_least_recently_used(self):
+        """Once over the size cap, the entries used longest ago are evicted first"""
+        batch, errors = self._parse()
+        keys = [ScheduleCache.requirements_key(f"digest {i}") for i in range(3)]
+        self.cache.store_requirements(keys[0], batch, errors)
+        entry_size = sum(f.stat().st_size for f in (self.cache.directory / keys[0]).iterdir())
+        self.cache.max_bytes = 2 * entry_size
+
+        self.cache.store_requirements(keys[1], batch, errors)
+        # Age both entries, then use the first one again
+        past = time.time() - 100
+        for key in keys[:2]:
+            os.utime(self.cache.directory / key / cache_module.META_FILE, (past, past))
+        self.assertIsNotNone(self.cache.load_requirements(keys[0]))
+        self.cache.store_requirements(keys[2], batch, errors)
+
+        self.assertIsNotNone(self.cache.load_requirements(keys[0]))
+        self.assertIsNone(self.cache.load_requirements(keys[1]))
+        self.assertIsNotNone(self.cache.load_requirements(keys[2]))
+
+    def test_ignores_partial_entries(self):
+        """A directory without its metadata (e.g. a crashed write) is a miss"""
+        key = ScheduleCache.requirements_key("digest")
+        (self.cache.directory / key).mkdir()
+        self.assertIsNone(self.cache.load_requirements(key))
+
+
+    def test_ignores_entries_evicted_while_loading(self):
+        """An entry whose arrays another process evicts after its metadata was read is a miss"""
+        batch, errors = self._parse()
+        key = ScheduleCache.requirements_key("digest")
+        self.cache.store_requirements(key, batch, errors)
+        (self.cache.directory / key / "priority.npy").unlink()
+        self.assertIsNone(self.cache.load_requirements(key))
+
+        scheduler = Scheduler()
+        scheduler.process_requirements(batch)
+        key = ScheduleCache.schedule_key("digest", False, 1.0, 60, 1)
+        self.cache.store_schedule(key, CachedSchedule(scheduler.schedule, scheduler.priorities))
+        (self.cache.directory / key / "schedule_totals.npy").unlink()
+        self.assertIsNone(self.cache.load_schedule(key))
+
+    def test_command_line_repeats_the_engine_errors(self):
+        """Runs through the cache, cold or not and streamed or not, report the rejected rows as a run without it"""
+        # Pydantic words the bad priority differently from the batch validation
+        self.input.write_text(self.input.read_text() + "Urgent,120,6AM,1PM,40,9\n")
+        output = self.temp / "out.csv"
+        for engine in ("python", "numpy"):
+            command = [sys.executable, "-m", "src.main", "--input", str(self.input), "--engine", engine,
+                       "--format", "csv", "--output", str(output)]
+            expected = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stderr
+            schedule = output.read_text()
+            self.assertIn("Error parsing row 3", expected)
+            for stream in ([], ["--stream"]):
+                for run in ("cold", "hit"):
+                    result = subprocess.run(command + stream + ["--cache-dir", str(self.cache.directory),
+                                                                "--cache-schedule"],
+                                            cwd=ROOT, check=True, capture_output=True, text=True)
+                    self.assertEqual(result.stderr, expected, (engine, stream, run))
+                    self.assertEqual(output.read_text(), schedule)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+import numpy as np
+from src.columnar import ColumnarStore
+from src.formatter import Formatter
+from src.models import ScheduleMatrix
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestColumnarStore(unittest.TestCase):
+    """Unit tests for the columnar writers and reader"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        rng = np.random.default_rng(3)
+        self.names = ["VNS", "Stanford Hospital", "Comma, Inc", "Ünïcode ☎"]
+        self.cells = rng.integers(0, 6, size=(48, len(self.names)))
+        self.schedule = ScheduleMatrix.from_cells(self.names, self.cells, days=2)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def _round_trip(self, fmt, schedule=None, customers=None):
+        output = str(Path(self.temp_dir.name) / f"schedule.{fmt}")
+        with redirect_stdout(io.StringIO()):
+            ColumnarStore.save(schedule or self.schedule, fmt, output=output, customers=customers)
+        return ColumnarStore.load(output)
+
+    def _assert_round_trip(self, fmt):
+        loaded = self._round_trip(fmt)
+        order = [self.names.index(name) for name in loaded.customer_names]
+        self.assertEqual(loaded.customer_names, sorted(self.names))
+        self.assertTrue(np.array_equal(loaded.cells, self.cells[:, order]))
+        self.assertTrue(np.array_equal(loaded.totals, self.schedule.totals))
+        self.assertEqual((loaded.resolution, loaded.days, loaded.slots), (60, 2, 48))
+        self.assertTrue(np.array_equal(loaded.slot(30), self.cells[30, order]))
+
+    def test_npy_round_trip(self):
+        """An npy directory reads back memory-mapped with the same cells and totals"""
+        self._assert_round_trip("npy")
+        loaded = ColumnarStore.load(str(Path(self.temp_dir.name) / "schedule.npy"))
+        self.assertIsInstance(loaded.cells, np.memmap)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_round_trip(self):
+        """An Arrow IPC file reads back with zero-copy slot columns"""
+        self._assert_round_trip("arrow")
+        loaded = ColumnarStore.load(str(Path(self.temp_dir.name) / "schedule.arrow"))
+        self.assertFalse(loaded.slot(0).flags.owndata)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_round_trip(self):
+        """A Parquet file reads back with the same cells and totals"""
+        self._assert_round_trip("parquet")
+
+    def test_matches_csv(self):
+        """The loaded schedule formats to the same CSV as the original"""
+        loaded = self._round_trip("npy").to_matrix()
+        original, copy = Path(self.temp_dir.name) / "original.csv", Path(self.temp_dir.name) / "copy.csv"
+        with redirect_stdout(io.StringIO()):
+            Formatter.save_csv(self.schedule, output=str(original))
+            Formatter.save_csv(loaded, output=str(copy), customers=loaded.customer_names)
+        self.assertEqual(original.read_bytes(), copy.read_bytes())
+
+    def test_unknown_customers_are_zero(self):
+        """Customers the schedule never saw get all-zero columns"""
+        loaded = self._round_trip("npy", customers=self.names + ["Nobody"])
+        self.assertIn("Nobody", loaded.customer_names)
+        self.assertFalse(loaded.cells[:, loaded.customer_names.index("Nobody")].any())
+
+    def test_unknown_path(self):
+        """A path that is neither an npy directory nor an Arrow or Parquet file is rejected"""
+        with self.assertRaises(ValueError):
+            ColumnarStore.load(str(Path(self.temp_dir.name) / "schedule.csv"))
+
+    def test_slot_labels(self):
+        """Slot columns are named like the CSV hours"""
+        self.assertEqual(ColumnarStore.slot_labels(4, 30, 1), ["00:00", "00:30", "01:00", "01:30"])
+        self.assertEqual(ColumnarStore.slot_labels(48, 60, 2)[24], "d1 00:00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import csv
+import io
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stderr
+from pathlib import Path
+from src.dead_letters import COLUMNS, INCOMPLETE, DeadLetterQueue
+from src.generator import WorkloadGenerator
+from src.parser import InputParser
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestDeadLetterQueue(unittest.TestCase):
+    """Unit tests for the DeadLetterQueue class and the parsers' use of it"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp = Path(self.temp_dir.name)
+        self.input = self.temp / "input.csv"
+        with open(self.input, "w", newline="") as f:
+            self.workload = WorkloadGenerator(seed=9, malformed=0.2).write(f, 500)
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def _read_lines(self, path: Path):
+        with open(path, newline="") as f:
+            return list(csv.reader(f))
+
+    def _source(self):
+        return open(self.input, newline="")
+
+    def test_parsers_fill_queue(self):
+        """Every parse path queues every rejected row in row order with its number, error and original fields, and prints nothing"""
+        with open(self.input, newline="") as f:
+            original = list(csv.reader(f))[1:]
+        errors = []
+        with redirect_stderr(io.StringIO()):
+            InputParser.parse_csv_batch(str(self.input), errors=errors)
+
+        parses = {"parse_csv_batch": InputParser.parse_csv_batch, "parse_csv": InputParser.parse_csv,
+                  "iter_csv_batches": lambda path, dead_letters: list(
+                      InputParser.iter_csv_batches(path, batch_size=50, dead_letters=dead_letters))}
+        files = []
+        for name, parse in parses.items():
+            path = self.temp / f"{name}.csv"
+            with redirect_stderr(io.StringIO()) as printed, DeadLetterQueue(str(path), self._source, batch_rows=16) as dead_letters:
+                parse(str(self.input), dead_letters=dead_letters)
+
+            self.assertEqual(printed.getvalue(), "")
+            lines = self._read_lines(path)
+            files.append(lines)
+            self.assertEqual(tuple(lines[0]), COLUMNS + InputParser.COLUMNS)
+            self.assertEqual(dead_letters.rejected, self.workload.malformed)
+            self.assertEqual([int(line[0]) for line in lines[1:]], sorted(row for row, _ in errors))
+            self.assertEqual(dead_letters.incomplete, sum(message is None for _, message in errors))
+            for line in lines[1:]:
+                self.assertEqual(line[2:], original[int(line[0])])
+                self.assertTrue(line[1])
+            self.assertIn(INCOMPLETE, [line[1] for line in lines[1:]])
+        # The same rows in the same order whichever path parsed the input (the python engine words its errors differently)
+        for lines in files[1:]:
+            self.assertEqual([[line[0]] + line[2:] for line in lines], [[line[0]] + line[2:] for line in files[0]])
+
+    def test_replay(self):
+        """Corrected rows replace the input's rows with the same numbers; rows still wrong are rejected again"""
+        dead_letter_path = self.temp / "rejected.csv"
+        with redirect_stderr(io.StringIO()), DeadLetterQueue(str(dead_letter_path), self._source) as dead_letters:
+            accepted = len(InputParser.parse_csv_batch(str(self.input), dead_letters=dead_letters))
+
+        lines = self._read_lines(dead_letter_path)
+        fixed, still_wrong = lines[1:-1], lines[-1]
+        corrected = self.temp / "corrected.csv"
+        with open(corrected, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(lines[0])
+            writer.writerows([line[0], line[1], f"Fixed {line[0]}", "300", "9AM", "5PM", "10", "1"] for line in fixed)
+            writer.writerow(still_wrong)
+
+        self.assertEqual(len(DeadLetterQueue.read(str(corrected))), len(lines) - 1)
+        errors = []
+        with redirect_stderr(io.StringIO()):
+            batch = InputParser.parse_csv_batch(DeadLetterQueue.replay(str(self.input), [str(corrected)]), errors=errors)
+        self.assertEqual(len(batch), accepted + len(fixed))
+        self.assertEqual([row for row, _ in errors], [int(still_wrong[0])])
+        self.assertIn(f"Fixed {fixed[0][0]}", batch.customer_names)
+
+    def test_read_rejects_other_files(self):
+        """Only files with the dead letter columns first can be replayed"""
+        with self.assertRaises(ValueError):
+            DeadLetterQueue.read(str(self.input))
+
+    def test_command_line(self):
+        """--dlq writes the rejected rows and a summary instead of one line per row, and --replay feeds them back"""
+        dead_letter_path, output = self.temp / "rejected.csv", self.temp / "out.csv"
+        command = [sys.executable, "-m", "src.main", "--input", str(self.input), "--engine", "numpy",
+                   "--format", "csv", "--output", str(output)]
+        result = subprocess.run(command + ["--dlq", str(dead_letter_path)], cwd=ROOT, check=True,
+                                capture_output=True, text=True)
+        # Only the summary is printed
+        self.assertEqual(len(result.stderr.strip().splitlines()), 1)
+        self.assertIn(f"{self.workload.malformed} rejected rows", result.stderr)
+        self.assertEqual(len(self._read_lines(dead_letter_path)), self.workload.malformed + 1)
+
+        # Replaying the uncorrected file rejects the same rows again
+        again = self.temp / "again.csv"
+        subprocess.run(command + ["--replay", str(dead_letter_path), "--dlq", str(again)], cwd=ROOT, check=True,
+                       capture_output=True)
+        self.assertEqual(len(self._read_lines(again)), self.workload.malformed + 1)
+        result = subprocess.run(command + ["--dlq", str(self.input)], cwd=ROOT, capture_output=True)
+        self.assertNotEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+from src.erlang import ErlangC
+from src.models import CallRequirement
+from src.scheduler import Scheduler
+
+
+class TestErlangC(unittest.TestCase):
+    """Unit tests for the ErlangC class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.erlang = ErlangC(service_level=0.8, answer_time=20)
+
+    def _assert_minimal(self, erlang: ErlangC, traffic: float, handle_time: float):
+        agents = erlang.agents(traffic, handle_time)
+        self.assertGreaterEqual(erlang.service_level_for(agents, traffic, handle_time), erlang.service_level)
+        self.assertLess(erlang.service_level_for(agents - 1, traffic, handle_time), erlang.service_level)
+
+    def test_textbook_example(self):
+        """Test 200 calls/hour of 3 minutes at 80% in 20 seconds, which needs 14 agents"""
+        self.assertEqual(self.erlang.agents(10.0, 180), 14)
+        self.assertAlmostEqual(self.erlang.service_level_for(14, 10.0, 180), 0.8884, places=4)
+
+    def test_agents_are_minimal(self):
+        """Test that the answer meets the target and one agent fewer does not"""
+        rng = np.random.default_rng(5)
+        for traffic, handle_time in zip(rng.uniform(0.01, 300, 50), rng.uniform(10, 1800, 50)):
+            self._assert_minimal(self.erlang, traffic, handle_time)
+        self._assert_minimal(ErlangC(service_level=0.95, answer_time=0), 42.5, 300)
+
+    def test_large_traffic(self):
+        """Test that thousands of agents are solved exactly, with no overflow"""
+        self._assert_minimal(self.erlang, 20000.5, 240)
+
+    def test_zero_traffic(self):
+        """Test that no traffic needs no agents"""
+        self.assertEqual(self.erlang.agents_array(np.array([0.0, 1.0]), 60).tolist(), [0, 3])
+
+    def test_pairs_are_memoized(self):
+        """Test that each distinct (traffic, handle time) pair is solved once"""
+        traffic = np.array([5.0, 5.0, 7.5, 5.0])
+        with mock.patch.object(ErlangC, "_solve", wraps=self.erlang._solve) as solve:
+            first = self.erlang.agents_array(traffic, 120)
+            second = self.erlang.agents_array(traffic, 120)
+            self.erlang.agents(7.5, 120)
+        self.assertEqual(first.tolist(), second.tolist())
+        self.assertEqual(solve.call_count, 1)
+        self.assertEqual(len(solve.call_args[0][0]), 2)
+
+    def test_shared_between_threads(self):
+        """Test that threads sharing one instance get the single-threaded answers and the memo stays capped"""
+        rng = np.random.default_rng(11)
+        batches = [(np.round(rng.uniform(0.5, 60, 200), 1), rng.choice([60.0, 120.0, 300.0], 200)) for _ in range(16)]
+        expected = [ErlangC(0.8, 20).agents_array(traffic, handle_time) for traffic, handle_time in batches]
+        shared = ErlangC(0.8, 20, max_entries=256)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda batch: shared.agents_array(*batch), batches * 4))
+        for i, result in enumerate(results):
+            self.assertEqual(result.tolist(), expected[i % len(batches)].tolist())
+        self.assertLessEqual(len(shared._cache), shared.max_entries)
+
+    def test_invalid_parameters(self):
+        """Test that unreachable targets and negative answer times are rejected"""
+        for service_level, answer_time in [(0, 20), (1, 20), (0.8, -1)]:
+            with self.assertRaises(ValueError):
+                ErlangC(service_level, answer_time)
+
+
+class TestErlangScheduling(unittest.TestCase):
+    """Tests for scheduling with the Erlang C model"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        rng = np.random.default_rng(11)
+        self.requirements = []
+        for i in range(200):
+            start = int(rng.integers(0, 23))
+            self.requirements.append(CallRequirement(
+                customer_name=f"Customer {rng.integers(0, 30)}",
+                avg_duration_sec=int(rng.integers(30, 900)),
+                start_hour=start,
+                end_hour=int(rng.integers(start + 1, 25)),
+                total_calls=int(rng.integers(1, 20000)),
+                priority=1,
+            ))
+
+    def test_erlang_staffing_covers_linear_formula(self):
+        """Test that Erlang C never staffs below the occupancy cap of the linear formula"""
+        linear = Scheduler(utilization=0.9)
+        erlang = Scheduler(utilization=0.9, erlang=ErlangC())
+        linear.process_requirements(self.requirements)
+        erlang.process_requirements(self.requirements)
+
+        self.assertTrue((erlang.schedule.cells >= linear.schedule.cells).all())
+        self.assertTrue((erlang.schedule.totals > linear.schedule.totals).any())
+
+    def test_engines_match(self):
+        """Test that both engines agree per customer and pooled"""
+        for pooled in (False, True):
+            python_scheduler = Scheduler(erlang=ErlangC(pooled=pooled))
+            numpy_scheduler = Scheduler(engine="numpy", erlang=ErlangC(pooled=pooled))
+            python_scheduler.process_requirements(self.requirements)
+            numpy_scheduler.process_requirements(self.requirements)
+            self.assertEqual(python_scheduler.schedule.cells.tolist(), numpy_scheduler.schedule.cells.tolist())
+            if pooled:
+                self.assertEqual(python_scheduler.pooled_schedule().totals.tolist(),
+                                 numpy_scheduler.pooled_schedule().totals.tolist())
+
+    def test_pooled_needs_fewer_agents(self):
+        """Test that one shared queue never needs more agents than separate ones"""
+        scheduler = Scheduler(erlang=ErlangC(pooled=True))
+        scheduler.process_requirements(self.requirements)
+        pooled = scheduler.pooled_schedule()
+
+        self.assertTrue((pooled.totals <= scheduler.schedule.totals).all())
+        self.assertTrue((pooled.totals < scheduler.schedule.totals).any())
+        self.assertEqual(pooled[12].breakdown, scheduler.schedule[12].breakdown)
+        with self.assertRaises(ValueError):
+            Scheduler().pooled_schedule()
+
+    def test_pooled_replace_customer(self):
+        """Test that pooled traffic follows incremental updates"""
+        scheduler = Scheduler(erlang=ErlangC(pooled=True))
+        scheduler.process_requirements(self.requirements)
+        name = self.requirements[0].customer_name
+        kept = [req for req in self.requirements if req.customer_name != name]
+        scheduler.replace_customer(name, [])
+
+        expected = Scheduler(erlang=ErlangC(pooled=True))
+        expected.process_requirements(kept)
+        self.assertEqual(scheduler.pooled_schedule().totals.tolist(), expected.pooled_schedule().totals.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import csv
+import io
+import json
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+import numpy as np
+from src.allocator import CapacityAllocator
+from src.formatter import Formatter
+from src.models import ScheduleMatrix
+from src.scenarios import ScenarioResult
+from src.sweep import UtilizationSweep
+
+
+class TestFormatter(unittest.TestCase):
+    """Unit tests for the Formatter class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        rng = np.random.default_rng(2)
+        # Names that need escaping in JSON and quoting in CSV
+        self.names = ["Stanford Hospital", 'Quote "Q"', "Comma, Inc", "Ünïcode ☎", "back\\slash", "VNS"]
+        self.cells = rng.integers(0, 4, size=(24 * 2 * 4, len(self.names))) * (rng.random((24 * 2 * 4, 1)) < 0.7)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def _schedules(self):
+        # Hourly day, sub-hourly day and two hourly days
+        yield ScheduleMatrix.from_cells(self.names, self.cells[:24])
+        yield ScheduleMatrix.from_cells(self.names, self.cells[:96], resolution=15)
+        yield ScheduleMatrix.from_cells(self.names, self.cells[:48], days=2)
+
+    def _capture(self, write) -> str:
+        out = io.StringIO()
+        write(out)
+        return out.getvalue()
+
+    def _reference_entries(self, schedule):
+        # The dict-per-slot shape the streaming writer must reproduce
+        entries = []
+        for slot in schedule:
+            entry = {"day": slot.day} if schedule.days > 1 else {}
+            entry["hour"] = slot.hour
+            if schedule.resolution < 60:
+                entry["minute"] = slot.minute
+            entry["total_agents"] = slot.total_agents
+            entry["breakdown"] = slot.breakdown
+            entries.append(entry)
+        return entries
+
+    def test_json_matches_json_dumps(self):
+        """Test that streamed JSON is byte-identical to json.dumps with indent=2"""
+        for schedule in self._schedules():
+            expected = json.dumps(self._reference_entries(schedule), indent=2) + "\n"
+            self.assertEqual(self._capture(lambda out: Formatter.print_json(schedule, out=out)), expected)
+            # Plain lists of HourlyStat take the generic path
+            self.assertEqual(self._capture(lambda out: Formatter.print_json(list(schedule), out=out)),
+                             json.dumps([{k: v for k, v in e.items() if k in ("hour", "total_agents", "breakdown")}
+                                         for e in self._reference_entries(schedule)], indent=2) + "\n")
+
+    def test_allocation_json_matches_json_dumps(self):
+        """Test the nested allocation document, including an empty shortfall list"""
+        schedule = ScheduleMatrix.from_cells(self.names, self.cells[:24])
+        for capacity in (5, 10 ** 6):
+            allocation = CapacityAllocator(capacity).allocate(schedule, {})
+            expected = json.dumps({
+                "allocated": self._reference_entries(allocation.allocated),
+                "shortfall": [e for e in self._reference_entries(allocation.shortfall) if e["total_agents"]],
+            }, indent=2) + "\n"
+            self.assertEqual(self._capture(lambda out: Formatter.print_allocation_json(allocation, out=out)), expected)
+
+    def test_sweep_and_scenarios_json_match_json_dumps(self):
+        """Test that the streamed sweep and scenario documents are byte-identical to json.dumps with indent=2"""
+        sweep = UtilizationSweep([0.8, 0.85, 1.0], days=2)
+        sweep.totals[:] = self.cells[:48, :3].T
+        expected = json.dumps([{"utilization": u, "hourly_totals": t} for u, t in zip(sweep.utilizations,
+                                                                                       sweep.totals.tolist())], indent=2)
+        self.assertEqual(self._capture(lambda out: Formatter.print_sweep_json(sweep, out=out)), expected + "\n")
+        lines = self._capture(lambda out: Formatter.print_sweep_text(sweep, out=out)).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith(f"utilization=0.8 peak={sweep.totals[0].max()}; d0 00:00={sweep.totals[0, 0]}, "))
+        self.assertTrue(lines[0].endswith(f"d1 23:00={sweep.totals[0, -1]}"))
+
+        results = [ScenarioResult(name, 0.85, self.cells[:24, i]) for i, name in enumerate(["baseline", 'Quote "Q"'])]
+        document = json.loads(self._capture(lambda out: Formatter.print_scenarios_json(results, out=out)))
+        self.assertEqual([entry["scenario"] for entry in document], ["baseline", 'Quote "Q"'])
+        self.assertEqual(self._capture(lambda out: Formatter.print_scenarios_json(results, out=out)),
+                         json.dumps(document, indent=2) + "\n")
+        self.assertEqual(self._capture(lambda out: Formatter.print_scenarios_json([], out=out)), "[]\n")
+
+    def test_text_lines(self):
+        """Test the text format for filled and empty slots"""
+        schedule = ScheduleMatrix(days=2)
+        schedule.add(schedule.customer_id("A"), 1, 3, 2)
+        schedule.add(schedule.customer_id("B"), 2, 3, 1)
+        lines = self._capture(lambda out: Formatter.print_text(schedule, out=out)).splitlines()
+
+        self.assertEqual(len(lines), 48)
+        self.assertEqual(lines[0], "d0 00:00 total=0; none")
+        self.assertEqual(lines[2], "d0 02:00 total=3; A=2, B=1")
+        self.assertEqual(self._capture(lambda out: Formatter.print_text(list(schedule)[:3], out=out)).splitlines(),
+                         ["00:00 total=0; none", "01:00 total=2; A=2", "02:00 total=3; A=2, B=1"])
+
+    def test_csv_matches_dict_writer(self):
+        """Test that the row writer produces the same bytes as csv.DictWriter"""
+        for i, schedule in enumerate(self._schedules()):
+            customers = sorted(schedule.active_customers() + ["Never Scheduled"])
+            expected = io.StringIO(newline="")
+            writer = csv.DictWriter(expected, fieldnames=["hour", "total_agents"] + customers)
+            writer.writeheader()
+            for slot, row in zip(schedule, Formatter._csv_rows(schedule, customers)):
+                writer.writerow({"hour": row[0], "total_agents": slot.total_agents,
+                                 **{c: slot.breakdown.get(c, 0) for c in customers}})
+
+            output = Path(self.temp_dir.name) / f"schedule_{i}.csv"
+            with redirect_stdout(io.StringIO()):
+                Formatter.save_csv(schedule, output=str(output), customers=customers)
+            self.assertEqual(output.read_bytes(), expected.getvalue().encode("utf-8"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import io
+from contextlib import redirect_stderr
+from src.generator import TIME_STYLES, WorkloadGenerator
+from src.parser import InputParser
+
+
+class TestWorkloadGenerator(unittest.TestCase):
+    """Unit tests for the WorkloadGenerator class"""
+
+    def _write(self, generator: WorkloadGenerator, rows: int):
+        out = io.StringIO(newline="")
+        workload = generator.write(out, rows)
+        return out.getvalue(), workload
+
+    def _parse(self, text: str):
+        errors = []
+        with redirect_stderr(io.StringIO()):
+            batch = InputParser.parse_csv_batch(io.StringIO(text), errors=errors)
+        return batch, errors
+
+    def test_seeded(self):
+        """The same seed and options give the same bytes, another seed different ones"""
+        first, _ = self._write(WorkloadGenerator(seed=7, malformed=0.1), 500)
+        second, _ = self._write(WorkloadGenerator(seed=7, malformed=0.1), 500)
+        other, _ = self._write(WorkloadGenerator(seed=8, malformed=0.1), 500)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_valid_rows_parse(self):
+        """Without malformed rows every row parses, in every time style"""
+        text, workload = self._write(WorkloadGenerator(seed=1, sub_hour=0.5), 3000)
+        batch, errors = self._parse(text)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(batch), 3000)
+        self.assertEqual(workload.rows, 3000)
+        self.assertTrue((batch.start_minute % 60).any())
+        for style in TIME_STYLES:
+            rows = self._write(WorkloadGenerator(seed=2, time_styles=[style]), 200)[0]
+            self.assertEqual(len(self._parse(rows)[0]), 200, style)
+
+    def test_customers(self):
+        """Rows share exactly the requested number of customer names"""
+        text, workload = self._write(WorkloadGenerator(seed=3, customers=40), 1000)
+        batch, _ = self._parse(text)
+        self.assertEqual(workload.customers, 40)
+        self.assertEqual(len(set(batch.customer_names)), 40)
+        # Every customer appears when there are fewer rows than customers
+        self.assertEqual(self._write(WorkloadGenerator(customers=40), 10)[1].customers, 10)
+
+    def test_malformed_rows_are_reported(self):
+        """Every malformed row is reported by the parser, and only those"""
+        text, workload = self._write(WorkloadGenerator(seed=4, malformed=0.2), 5000)
+        batch, errors = self._parse(text)
+        self.assertGreater(workload.malformed, 800)
+        self.assertEqual(len(errors), workload.malformed)
+        self.assertEqual(len(batch), 5000 - workload.malformed)
+        self.assertIn(None, [message for _, message in errors])
+
+    def test_rejects_bad_options(self):
+        """Out of range shares, customer counts and unknown time styles are rejected"""
+        with self.assertRaises(ValueError):
+            WorkloadGenerator(malformed=1.5)
+        with self.assertRaises(ValueError):
+            WorkloadGenerator(customers=0)
+        with self.assertRaises(ValueError):
+            WorkloadGenerator(time_styles=["roman"])
+
+
+if __name__ == '__main__':
+    unittest.main()
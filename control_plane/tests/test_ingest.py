@@ -0,0 +1,122 @@
+import unittest
+import csv
+import gzip
+import io
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stderr
+from pathlib import Path
+from src.erlang import ErlangC
+from src.generator import WorkloadGenerator
+from src.ingest import MultiSourceIngest, SourceError
+from src.parser import InputParser
+from src.scheduler import Scheduler
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestMultiSourceIngest(unittest.TestCase):
+    """Unit tests for the MultiSourceIngest class"""
+
+    def setUp(self):
+        """Split a generated workload into a plain file, a gzip file and a directory of two files"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp = Path(self.temp_dir.name)
+        self.whole = self.temp / "whole.csv"
+        with open(self.whole, "w", newline="") as f:
+            self.workload = WorkloadGenerator(seed=5, customers=60, malformed=0.05).write(f, 2000)
+        lines = self.whole.read_text().splitlines(keepends=True)
+        header, rows = lines[0], lines[1:]
+        (self.temp / "regions").mkdir()
+        self.plain, self.compressed = self.temp / "east.csv", self.temp / "west.csv.gz"
+        self.plain.write_text(header + "".join(rows[:700]))
+        with gzip.open(self.compressed, "wt") as f:
+            f.write(header + "".join(rows[700:1200]))
+        (self.temp / "regions" / "north.csv").write_text(header + "".join(rows[1200:1600]))
+        (self.temp / "regions" / "south.csv").write_text(header + "".join(rows[1600:]))
+        self.sources = [str(self.plain), str(self.compressed), str(self.temp / "regions")]
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def _ingest(self, scheduler: Scheduler, **options) -> MultiSourceIngest:
+        ingest = MultiSourceIngest(self.sources, workers=2, chunk_rows=128, **options)
+        with redirect_stderr(io.StringIO()):
+            ingest.run(scheduler.process_requirements)
+        scheduler.order_customers(ingest.customer_names)
+        return ingest
+
+    def test_expand(self):
+        """Directories and globs expand to their files in order, duplicates are dropped and missing sources raise"""
+        regions = [str(self.temp / "regions" / "north.csv"), str(self.temp / "regions" / "south.csv")]
+        self.assertEqual(MultiSourceIngest.expand(self.sources), self.sources[:2] + regions)
+        self.assertEqual(MultiSourceIngest.expand([str(self.temp / "regions" / "*.csv"), regions[1]]), regions)
+        for missing in ("missing.csv", "nothing*.csv"):
+            with self.assertRaises(SourceError):
+                MultiSourceIngest.expand([str(self.temp / missing)])
+
+    def _columns(self, scheduler: Scheduler) -> dict:
+        cells = scheduler.schedule.cells
+        return {name: cells[:, c].tolist() for c, name in enumerate(scheduler.schedule.customer_names)}
+
+    def test_matches_sequential_parse(self):
+        """The schedule and priorities match parsing the concatenated sources in one go, customers in python engine order"""
+        order = Scheduler(engine="python")
+        with redirect_stderr(io.StringIO()):
+            order.process_requirements(InputParser.parse_csv_batch(str(self.whole)))
+        for engine in Scheduler.ENGINES:
+            for erlang in (None, ErlangC(0.8, pooled=True)):
+                expected = Scheduler(engine=engine, erlang=erlang)
+                with redirect_stderr(io.StringIO()):
+                    expected.process_requirements(InputParser.parse_csv_batch(str(self.whole)))
+                scheduler = Scheduler(engine=engine, erlang=erlang)
+                ingest = self._ingest(scheduler, max_pending=3)
+
+                self.assertEqual(scheduler.schedule.customer_names, order.schedule.customer_names)
+                self.assertEqual(self._columns(scheduler), self._columns(expected))
+                self.assertEqual(scheduler.schedule.totals.tolist(), expected.schedule.totals.tolist())
+                self.assertEqual(list(scheduler.priorities.items()), list(order.priorities.items()))
+                if erlang is not None:
+                    self.assertEqual(scheduler.pooled_schedule().totals.tolist(),
+                                     expected.pooled_schedule().totals.tolist())
+                self.assertEqual((ingest.rows, ingest.rejected), (2000, self.workload.malformed))
+                # Backpressure: never more chunks in flight than allowed
+                self.assertLessEqual(ingest.peak_pending, 3)
+
+    def test_errors_name_their_source(self):
+        """Rejected rows are reported under their source and row number there; a bad header fails the run"""
+        lines = self.plain.read_text().splitlines(keepends=True)
+        lines[301] = "Broken,abc,9AM,5PM,10,1\n"
+        self.plain.write_text("".join(lines))
+        with redirect_stderr(io.StringIO()) as printed:
+            MultiSourceIngest([str(self.plain)], workers=1, chunk_rows=128).run(lambda batch: None)
+        self.assertIn(f"{self.plain}: Error parsing row 300:", printed.getvalue())
+
+        broken = self.temp / "broken.csv.gz"
+        with gzip.open(broken, "wt") as f:
+            f.write("Wrong,Header\n" + "".join(lines[1:]))
+        with redirect_stderr(io.StringIO()), self.assertRaisesRegex(SourceError, "broken.csv.gz"):
+            MultiSourceIngest(self.sources + [str(broken)], workers=1).run(lambda batch: None)
+
+    def test_command_line(self):
+        """--source gives the same output as --input of the concatenated file"""
+        outputs = []
+        for inputs in (["--input", str(self.whole), "--engine", "python"],
+                       ["--source", self.sources[0], "--source", self.sources[1],
+                        "--source", str(self.temp / "regions" / "*.csv"), "--workers", "2", "--engine", "numpy"]):
+            output = self.temp / f"out{len(outputs)}.csv"
+            subprocess.run([sys.executable, "-m", "src.main", *inputs, "--format", "csv",
+                            "--output", str(output)], cwd=ROOT, check=True, capture_output=True)
+            with open(output, newline="") as f:
+                outputs.append(list(csv.reader(f)))
+        self.assertEqual(outputs[0], outputs[1])
+
+        result = subprocess.run([sys.executable, "-m", "src.main", "--source", self.sources[0], "--stream"],
+                                cwd=ROOT, capture_output=True)
+        self.assertNotEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import io
+import json
+import pstats
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stderr
+from pathlib import Path
+from src import metrics
+from src.generator import WorkloadGenerator
+from src.metrics import CountingWriter, Metrics
+from src.parser import InputParser
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "tests" / "data"
+
+
+class TestMetrics(unittest.TestCase):
+    """Unit tests for the Metrics class and the parser's reports into it"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        out = io.StringIO(newline="")
+        self.workload = WorkloadGenerator(seed=6, malformed=0.1).write(out, 1000)
+        self.input = out.getvalue()
+
+    def tearDown(self):
+        """Clean up temporary files"""
+        self.temp_dir.cleanup()
+
+    def _parse(self, parse):
+        run_metrics = Metrics()
+        with run_metrics.activate(), redirect_stderr(io.StringIO()):
+            parse(io.StringIO(self.input))
+        self.assertIsNone(metrics.current())
+        return run_metrics.to_dict()
+
+    def test_parser_counts_rows(self):
+        """Both parse paths count rows read and rejected and time validation and time parsing"""
+        for parse in (InputParser.parse_csv_batch, InputParser.parse_csv):
+            data = self._parse(parse)
+            self.assertEqual(data["counters"]["rows_read"], 1000)
+            self.assertEqual(data["counters"]["rows_rejected"], self.workload.malformed)
+            self.assertEqual(data["counters"]["rows_accepted"], 1000 - self.workload.malformed)
+            self.assertGreater(data["timers"]["time_parse_seconds"], 0)
+            self.assertGreater(data["timers"]["validation_seconds"], 0)
+
+    def test_stages_and_openmetrics(self):
+        """Stages add up wall and CPU time, and the OpenMetrics text names every family"""
+        run_metrics = Metrics(engine="numpy")
+        for _ in range(2):
+            with run_metrics.activate(), metrics.stage("parse"):
+                sum(range(10000))
+        run_metrics.count("rows_read", 5)
+        run_metrics.count("rows_rejected")
+
+        self.assertGreater(run_metrics.stages["parse"]["wall_seconds"], 0)
+        self.assertIn("cpu_seconds", run_metrics.stages["parse"])
+        text = run_metrics.to_openmetrics()
+        self.assertIn('scheduler_run_info{engine="numpy"} 1', text)
+        self.assertIn('scheduler_stage_wall_seconds{stage="parse"}', text)
+        self.assertIn("# TYPE scheduler_rows_read counter\nscheduler_rows_read_total 5", text)
+        self.assertIn("scheduler_rows_accepted_total 4", text)
+        self.assertTrue(text.endswith("# EOF\n"))
+        # Without an active instance, stages are no-ops
+        before = dict(run_metrics.stages["parse"])
+        with metrics.stage("parse"):
+            sum(range(10000))
+        self.assertEqual(run_metrics.stages["parse"], before)
+
+    def test_counting_writer(self):
+        """Encoded bytes are counted, not characters"""
+        out = io.StringIO()
+        writer = CountingWriter(out)
+        writer.write("Ünïcode ☎\n")
+        self.assertEqual(writer.bytes_written, len("Ünïcode ☎\n".encode()))
+        self.assertEqual(out.getvalue(), "Ünïcode ☎\n")
+
+    def test_command_line(self):
+        """--metrics-out and --profile write the run's metrics and a loadable profile"""
+        temp = Path(self.temp_dir.name)
+        output, metrics_out, profile = temp / "out.csv", temp / "metrics.json", temp / "run.prof"
+        subprocess.run([sys.executable, "-m", "src.main", "--input", str(DATA_DIR / "e2e_input.csv"), "--format", "csv",
+                        "--output", str(output), "--metrics-out", str(metrics_out), "--profile", str(profile)],
+                       cwd=ROOT, check=True, capture_output=True)
+
+        data = json.loads(metrics_out.read_text())
+        self.assertEqual(list(data["stages"]), ["parse", "schedule", "output"])
+        self.assertEqual(data["counters"]["rows_read"], 6)
+        self.assertGreaterEqual(data["counters"]["output_bytes"], output.stat().st_size)
+        self.assertGreater(data["gauges"]["peak_rss_bytes"], 0)
+        self.assertGreater(pstats.Stats(str(profile)).total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 import unittest
 import tempfile
 import os
+import types
+import io
+from contextlib import redirect_stderr
 from pathlib import Path
 from typing import List
 from src.parser import InputParser
-from src.models import CallRequirement
+from src.models import CallRequirement, RequirementBatch
 
 
 class TestInputParser(unittest.TestCase):
@@ -260,6 +263,203 @@ class TestInputParser(unittest.TestCase):
         self.assertEqual(requirements[0].customer_name, "Jane Smith")
 
 
+    # Tests for iter_csv method
+    def test_iter_csv_is_lazy_generator(self):
+        """Test that iter_csv yields requirements one at a time"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        John Doe,300,09:00,17:00,50,1
+                        Jane Smith,invalid,10:00,18:00,30,2
+                        Bob White,600,10:00,18:00,30,2
+                        """
+        filepath = self._create_csv("stream.csv", csv_content)
+
+        rows = InputParser.iter_csv(filepath)
+
+        self.assertIsInstance(rows, types.GeneratorType)
+        self.assertEqual(next(rows).customer_name, "John Doe")
+        # The invalid row is skipped just like in parse_csv
+        self.assertEqual(next(rows).customer_name, "Bob White")
+        with self.assertRaises(StopIteration):
+            next(rows)
+
+    def test_iter_csv_matches_parse_csv(self):
+        """Test that streaming and batch parsing return the same requirements"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        John Doe,300,9AM,5PM,50,1
+                        Jane Smith,600,10:00,12AM,30,2
+                        """
+        filepath = self._create_csv("stream_batch.csv", csv_content)
+
+        self.assertEqual(list(InputParser.iter_csv(filepath)), InputParser.parse_csv(filepath))
+
+    def test_iter_csv_file_not_found(self):
+        """Test that a missing file exits once iteration starts"""
+        with self.assertRaises(SystemExit):
+            next(InputParser.iter_csv("/nonexistent/path/file.csv"))
+
+    def test_iter_csv_keeps_minutes(self):
+        """Test that minutes in start and end times are kept on the requirement"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        John Doe,300,9:15,5:45 PM,50,1
+                        """
+        filepath = self._create_csv("minutes.csv", csv_content)
+
+        req, = InputParser.iter_csv(filepath)
+        self.assertEqual((req.start_hour, req.start_minute), (9, 15))
+        self.assertEqual((req.end_hour, req.end_minute), (17, 45))
+        self.assertEqual(list(InputParser.parse_csv_batch(filepath).to_requirements()), [req])
+
+    # Tests for parse_csv_batch / iter_csv_batches methods
+    def test_parse_csv_batch_matches_parse_csv(self):
+        """Test that the columnar batch holds the same rows as parse_csv"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        John Doe,300,9AM,5PM,50,1
+                        Jane Smith,600,10:00,12AM,30,2
+                        John Doe,120,1PM,3PM,10,4
+                        """
+        filepath = self._create_csv("batch.csv", csv_content)
+
+        batch = InputParser.parse_csv_batch(filepath)
+
+        self.assertIsInstance(batch, RequirementBatch)
+        self.assertEqual(list(batch.to_requirements()), InputParser.parse_csv(filepath))
+        # Customer names are interned
+        self.assertEqual(batch.customer_names, ["John Doe", "Jane Smith"])
+        self.assertEqual(batch.customer_ids.tolist(), [0, 1, 0])
+
+    def test_parse_csv_batch_rejects_same_rows_as_parse_csv(self):
+        """Test that vectorized validation applies the CallRequirement rules"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        Zero Duration,0,09:00,17:00,50,1
+                        Bad Calls,300,09:00,17:00,-1,1
+                        Bad Priority,300,09:00,17:00,50,10
+                        Reversed,300,18:00,09:00,50,1
+                        Bad Start,300,24,09:00,50,1
+                        Not A Number,invalid,09:00,17:00,50,1
+                        Full Day,300,12AM,12AM,50,1
+                        Jane Smith,600,10:00,18:00,30,2
+                        """
+        filepath = self._create_csv("batch_invalid.csv", csv_content)
+
+        batch = InputParser.parse_csv_batch(filepath)
+
+        self.assertEqual([r.customer_name for r in batch.to_requirements()], ["Full Day", "Jane Smith"])
+        self.assertEqual([r.customer_name for r in InputParser.parse_csv(filepath)], ["Full Day", "Jane Smith"])
+        self.assertEqual(batch.row_numbers.tolist(), [6, 7])
+
+    def test_requirement_batch_validate_reports_row_numbers(self):
+        """Test that every invalid row is reported with its row number and all failed rules"""
+        batch = RequirementBatch.from_columns(
+            names=["A", "B", "C"],
+            avg_duration_sec=[300, 0, 300],
+            start_minute=[9 * 60, 9 * 60, 10 * 60],
+            end_minute=[17 * 60, 17 * 60, 10 * 60],
+            total_calls=[50, 0, 50],
+            priority=[1, 1, 6],
+            row_numbers=[3, 4, 5],
+        )
+
+        valid, errors = batch.validate()
+
+        self.assertEqual(len(valid), 1)
+        self.assertEqual([row for row, _ in errors], [4, 5])
+        self.assertIn("avg_duration_sec", errors[0][1])
+        self.assertIn("total_calls", errors[0][1])
+        self.assertIn("end time must be after start time", errors[1][1])
+        self.assertIn("priority", errors[1][1])
+
+    def test_iter_csv_batches_respects_batch_size(self):
+        """Test that batches are split at batch_size rows"""
+        rows = "\n".join(f"Customer {i},300,09:00,17:00,50,1" for i in range(5))
+        filepath = self._create_csv("batches.csv", "CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority\n" + rows)
+
+        batches = list(InputParser.iter_csv_batches(filepath, batch_size=2))
+
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+
+
+    # Tests for overnight and multi-day windows
+    def test_extract_window_same_day(self):
+        """Test that windows without day prefixes keep the previous meaning"""
+        self.assertEqual(InputParser.extract_window("9AM", "5PM"), (9 * 60, 17 * 60))
+        self.assertEqual(InputParser.extract_window("9AM", "12AM"), (9 * 60, 24 * 60))
+        self.assertEqual(InputParser.extract_window("12AM", "12AM"), (0, 24 * 60))
+        # Without allow_wrap a reversed window is left for validation to reject
+        self.assertEqual(InputParser.extract_window("10PM", "6AM"), (22 * 60, 6 * 60))
+        with self.assertRaises(ValueError):
+            InputParser.extract_window("24", "9AM")
+
+    def test_extract_window_wraps_overnight(self):
+        """Test that allow_wrap moves an end before the start to the next day"""
+        self.assertEqual(InputParser.extract_window("10PM", "6AM", allow_wrap=True), (22 * 60, 30 * 60))
+        self.assertEqual(InputParser.extract_window("9AM", "9AM", allow_wrap=True), (9 * 60, 33 * 60))
+        self.assertEqual(InputParser.extract_window("9AM", "5PM", allow_wrap=True), (9 * 60, 17 * 60))
+
+    def test_extract_window_day_prefixes(self):
+        """Test windows with weekday and day index prefixes"""
+        day = 24 * 60
+        self.assertEqual(InputParser.extract_window("Mon 9AM", "Fri 5PM"), (9 * 60, 4 * day + 17 * 60))
+        self.assertEqual(InputParser.extract_window("Tue 10PM", "6AM", allow_wrap=True), (day + 22 * 60, 2 * day + 6 * 60))
+        self.assertEqual(InputParser.extract_window("d2 9:30", "d2 11:00"), (2 * day + 570, 2 * day + 660))
+        self.assertEqual(InputParser.extract_window("Sun 20:00", "Mon 2:00", allow_wrap=True), (6 * day + 20 * 60, 7 * day + 2 * 60))
+
+    def test_parse_wrapped_rows(self):
+        """Test that both parsers read overnight rows the same way when wrapping is allowed"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        Night Line,600,10PM,6AM,800,1
+                        Weekday,300,Mon 9AM,Fri 5PM,10000,2
+                        """
+        filepath = self._create_csv("wrapped.csv", csv_content)
+
+        self.assertEqual([r.customer_name for r in InputParser.parse_csv(filepath)], ["Weekday"])
+        requirements = InputParser.parse_csv(filepath, allow_wrap=True)
+        self.assertEqual([(r.start_day, r.start_hour, r.end_day, r.end_hour) for r in requirements], [(0, 22, 1, 6), (0, 9, 4, 17)])
+        self.assertEqual(list(InputParser.parse_csv_batch(filepath, allow_wrap=True).to_requirements()), requirements)
+
+    def test_window_longer_than_horizon(self):
+        """Test that with days both parsers reject a window longer than the horizon as a row error, with the same message"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        Too Long,300,d1 10PM,d3 2AM,100,1
+                        Fits,300,10PM,6AM,100,1
+                        """
+        filepath = self._create_csv("long.csv", csv_content)
+        with self.assertRaisesRegex(ValueError, "longer than the 1 day horizon"):
+            InputParser.extract_window("d1 10PM", "d3 2AM", days=1)
+        self.assertEqual(InputParser.extract_window("d1 10PM", "d3 2AM", days=2), (2760, 4440))
+
+        with redirect_stderr(io.StringIO()) as python_printed:
+            requirements = InputParser.parse_csv(filepath, allow_wrap=True, days=1)
+        errors = []
+        with redirect_stderr(io.StringIO()) as numpy_printed:
+            batch = InputParser.parse_csv_batch(filepath, allow_wrap=True, errors=errors, days=1)
+        self.assertEqual([r.customer_name for r in requirements], ["Fits"])
+        self.assertEqual(list(batch.to_requirements()), requirements)
+        self.assertIn((0, "window is longer than the 1 day horizon"), errors)
+        for printed in (python_printed, numpy_printed):
+            self.assertIn("Error parsing row 0: window is longer than the 1 day horizon", printed.getvalue())
+        self.assertEqual(len(InputParser.parse_csv(filepath, allow_wrap=True, days=2)), 2)
+
+    def test_parse_csv_batch_collects_errors(self):
+        """Test that the reported row problems are also collected, in the order they were printed"""
+        csv_content = """CustomerName,AverageCallDurationSeconds,StartTimePT,EndTimePT,NumberOfCalls,Priority
+                        Good,300,9AM,5PM,50,1
+                        Bad Duration,abc,9AM,5PM,50,1
+                        Short,1
+                        Zero Calls,300,9AM,5PM,0,1
+                        """
+        filepath = self._create_csv("errors.csv", csv_content)
+        errors = []
+
+        with redirect_stderr(io.StringIO()) as printed:
+            batch = InputParser.parse_csv_batch(filepath, errors=errors)
+        with redirect_stderr(io.StringIO()) as replayed:
+            InputParser.report_errors(errors)
+
+        self.assertEqual(len(batch), 1)
+        # Skipped rows (the short one and the trailing blank line) as they are read, then row errors
+        self.assertEqual([row for row, _ in errors], [2, 4, 1, 3])
+        self.assertIsNone(errors[0][1])
+        self.assertEqual(replayed.getvalue(), printed.getvalue())
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import csv
+import io
+import json
+import subprocess
+import sys
+from contextlib import redirect_stderr
+from pathlib import Path
+from src.erlang import ErlangC
+from src.generator import WorkloadGenerator
+from src.parser import InputParser
+from src.scenarios import BASELINE, Change, Scenario, ScenarioEngine
+from src.scheduler import Scheduler
+from tests.helpers import HEADER, TempDirTestCase
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestScenarioEngine(TempDirTestCase):
+    """Unit tests for the ScenarioEngine class"""
+
+    def setUp(self):
+        """Create a small input and a generated workload"""
+        super().setUp()
+        self.input = self.temp / "input.csv"
+        self.input.write_text(HEADER + "CVS,300,9AM,5PM,1000,1\nANMC,200,8AM,11AM,900,2\n"
+                              "Kaiser,100,1AM,3AM,50,3\nCVS,60,6PM,8PM,3,2\n")
+        self.generated = self.temp / "generated.csv"
+        with open(self.generated, "w", newline="") as f:
+            WorkloadGenerator(seed=3, customers=40).write(f, 500)
+
+    def _schedule(self, path: Path, **options) -> Scheduler:
+        scheduler = Scheduler(**options)
+        scheduler.process_requirements(InputParser.parse_csv_batch(str(path)))
+        return scheduler
+
+    def test_apply_matches_edited_input(self):
+        """A scenario schedules like the input edited by hand: calls, durations and windows changed, zero-call rows dropped"""
+        edited = self.temp / "edited.csv"
+        edited.write_text(HEADER + "CVS,330,8AM,4PM,1300,1\nANMC,200,8AM,11AM,900,2\nCVS,66,5PM,7PM,4,2\n")
+        scenario = Scenario("edited", [Change(["CVS"], scale_calls=1.3, shift_minutes=-60, scale_duration=1.1),
+                                       Change(["Kai*"], scale_calls=0)], utilization=0.8)
+        for engine in Scheduler.ENGINES:
+            engine_ = ScenarioEngine(InputParser.parse_csv_batch(str(self.input)), engine=engine)
+            baseline, result = engine_.run([scenario], workers=1)
+            expected = self._schedule(edited, utilization=0.8, engine=engine)
+            self.assertEqual(result.totals.tolist(), expected.schedule.totals.tolist())
+            self.assertEqual(baseline.totals.tolist(), self._schedule(self.input).schedule.totals.tolist())
+            self.assertEqual((baseline.name, result.name, result.utilization), (BASELINE, "edited", 0.8))
+            self.assertEqual(result.peak_agents, max(expected.schedule.totals.tolist()))
+            self.assertEqual(result.agent_hours, sum(expected.schedule.totals.tolist()))
+
+    def test_pool_matches_serial(self):
+        """Scenarios evaluated in worker processes give the serial results, in order, also with pooled Erlang C"""
+        scenarios = [Scenario(f"growth {i}", [Change(["Customer 0*"], scale_calls=1 + i / 10, shift_minutes=15 * i)])
+                     for i in range(12)]
+        with redirect_stderr(io.StringIO()):
+            base = InputParser.parse_csv_batch(str(self.generated))
+        for erlang in (None, ErlangC(0.8, pooled=True)):
+            engine = ScenarioEngine(base, engine="numpy", resolution=15, erlang=erlang)
+            serial = engine.run(scenarios, workers=1)
+            pooled = engine.run(scenarios, workers=3)
+            self.assertEqual([r.name for r in pooled], [BASELINE] + [s.name for s in scenarios])
+            self.assertEqual([r.totals.tolist() for r in pooled], [r.totals.tolist() for r in serial])
+
+    def test_load_errors(self):
+        """Malformed scenario files, unknown keys and customers that match nothing raise ValueError"""
+        path = self.temp / "scenarios.json"
+        for content in ('{"scenarios": {}}', '[{"changes": []}]', '[{"name": "a", "scale": 2}]',
+                        '[{"name": "a", "changes": [{"scale_calls": "2"}]}]', '[{"name": "a", "utilization": 1.5}]',
+                        '[{"name": "a"}, {"name": "a"}]', f'[{{"name": "{BASELINE}"}}]', "not json"):
+            path.write_text(content)
+            with self.assertRaises(ValueError, msg=content):
+                ScenarioEngine.load(str(path))
+
+        path.write_text('[{"name": "a", "changes": [{"customers": "CVS", "shift_hours": 1.5}]}]')
+        (scenario,) = ScenarioEngine.load(str(path))
+        self.assertEqual(scenario.changes, [Change(["CVS"], shift_minutes=90)])
+        scenario.changes.append(Change(["Nobody"]))
+        engine = ScenarioEngine(InputParser.parse_csv_batch(str(self.input)))
+        with self.assertRaisesRegex(ValueError, "Nobody"):
+            engine.run([scenario], workers=1)
+
+    def test_command_line(self):
+        """--scenarios writes the comparison table with the baseline first"""
+        scenarios, output = self.temp / "scenarios.json", self.temp / "out.csv"
+        scenarios.write_text(json.dumps({"scenarios": [{"name": "cvs", "changes": [{"customers": ["CVS"], "scale_calls": 2}]}]}))
+        subprocess.run([sys.executable, "-m", "src.main", "--input", str(self.input), "--scenarios", str(scenarios),
+                        "--format", "csv", "--output", str(output)], cwd=ROOT, check=True, capture_output=True)
+        with open(output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["scenario"] for row in rows], [BASELINE, "cvs"])
+        self.assertEqual(int(rows[0]["peak_change"]), 0)
+        self.assertGreater(int(rows[1]["peak_change"]), 0)
+
+        result = subprocess.run([sys.executable, "-m", "src.main", "--input", str(self.input), "--scenarios",
+                                 str(scenarios), "--stream"], cwd=ROOT, capture_output=True)
+        self.assertNotEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
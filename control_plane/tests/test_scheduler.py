@@ -1,7 +1,8 @@
 import unittest
 import math
+from typing import List
 from src.scheduler import Scheduler
-from src.models import CallRequirement, HourlyStat
+from src.models import CallRequirement, HourlyStat, RequirementBatch, ScheduleMatrix
 
 
 class TestScheduler(unittest.TestCase):
@@ -307,6 +308,516 @@ class TestScheduler(unittest.TestCase):
         # 2 calls/hour * 3600 sec/call / 3600 sec = 2 agents
         self.assertEqual(self.scheduler.schedule[9].total_agents, 2)
 
+    # Tests for the vectorized engine
+    def _assert_same_schedule(self, requirements: List[CallRequirement], utilization: float = 1.0):
+        python_scheduler = Scheduler(utilization=utilization, engine="python")
+        numpy_scheduler = Scheduler(utilization=utilization, engine="numpy")
+        python_scheduler.process_requirements(requirements)
+        numpy_scheduler.process_requirements(requirements)
+        for expected, actual in zip(python_scheduler.schedule, numpy_scheduler.schedule):
+            self.assertEqual(expected.total_agents, actual.total_agents)
+            # Compare as lists so that breakdown order is checked as well
+            self.assertEqual(list(expected.breakdown.items()), list(actual.breakdown.items()))
+
+    def test_numpy_engine_matches_python_engine(self):
+        """Test that the numpy engine produces the same schedule as the python engine"""
+        requirements = [
+            CallRequirement(customer_name="Stanford Hospital", avg_duration_sec=300, start_hour=9, end_hour=19, total_calls=20000, priority=1),
+            CallRequirement(customer_name="VNS", avg_duration_sec=120, start_hour=6, end_hour=13, total_calls=40500, priority=1),
+            CallRequirement(customer_name="CVS", avg_duration_sec=180, start_hour=11, end_hour=15, total_calls=50000, priority=3),
+            CallRequirement(customer_name="SJC", avg_duration_sec=1200, start_hour=10, end_hour=12, total_calls=500, priority=4),
+            CallRequirement(customer_name="ANMC", avg_duration_sec=400, start_hour=7, end_hour=20, total_calls=80000, priority=5),
+            CallRequirement(customer_name="NMDX", avg_duration_sec=220, start_hour=0, end_hour=24, total_calls=40000, priority=3),
+        ]
+        for utilization in (1.0, 0.85, 0.33, 0.0):
+            self._assert_same_schedule(requirements, utilization)
+
+    def test_numpy_engine_matches_python_engine_duplicate_customers(self):
+        """Test that both engines accumulate repeated customers the same way"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=600, start_hour=9, end_hour=11, total_calls=12, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=300, start_hour=8, end_hour=12, total_calls=100, priority=2),
+            CallRequirement(customer_name="A", avg_duration_sec=900, start_hour=8, end_hour=10, total_calls=40, priority=1),
+            CallRequirement(customer_name="C", avg_duration_sec=60, start_hour=10, end_hour=11, total_calls=7, priority=3),
+            CallRequirement(customer_name="A", avg_duration_sec=60, start_hour=10, end_hour=14, total_calls=5, priority=1),
+        ]
+        self._assert_same_schedule(requirements)
+
+    def test_numpy_engine_accumulates_across_calls(self):
+        """Test that processing requirements in several calls matches a single python pass"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=600, start_hour=9, end_hour=11, total_calls=12, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=300, start_hour=8, end_hour=12, total_calls=100, priority=2),
+            CallRequirement(customer_name="A", avg_duration_sec=900, start_hour=8, end_hour=10, total_calls=40, priority=1),
+        ]
+        expected = Scheduler(engine="python")
+        expected.process_requirements(requirements)
+        actual = Scheduler(engine="numpy")
+        actual.process_requirements(requirements[:1])
+        actual.process_requirements(requirements[1:])
+        for e, a in zip(expected.schedule, actual.schedule):
+            self.assertEqual(e.total_agents, a.total_agents)
+            self.assertEqual(list(e.breakdown.items()), list(a.breakdown.items()))
+
+    def test_process_requirements_consumes_generator_in_chunks(self):
+        """Test that both engines fold a generator of requirements without materializing it"""
+        requirements = [
+            CallRequirement(customer_name=f"Customer {i % 7}", avg_duration_sec=60 * (i + 1), start_hour=i % 20, end_hour=20 + i % 4, total_calls=10 * (i + 1), priority=1)
+            for i in range(25)
+        ]
+        expected = Scheduler(engine="python")
+        expected.process_requirements(iter(requirements))
+        actual = Scheduler(engine="numpy")
+        actual.CHUNK_SIZE = 4
+        actual.process_requirements(req for req in requirements)
+        for e, a in zip(expected.schedule, actual.schedule):
+            self.assertEqual(e.total_agents, a.total_agents)
+            self.assertEqual(list(e.breakdown.items()), list(a.breakdown.items()))
+        self.assertEqual(list(expected.customers), [f"Customer {i}" for i in range(7)])
+        self.assertEqual(list(actual.customers), list(expected.customers))
+
+    def test_process_requirement_batch(self):
+        """Test that both engines accept a RequirementBatch directly"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=600, start_hour=9, end_hour=11, total_calls=12, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=300, start_hour=8, end_hour=12, total_calls=100, priority=2),
+            CallRequirement(customer_name="A", avg_duration_sec=900, start_hour=8, end_hour=10, total_calls=40, priority=1),
+        ]
+        expected = Scheduler(engine="python")
+        expected.process_requirements(requirements)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements(RequirementBatch.from_requirements(requirements))
+            for e, a in zip(expected.schedule, scheduler.schedule):
+                self.assertEqual(e.total_agents, a.total_agents)
+                self.assertEqual(list(e.breakdown.items()), list(a.breakdown.items()))
+            self.assertEqual(list(scheduler.customers), ["A", "B"])
+
+    def test_numpy_engine_empty_requirements(self):
+        """Test that the numpy engine handles an empty requirements list"""
+        scheduler = Scheduler(engine="numpy")
+        scheduler.process_requirements([])
+        for bucket in scheduler.schedule:
+            self.assertEqual(bucket.total_agents, 0)
+            self.assertEqual(bucket.breakdown, {})
+
+    def test_scheduler_unknown_engine(self):
+        """Test that an unknown engine name is rejected"""
+        with self.assertRaises(ValueError):
+            Scheduler(engine="gpu")
+
+    # Tests for the ScheduleMatrix representation
+    def test_schedule_matrix_cells_and_totals(self):
+        """Test that the schedule is an hours x customers matrix with cached totals"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=600, start_hour=9, end_hour=11, total_calls=12, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=3600, start_hour=10, end_hour=12, total_calls=4, priority=2),
+        ]
+        self.scheduler.process_requirements(requirements)
+
+        schedule = self.scheduler.schedule
+        self.assertIsInstance(schedule, ScheduleMatrix)
+        self.assertEqual(schedule.customer_names, ["A", "B"])
+        self.assertEqual(schedule.cells.shape, (24, 2))
+        self.assertEqual(schedule.cells[9:12].tolist(), [[1, 0], [1, 2], [0, 2]])
+        self.assertEqual(schedule.totals[9:12].tolist(), [1, 3, 2])
+
+    def test_schedule_matrix_views_refresh_after_add(self):
+        """Test that hourly views are cached but reflect later changes"""
+        schedule = ScheduleMatrix()
+        self.assertEqual(schedule[5].breakdown, {})
+        self.assertIs(schedule[5], schedule[5])
+
+        schedule.add(schedule.customer_id("A"), 5, 7, 3)
+
+        self.assertEqual(schedule[5].total_agents, 3)
+        self.assertEqual(schedule[5].breakdown, {"A": 3})
+        self.assertEqual(schedule[-1].hour, 23)
+
+    def test_schedule_matrix_grows_with_customers(self):
+        """Test that interning many customers keeps earlier columns intact"""
+        schedule = ScheduleMatrix()
+        for i in range(100):
+            schedule.add(schedule.customer_id(f"Customer {i}"), i % 24, 24, i + 1)
+
+        self.assertEqual(len(schedule.customer_names), 100)
+        self.assertEqual(schedule.cells.shape, (24, 100))
+        self.assertEqual(schedule[23].breakdown["Customer 0"], 1)
+        self.assertEqual(schedule[23].total_agents, sum(range(1, 101)))
+
+    # Tests for the incremental API
+    def _requirement(self, name: str, start: int, end: int, calls: int, duration: int = 3600) -> CallRequirement:
+        return CallRequirement(customer_name=name, avg_duration_sec=duration, start_hour=start, end_hour=end, total_calls=calls, priority=1)
+
+    def _assert_schedule_equal(self, expected: Scheduler, actual: Scheduler):
+        for e, a in zip(expected.schedule, actual.schedule):
+            self.assertEqual(e.total_agents, a.total_agents)
+            self.assertEqual(e.breakdown, a.breakdown)
+
+    def test_repeated_customer_breakdown_accumulates(self):
+        """Test that rows for the same customer add up instead of overwriting each other"""
+        self.scheduler.process_requirements([
+            self._requirement("A", 8, 12, 8),   # 2 agents
+            self._requirement("A", 10, 14, 12), # 3 agents
+        ])
+
+        self.assertEqual(self.scheduler.schedule[9].breakdown, {"A": 2})
+        self.assertEqual(self.scheduler.schedule[10].breakdown, {"A": 5})
+        self.assertEqual(self.scheduler.schedule[13].breakdown, {"A": 3})
+        for bucket in self.scheduler.schedule:
+            self.assertEqual(bucket.total_agents, sum(bucket.breakdown.values()))
+
+    def test_add_requirement_matches_batch(self):
+        """Test that adding requirements one by one equals processing them together"""
+        requirements = [self._requirement("A", 8, 12, 8), self._requirement("B", 10, 14, 12)]
+        expected = Scheduler()
+        expected.process_requirements(requirements)
+
+        for req in requirements:
+            self.scheduler.add_requirement(req)
+
+        self._assert_schedule_equal(expected, self.scheduler)
+
+    def test_remove_requirement(self):
+        """Test that removing a requirement restores the schedule without it"""
+        kept = self._requirement("A", 8, 12, 8)
+        removed = self._requirement("A", 10, 14, 12)
+        self.scheduler.process_requirements([kept, removed, self._requirement("B", 9, 10, 1)])
+        self.scheduler.remove_requirement(removed)
+
+        expected = Scheduler()
+        expected.process_requirements([kept, self._requirement("B", 9, 10, 1)])
+        self._assert_schedule_equal(expected, self.scheduler)
+
+    def test_remove_requirement_not_scheduled(self):
+        """Test that removing something that was never scheduled is rejected"""
+        self.scheduler.add_requirement(self._requirement("A", 8, 12, 8))
+        with self.assertRaises(ValueError):
+            self.scheduler.remove_requirement(self._requirement("B", 8, 12, 8))
+        with self.assertRaises(ValueError):
+            self.scheduler.remove_requirement(self._requirement("A", 6, 12, 6))
+        # A failed removal leaves the schedule untouched
+        self.assertEqual(self.scheduler.schedule[8].breakdown, {"A": 2})
+
+    def test_replace_requirement(self):
+        """Test that replacing a requirement equals scheduling the new one instead"""
+        old = self._requirement("A", 8, 12, 8)
+        new = self._requirement("A", 14, 16, 10)
+        self.scheduler.add_requirement(old)
+        self.scheduler.replace_requirement(old, new)
+
+        expected = Scheduler()
+        expected.add_requirement(new)
+        self._assert_schedule_equal(expected, self.scheduler)
+
+    def test_replace_customer(self):
+        """Test that replacing a customer drops all of its previous rows"""
+        self.scheduler.process_requirements([
+            self._requirement("A", 8, 12, 8),
+            self._requirement("B", 9, 11, 4),
+            self._requirement("A", 10, 14, 12),
+        ])
+        self.scheduler.replace_customer("A", [self._requirement("A", 0, 2, 2)])
+
+        expected = Scheduler()
+        expected.process_requirements([self._requirement("B", 9, 11, 4), self._requirement("A", 0, 2, 2)])
+        self._assert_schedule_equal(expected, self.scheduler)
+        with self.assertRaises(ValueError):
+            self.scheduler.replace_customer("A", [self._requirement("B", 0, 2, 2)])
+
+    def test_remove_restores_priority(self):
+        """Test that retracting requirements restores the priority of the rest, and drops customers left with none"""
+        urgent = CallRequirement(customer_name="A", avg_duration_sec=3600, start_hour=8, end_hour=10, total_calls=4, priority=1)
+        routine = CallRequirement(customer_name="A", avg_duration_sec=3600, start_hour=12, end_hour=14, total_calls=4, priority=4)
+        other = CallRequirement(customer_name="B", avg_duration_sec=3600, start_hour=9, end_hour=11, total_calls=2, priority=2)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements([urgent, routine, other])
+            self.assertEqual(scheduler.priorities, {"A": 1, "B": 2})
+            scheduler.remove_requirements([urgent])
+            self.assertEqual(scheduler.priorities, {"A": 4, "B": 2})
+            scheduler.remove_requirements([other])
+            self.assertEqual(scheduler.priorities, {"A": 4})
+
+        self.scheduler.process_requirements([urgent, other])
+        self.scheduler.replace_requirement(urgent, routine)
+        self.assertEqual(self.scheduler.priorities, {"A": 4, "B": 2})
+
+    def test_remove_requirement_keeps_views(self):
+        """Test that the check before a removal does not rebuild the schedule or drop its cached views"""
+        self.scheduler.process_requirements([self._requirement("A", 8, 12, 8), self._requirement("B", 9, 11, 4)])
+        view = self.scheduler.schedule[9]
+        self.scheduler.add_requirement(self._requirement("B", 14, 16, 2))
+        self.scheduler.remove_requirement(self._requirement("A", 8, 12, 8))
+        # Only the checked column was summed; B's change is still pending
+        self.assertEqual(self.scheduler.schedule._dirty, {0, 1})
+        self.assertIs(self.scheduler.schedule._views.get(9), view)
+        self.assertEqual(self.scheduler.schedule[9].breakdown, {"B": 2})
+
+    def test_refresh_keeps_unchanged_views(self):
+        """Test that a change drops only the cached views of the slots it reaches"""
+        self.scheduler.process_requirements([self._requirement("A", 8, 12, 8)])
+        views = [self.scheduler.schedule[slot] for slot in (7, 9, 14)]
+        self.scheduler.add_requirement(self._requirement("B", 9, 11, 4))
+        self.scheduler.add_requirement(self._requirement("A", 14, 15, 4))
+        self.scheduler.remove_requirement(self._requirement("A", 14, 15, 4))
+        self.assertIs(self.scheduler.schedule[7], views[0])
+        # Slot 14 went back to its old value, so its view is still right
+        self.assertIs(self.scheduler.schedule[14], views[2])
+        self.assertIsNot(self.scheduler.schedule[9], views[1])
+        self.assertEqual(self.scheduler.schedule[9].breakdown, {"A": 2, "B": 2})
+
+    def test_remove_requirements_checks_batch(self):
+        """Test that a batch removal of agents that are not scheduled fails on both engines, the numpy one without retracting anything"""
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements([self._requirement("A", 8, 12, 8), self._requirement("B", 9, 11, 4)])
+            before = scheduler.schedule.cells.copy()
+            # Each row on its own fits A's column, but not both together
+            twice = [self._requirement("B", 9, 11, 4), self._requirement("A", 8, 12, 8), self._requirement("A", 9, 10, 8)]
+            for requirements in (twice, [self._requirement("C", 9, 10, 4)]):
+                with self.assertRaises(ValueError, msg=engine):
+                    scheduler.remove_requirements(requirements)
+                if engine == "numpy":
+                    self.assertEqual(scheduler.schedule.cells.tolist(), before.tolist())
+                    self.assertEqual(scheduler.customers, ["A", "B"])
+
+    def test_removed_customer_not_listed(self):
+        """Test that customers with nothing left scheduled drop out of customers"""
+        self.scheduler.process_requirements([self._requirement("A", 8, 12, 8), self._requirement("B", 9, 11, 4)])
+        self.scheduler.replace_customer("A", [])
+        self.assertEqual(self.scheduler.customers, ["B"])
+
+
+    # Tests for sub-hour resolution
+    def test_quarter_hour_resolution(self):
+        """Test that a 15 minute schedule has 96 buckets and follows minute boundaries"""
+        req = CallRequirement(customer_name="A", avg_duration_sec=3600, start_hour=9, start_minute=15,
+                              end_hour=10, end_minute=45, total_calls=6, priority=1)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine, resolution=15)
+            scheduler.process_requirements([req])
+
+            self.assertEqual(len(scheduler.schedule), 96)
+            # 6 calls over 1.5 hours = 4 calls/hour = 4 agents
+            active = [(slot.hour, slot.minute) for slot in scheduler.schedule if slot.total_agents]
+            self.assertEqual(active, [(9, 15), (9, 30), (9, 45), (10, 0), (10, 15), (10, 30)])
+            self.assertEqual(scheduler.schedule[37].total_agents, 4)
+
+    def test_hourly_resolution_floors_minutes(self):
+        """Test that minutes inside an hour bucket do not change the hourly schedule"""
+        with_minutes = CallRequirement(customer_name="A", avg_duration_sec=300, start_hour=9, start_minute=20,
+                                       end_hour=12, end_minute=40, total_calls=900, priority=1)
+        self.scheduler.process_requirements([with_minutes])
+
+        expected = Scheduler()
+        expected.process_requirements([self._requirement("A", 9, 12, 900, duration=300)])
+        self._assert_schedule_equal(expected, self.scheduler)
+
+    def test_resolution_engines_match(self):
+        """Test that both engines agree at every supported resolution"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=180, start_hour=6, start_minute=10, end_hour=13, end_minute=50, total_calls=40500, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=400, start_hour=0, end_hour=24, total_calls=80000, priority=2),
+            CallRequirement(customer_name="A", avg_duration_sec=60, start_hour=23, start_minute=5, end_hour=23, end_minute=55, total_calls=100, priority=1),
+        ]
+        for resolution in (5, 15, 30, 60):
+            python_scheduler = Scheduler(resolution=resolution)
+            numpy_scheduler = Scheduler(engine="numpy", resolution=resolution)
+            python_scheduler.process_requirements(requirements)
+            numpy_scheduler.process_requirements(requirements)
+            self._assert_schedule_equal(python_scheduler, numpy_scheduler)
+
+    def test_window_inside_one_slot(self):
+        """Test that a window starting and ending inside one bucket is scheduled in that bucket on both engines"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=300, start_hour=9, start_minute=15, end_hour=9, end_minute=45, total_calls=120, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=60, start_hour=23, start_minute=5, end_hour=23, end_minute=55, total_calls=100, priority=2),
+        ]
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements(requirements)
+            totals = scheduler.schedule.totals.tolist()
+            # 120 calls of 5 minutes in one hour need 10 agents; 100 one minute calls need 2
+            self.assertEqual((totals[9], totals[23], sum(totals)), (10, 2, 12))
+
+            quarter = Scheduler(engine=engine, resolution=15)
+            quarter.process_requirements(requirements[:1])
+            # 9:15-9:45 covers the 9:15 and 9:30 buckets: 120 calls in half an hour are 240 an hour
+            self.assertEqual(quarter.schedule.totals.tolist()[36:40], [0, 20, 20, 0])
+            self.assertEqual(int(quarter.schedule.totals.sum()), 40)
+
+    def test_invalid_resolution(self):
+        """Test that resolutions that do not divide an hour are rejected"""
+        with self.assertRaises(ValueError):
+            Scheduler(resolution=7)
+
+
+    # Tests for multi-day horizons
+    def test_overnight_window_wraps_to_morning(self):
+        """Test that a window past midnight of a one day horizon continues at hour 0"""
+        req = CallRequirement(customer_name="Night", avg_duration_sec=3600, start_hour=22, end_hour=6, end_day=1,
+                              total_calls=16, priority=1)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements([req])
+            # 16 calls over 8 hours = 2 agents in hours 22-23 and 0-5
+            self.assertEqual([slot.total_agents for slot in scheduler.schedule], [2] * 6 + [0] * 16 + [2] * 2)
+
+    def test_weekly_horizon(self):
+        """Test that a week has 168 hourly buckets and windows can span several days"""
+        req = CallRequirement(customer_name="A", avg_duration_sec=3600, start_day=1, start_hour=12,
+                              end_day=3, end_hour=12, total_calls=96, priority=1)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine, days=7)
+            scheduler.process_requirements([req])
+
+            self.assertEqual(len(scheduler.schedule), 168)
+            active = [slot for slot in scheduler.schedule if slot.total_agents]
+            self.assertEqual(len(active), 48)
+            self.assertEqual((active[0].day, active[0].hour), (1, 12))
+            self.assertEqual((active[-1].day, active[-1].hour), (3, 11))
+            self.assertTrue(all(slot.breakdown == {"A": 2} for slot in active))
+
+    def test_window_longer_than_horizon(self):
+        """Test that a window that does not fit the horizon is rejected"""
+        req = CallRequirement(customer_name="A", avg_duration_sec=300, start_hour=9, end_day=1, end_hour=10,
+                              total_calls=10, priority=1)
+        for engine in Scheduler.ENGINES:
+            with self.assertRaises(ValueError):
+                Scheduler(engine=engine).process_requirements([req])
+            Scheduler(engine=engine, days=2).process_requirements([req])
+
+    def test_remove_wrapped_requirement(self):
+        """Test that a requirement wrapping past the end of the horizon can be removed again"""
+        req = CallRequirement(customer_name="A", avg_duration_sec=3600, start_day=6, start_hour=20, end_day=7, end_hour=4,
+                              total_calls=8, priority=1)
+        scheduler = Scheduler(days=7)
+        scheduler.add_requirement(req)
+        self.assertEqual(scheduler.schedule[0].breakdown, {"A": 1})
+        self.assertEqual(scheduler.schedule[-1].breakdown, {"A": 1})
+
+        scheduler.remove_requirement(req)
+        self.assertEqual(scheduler.schedule.totals.sum(), 0)
+
+    def test_fold_weekly_schedule(self):
+        """Test that folding sums or takes the peak of each hour across the days"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=3600, start_day=day, start_hour=9, end_day=day, end_hour=10,
+                            total_calls=calls, priority=1)
+            for day, calls in [(0, 3), (2, 5), (4, 1)]
+        ] + [CallRequirement(customer_name="B", avg_duration_sec=3600, start_day=2, start_hour=9, end_day=2, end_hour=10,
+                             total_calls=4, priority=1)]
+        scheduler = Scheduler(engine="numpy", days=7)
+        scheduler.process_requirements(requirements)
+
+        summed = scheduler.schedule.fold("sum")
+        self.assertEqual(len(summed), 24)
+        self.assertEqual(summed[9].total_agents, 13)
+        self.assertEqual(summed[9].breakdown, {"A": 9, "B": 4})
+
+        peak = scheduler.schedule.fold("max")
+        self.assertEqual(peak[9].total_agents, 9)
+        self.assertEqual(peak[9].breakdown, {"A": 5, "B": 4})
+        self.assertEqual(peak[10].total_agents, 0)
+        with self.assertRaises(ValueError):
+            scheduler.schedule.fold("mean")
+
+    def test_multi_day_engines_match(self):
+        """Test that both engines agree on wrapped and multi-day windows"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=180, start_day=6, start_hour=22, start_minute=30,
+                            end_day=7, end_hour=6, total_calls=900, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=400, start_day=0, start_hour=9, end_day=4, end_hour=17,
+                            total_calls=80000, priority=2),
+            CallRequirement(customer_name="A", avg_duration_sec=60, start_day=3, start_hour=0, end_day=3, end_hour=24,
+                            total_calls=100, priority=1),
+        ]
+        for resolution in (15, 60):
+            python_scheduler = Scheduler(resolution=resolution, days=7)
+            numpy_scheduler = Scheduler(engine="numpy", resolution=resolution, days=7)
+            python_scheduler.process_requirements(requirements)
+            numpy_scheduler.process_requirements(requirements)
+            self._assert_schedule_equal(python_scheduler, numpy_scheduler)
+
+    def test_aggregate_merges_duplicate_rows(self):
+        """Test that rows with the same customer, window, duration and priority merge into one, in first-seen order"""
+        batch = RequirementBatch.from_columns(
+            ["A", "B", "A", "A", "B"], [300, 600, 300, 300, 600], [540, 540, 540, 540, 540],
+            [600, 600, 600, 660, 600], [5, 7, 5, 5, 1], [1, 1, 1, 1, 1], row_numbers=[10, 11, 12, 13, 14],
+        )
+        groups = batch.aggregate()
+
+        self.assertEqual([groups.customer_names[c] for c in groups.customer_ids.tolist()], ["A", "B", "A"])
+        self.assertEqual(groups.total_calls.tolist(), [10, 8, 5])
+        self.assertEqual(groups.end_minute.tolist(), [600, 600, 660])
+        self.assertEqual(groups.row_numbers.tolist(), [10, 11, 13])
+        self.assertEqual(len(RequirementBatch.from_columns([], [], [], [], [], []).aggregate()), 0)
+
+    def test_aggregated_schedule_rounds_once_per_group(self):
+        """Test that duplicates are staffed as one demand by both engines, with breakdowns matching totals"""
+        requirements = [self._requirement("A", 9, 10, 1, duration=600)] * 3 + [self._requirement("B", 9, 11, 4, duration=900)]
+        groups = RequirementBatch.from_requirements(requirements).aggregate()
+        self.assertEqual(len(groups), 2)
+        for engine in Scheduler.ENGINES:
+            scheduler = Scheduler(engine=engine)
+            scheduler.process_requirements(groups)
+            # 3 calls of 10 minutes need one agent, not one per row
+            self.assertEqual(scheduler.schedule[9].breakdown, {"A": 1, "B": 1})
+            for bucket in scheduler.schedule:
+                self.assertEqual(bucket.total_agents, sum(bucket.breakdown.values()))
+
+    def test_aggregate_input_matches_across_chunks(self):
+        """Test that aggregating a stream chunk by chunk gives the groups of the whole input"""
+        from src.main import aggregate_input
+        requirements = [self._requirement(f"C{i % 7}", i % 5, 12 + i % 3, 10 + i) for i in range(200)]
+        expected = RequirementBatch.from_requirements(requirements).aggregate()
+        for chunk_size in (1, 16, 1000):
+            streamed = aggregate_input([iter(requirements)], chunk_size)
+            self.assertEqual(list(streamed.to_requirements()), list(expected.to_requirements()))
+        merged = RequirementBatch.concat([RequirementBatch.from_requirements(requirements[:50]),
+                                          RequirementBatch.from_requirements(requirements[50:])])
+        self.assertEqual(list(merged.to_requirements()), requirements)
+
+    def test_schedule_matrix_merge_and_pickle(self):
+        """Test that merging partial matrices adds them up by name and that a pickled matrix keeps its cells"""
+        import pickle
+        first, second, whole = (ScheduleMatrix() for _ in range(3))
+        first.add(first.customer_id("A"), 9, 12, 2)
+        second.add(second.customer_id("B"), 22, 26, 1)
+        second.add(second.customer_id("A"), 10, 11, 3)
+        for customer, start, end, agents in (("A", 9, 12, 2), ("B", 22, 26, 1), ("A", 10, 11, 3)):
+            whole.add(whole.customer_id(customer), start, end, agents)
+        first.merge(pickle.loads(pickle.dumps(second)))
+
+        self.assertEqual(first.customer_names, ["A", "B"])
+        self.assertEqual(first.cells.tolist(), whole.cells.tolist())
+        self.assertEqual(first.totals.tolist(), whole.totals.tolist())
+        with self.assertRaises(ValueError):
+            first.merge(ScheduleMatrix(days=2))
+
+    def test_process_sharded_matches_serial(self):
+        """Test that a sharded run equals the serial one exactly, customer order and priorities included"""
+        from src.erlang import ErlangC
+        requirements = [
+            CallRequirement(customer_name=f"C{i % 13}", avg_duration_sec=60 + 7 * i, start_day=i % 3,
+                            start_hour=(5 * i) % 24, end_day=i % 3 + 1, end_hour=(3 * i) % 24,
+                            total_calls=50 + 31 * i, priority=1 + i % 5)
+            for i in range(120)
+        ]
+        for engine in Scheduler.ENGINES:
+            for erlang in (None, ErlangC(0.8, pooled=True)):
+                serial = Scheduler(engine=engine, days=3, erlang=erlang)
+                serial.process_requirements(requirements)
+                sharded = Scheduler(engine=engine, days=3, erlang=erlang)
+                sharded.process_sharded(requirements, shards=4, workers=2)
+
+                self.assertEqual(sharded.schedule.customer_names, serial.schedule.customer_names)
+                self.assertEqual(sharded.schedule.cells.tolist(), serial.schedule.cells.tolist())
+                self.assertEqual(sharded.schedule.totals.tolist(), serial.schedule.totals.tolist())
+                self.assertEqual(list(sharded.priorities.items()), list(serial.priorities.items()))
+                if erlang is not None:
+                    self.assertEqual(sharded.pooled_schedule().totals.tolist(), serial.pooled_schedule().totals.tolist())
 
 if __name__ == '__main__':
     unittest.main()
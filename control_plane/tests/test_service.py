@@ -0,0 +1,183 @@
+import unittest
+import http.client
+import io
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from src.formatter import Formatter
+from src.parser import InputParser
+from src.scheduler import Scheduler
+from src.service import SchedulerHTTPServer, SchedulerService
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+class TestSchedulerService(unittest.TestCase):
+    """Unit tests for the SchedulerService class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.service = SchedulerService(max_sessions=2)
+        self.input = (DATA_DIR / "e2e_input.csv").read_bytes()
+
+    def _reference(self, fmt="json", **options) -> bytes:
+        scheduler = Scheduler(**options)
+        scheduler.process_requirements(InputParser.parse_csv_batch(str(DATA_DIR / "e2e_input.csv")))
+        out = io.StringIO(newline="")
+        if fmt == "json":
+            Formatter.print_json(scheduler.schedule, out)
+        else:
+            Formatter.print_text(scheduler.schedule, out)
+        return out.getvalue().encode()
+
+    def _requirement(self, **fields) -> dict:
+        return {"customer_name": "Night Line", "avg_duration_sec": 600, "start_hour": 22, "end_hour": 23,
+                "total_calls": 60, "priority": 1, **fields}
+
+    def test_schedule_upload(self):
+        """A CSV upload answers with the schedule the command line would print"""
+        response = self.service.handle("POST", "/schedule?format=json", self.input, "text/csv")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.body, self._reference())
+
+        response = self.service.handle("POST", "/schedule?format=text&utilization=0.8&resolution=30", self.input)
+        self.assertEqual(response.body, self._reference("text", utilization=0.8, resolution=30))
+
+        response = self.service.handle("POST", "/schedule?format=csv", self.input)
+        self.assertEqual(response.body, (DATA_DIR / "e2e_ground_truth.csv").read_bytes())
+        self.assertEqual(response.headers["X-Skipped-Rows"], "0")
+
+    def test_schedule_json_body(self):
+        """A JSON list of requirements is validated and scheduled"""
+        body = json.dumps([self._requirement()]).encode()
+        response = self.service.handle("POST", "/schedule?format=text", body, "application/json")
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"22:00 total=10; Night Line=10", response.body)
+
+        body = json.dumps([self._requirement(end_hour=21)]).encode()
+        self.assertEqual(self.service.handle("POST", "/schedule", body, "application/json").status, 400)
+
+    def test_session_deltas(self):
+        """Sessions take added, replaced and removed requirements"""
+        response = self.service.handle("POST", "/sessions", self.input, "text/csv")
+        self.assertEqual(response.status, 201)
+        session = f"/sessions/{json.loads(response.body)['id']}"
+        self.assertEqual(self.service.handle("GET", f"{session}/schedule").body, self._reference())
+
+        night = json.dumps([self._requirement()]).encode()
+        self.service.handle("POST", f"{session}/requirements", night, "application/json")
+        self.assertIn(b'"Night Line": 10', self.service.handle("GET", f"{session}/schedule").body)
+
+        # Retracting it twice conflicts, and leaves the schedule as it was
+        self.assertEqual(self.service.handle("DELETE", f"{session}/requirements", night, "application/json").status, 200)
+        self.assertEqual(self.service.handle("DELETE", f"{session}/requirements", night, "application/json").status, 409)
+        self.assertEqual(self.service.handle("GET", f"{session}/schedule").body, self._reference())
+
+        self.service.handle("PUT", f"{session}/customers/Night%20Line", night, "application/json")
+        self.service.handle("DELETE", f"{session}/customers/Night%20Line")
+        self.assertEqual(self.service.handle("GET", f"{session}/schedule").body, self._reference())
+
+        self.assertEqual(self.service.handle("DELETE", session).status, 204)
+        self.assertEqual(self.service.handle("GET", f"{session}/schedule").status, 404)
+
+    def test_rejects_bad_requests(self):
+        """Bad options, bodies and routes get client errors, and sessions are capped"""
+        self.assertEqual(self.service.handle("POST", "/schedule?resolution=7", self.input).status, 400)
+        self.assertEqual(self.service.handle("POST", "/schedule?format=xml", self.input).status, 400)
+        self.assertEqual(self.service.handle("POST", "/schedule?pooled=true", self.input).status, 400)
+        pooled_capacity = "/schedule?service_level=0.8&pooled=true&capacity=100"
+        self.assertEqual(self.service.handle("POST", pooled_capacity, self.input).status, 400)
+        self.assertEqual(self.service.handle("POST", "/schedule", b"not,a,header\n").status, 400)
+        self.assertEqual(self.service.handle("POST", "/schedule", b"{", "application/json").status, 400)
+        self.assertEqual(self.service.handle("GET", "/nowhere").status, 404)
+        for _ in range(2):
+            self.assertEqual(self.service.handle("POST", "/sessions").status, 201)
+        self.assertEqual(self.service.handle("POST", "/sessions").status, 503)
+
+    def test_idle_sessions_expire(self):
+        """Sessions left unused for the TTL are dropped and free their slots"""
+        service = SchedulerService(max_sessions=2, session_ttl=60)
+        ids = [json.loads(service.handle("POST", "/sessions").body)["id"] for _ in range(2)]
+        self.assertEqual(service.handle("POST", "/sessions").status, 503)
+        # One was used a minute ago, the other just now
+        service._sessions[ids[0]].last_used -= 61
+        self.assertEqual(service.handle("GET", f"/sessions/{ids[1]}/schedule").status, 200)
+        self.assertEqual(service.handle("POST", "/sessions").status, 201)
+        self.assertEqual(service.handle("GET", f"/sessions/{ids[0]}/schedule").status, 404)
+        self.assertEqual(service.handle("GET", f"/sessions/{ids[1]}/schedule").status, 200)
+
+    def test_bad_content_length(self):
+        """A negative or non-numeric Content-Length is answered with 400 instead of a hang or a dropped connection"""
+        # Requests queue for the one worker, so one still blocked in a read would time the last request out
+        server = SchedulerHTTPServer(("127.0.0.1", 0), self.service, workers=1, backlog=4, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            for length in ("-1", "abc"):
+                connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+                connection.putrequest("POST", "/schedule")
+                connection.putheader("Content-Length", length)
+                connection.endheaders()
+                response = connection.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertIn(b"Content-Length", response.read())
+                connection.close()
+            # The worker slot is free again
+            request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/schedule", data=self.input,
+                                             method="POST")
+            with urllib.request.urlopen(request, timeout=5) as response:
+                self.assertEqual(response.status, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_server(self):
+        """The HTTP server answers with CORS headers and turns requests away when every slot is taken"""
+        server = SchedulerHTTPServer(("127.0.0.1", 0), self.service, workers=2, backlog=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_port}/schedule?format=csv"
+        try:
+            request = urllib.request.Request(url, data=self.input, method="POST")
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.read(), (DATA_DIR / "e2e_ground_truth.csv").read_bytes())
+                self.assertEqual(response.headers["Access-Control-Allow-Origin"], "*")
+
+            for _ in range(2):
+                server._slots.acquire()
+            with self.assertRaises(urllib.error.HTTPError) as busy:
+                urllib.request.urlopen(urllib.request.Request(url, data=self.input, method="POST"))
+            self.assertEqual(busy.exception.code, 503)
+            for _ in range(2):
+                server._slots.release()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+    def test_busy_server_answers_without_reading(self):
+        """A turned away client gets its 503 before it has sent anything, and the server keeps answering"""
+        server = SchedulerHTTPServer(("127.0.0.1", 0), self.service, workers=1, backlog=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            server._slots.acquire()
+            started = time.monotonic()
+            with socket.create_connection(("127.0.0.1", server.server_port), timeout=5) as silent:
+                self.assertTrue(silent.recv(1 << 16).startswith(b"HTTP/1.1 503 "))
+            self.assertLess(time.monotonic() - started, 0.5)
+            server._slots.release()
+
+            request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/health")
+            with urllib.request.urlopen(request, timeout=5) as response:
+                self.assertEqual(json.load(response)["status"], "ok")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import csv
+import io
+import subprocess
+import sys
+from contextlib import redirect_stderr
+from pathlib import Path
+from src.erlang import ErlangC
+from src.generator import WorkloadGenerator
+from src.parser import InputParser
+from src.scheduler import Scheduler
+from src.smoothing import Flexibility, Move, PeakSmoother
+from tests.helpers import HEADER, TempDirTestCase
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestPeakSmoother(TempDirTestCase):
+    """Unit tests for the PeakSmoother class"""
+
+    def setUp(self):
+        """Create an input where two customers of 100 agents each share the 10AM slot"""
+        super().setUp()
+        self.input = self.temp / "input.csv"
+        self.input.write_text(HEADER + "Urgent,360,10AM,11AM,1000,1\nLater,360,10AM,11AM,1000,5\n")
+
+    def test_moves_lowest_priority_first(self):
+        """Of two customers that can clear the peak, the one with the lower priority moves"""
+        batch = InputParser.parse_csv_batch(str(self.input))
+        flexible = [Flexibility(["Urgent", "Later"], max_shift_minutes=120)]
+        for engine in Scheduler.ENGINES:
+            smoothing = PeakSmoother(flexible, engine=engine).smooth(batch)
+            self.assertEqual(smoothing.before.totals.max(), 200)
+            self.assertEqual(smoothing.moves, [Move("Later", 5, -60, 0)])
+            self.assertEqual(smoothing.after.totals.tolist()[9:11], [100, 100])
+            self.assertEqual(smoothing.before.customer_names, smoothing.after.customer_names)
+
+    def test_urgent_customer_waits_for_less_urgent_moves(self):
+        """An urgent customer keeps its window while moving less urgent ones lowers the peak as far, even when the first pass moved it"""
+        self.input.write_text(HEADER + "Urgent,3600,6AM,9AM,9,1\nLater,3600,8AM,10AM,10,5\nFixed,3600,8AM,12PM,8,3\n")
+        batch = InputParser.parse_csv_batch(str(self.input))
+        flexible = [Flexibility(["Urgent", "Later"], max_shift_minutes=120)]
+        for engine in Scheduler.ENGINES:
+            smoothing = PeakSmoother(flexible, engine=engine).smooth(batch)
+            self.assertEqual(smoothing.before.totals.max(), 10)
+            # Moving Urgent an hour earlier would also give a peak of 7, and Later would then stay put
+            self.assertEqual(smoothing.moves, [Move("Later", 5, 60, 0)])
+            self.assertEqual(smoothing.after.totals.max(), 7)
+
+    def test_stretch_spreads_calls(self):
+        """A stretch spreads the same calls over more slots, within the limit"""
+        self.input.write_text(HEADER + "Urgent,360,9AM,11AM,2000,1\nLater,360,10AM,12PM,2000,5\n"
+                              "Fixed,360,10AM,11AM,1000,2\n")
+        batch = InputParser.parse_csv_batch(str(self.input))
+        smoothing = PeakSmoother([Flexibility(["Fixed"], max_stretch_minutes=180)]).smooth(batch)
+        self.assertEqual(smoothing.moves, [Move("Fixed", 2, 0, 180)])
+        self.assertEqual(smoothing.before.totals.tolist()[9:14], [100, 300, 100, 0, 0])
+        self.assertEqual(smoothing.after.totals.tolist()[9:14], [100, 225, 125, 25, 25])
+
+    def test_generated_workload(self):
+        """Both engines make the same moves, within their limits, and lower the peak, also with Erlang C"""
+        path = self.temp / "generated.csv"
+        with open(path, "w", newline="") as f:
+            WorkloadGenerator(seed=11, customers=80, sub_hour=0.3).write(f, 1500)
+        with redirect_stderr(io.StringIO()):
+            batch = InputParser.parse_csv_batch(str(path))
+        flexible = [Flexibility(["*"], max_shift_minutes=90), Flexibility(["Customer 00*"], 120, 60)]
+        results = []
+        for engine in Scheduler.ENGINES:
+            for erlang in (None, ErlangC(0.8)):
+                smoother = PeakSmoother(flexible, engine=engine, resolution=30, erlang=erlang)
+                smoothing = smoother.smooth(batch)
+                self.assertLess(smoothing.after.totals.max(), smoothing.before.totals.max())
+                for move in smoothing.moves:
+                    self.assertLessEqual(abs(move.shift_minutes), 120 if move.customer.startswith("Customer 00") else 90)
+                    self.assertLessEqual(move.stretch_minutes, 60 if move.customer.startswith("Customer 00") else 0)
+                results.append((smoothing.moves, smoothing.after.totals.tolist()))
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(results[1], results[3])
+
+    def test_load_errors(self):
+        """Malformed flexibility files and customers that match nothing raise ValueError"""
+        path = self.temp / "flexible.json"
+        for content in ('{"flexible": {}}', '[{"max_shift_hours": 1}]', '[{"customers": ["A"]}]',
+                        '[{"customers": ["A"], "max_shift_hours": -1}]', '[{"customers": "A", "shift": 1}]', "[oops"):
+            path.write_text(content)
+            with self.assertRaises(ValueError, msg=content):
+                PeakSmoother.load(str(path))
+        path.write_text('{"flexible": [{"customers": "Later", "max_shift_hours": 1.5, "max_stretch_minutes": 30}]}')
+        self.assertEqual(PeakSmoother.load(str(path)), [Flexibility(["Later"], 90, 30)])
+
+        batch = InputParser.parse_csv_batch(str(self.input))
+        with self.assertRaisesRegex(ValueError, "Nobody"):
+            PeakSmoother([Flexibility(["Nobody"], 60)]).smooth(batch)
+        with self.assertRaises(ValueError):
+            PeakSmoother([], erlang=ErlangC(0.8, pooled=True))
+
+    def test_command_line(self):
+        """--smooth writes the smoothed schedule, the schedule before and the moves"""
+        flexible, output = self.temp / "flexible.json", self.temp / "out" / "smoothed.csv"
+        flexible.write_text('[{"customers": ["Urgent", "Later"], "max_shift_hours": 2}]')
+        subprocess.run([sys.executable, "-m", "src.main", "--input", str(self.input), "--smooth", str(flexible),
+                        "--format", "csv", "--output", str(output)], cwd=ROOT, check=True, capture_output=True)
+        with open(output.with_name("smoothed_moves.csv"), newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [["customer", "priority", "shift_minutes", "stretch_minutes"],
+                                                   ["Later", "5", "-60", "0"]])
+        with open(output, newline="") as f:
+            self.assertEqual(max(int(row["total_agents"]) for row in csv.DictReader(f)), 100)
+        with open(output.with_name("smoothed_before.csv"), newline="") as f:
+            self.assertEqual(max(int(row["total_agents"]) for row in csv.DictReader(f)), 200)
+
+        result = subprocess.run([sys.executable, "-m", "src.main", "--input", str(self.input), "--smooth",
+                                 str(flexible), "--capacity", "10"], cwd=ROOT, capture_output=True)
+        self.assertNotEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
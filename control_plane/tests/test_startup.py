@@ -0,0 +1,59 @@
+import unittest
+import subprocess
+import sys
+from pathlib import Path
+from src import main
+from src.columnar import ColumnarStore
+from src.models import ScheduleMatrix
+from src.scheduler import Scheduler
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "tests" / "data"
+# Import time `python -m src.main --help` may spend, in milliseconds (about 40 when this was written)
+HELP_IMPORT_BUDGET_MS = 150
+HEAVY_MODULES = ("numpy", "pydantic", "termcolor", "dateutil")
+
+
+def import_profile(*args: str):
+    """(module names, total import time in ms) of `python -m src.main *args`, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "src.main", *args], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules, total_us = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules.append(name.strip())
+        total_us += int(self_us)
+    return modules, total_us / 1000
+
+
+class TestStartup(unittest.TestCase):
+    """Import budget of the command line entry path"""
+
+    def _assert_not_imported(self, modules, heavy):
+        loaded = [name for name in modules if name.split(".")[0] in heavy]
+        self.assertEqual(loaded, [])
+
+    def test_help_skips_heavy_imports(self):
+        """--help loads neither numpy nor pydantic and stays within its import budget"""
+        modules, total_ms = import_profile("--help")
+        self._assert_not_imported(modules, HEAVY_MODULES)
+        self.assertNotIn("src.models", modules)
+        self.assertLess(total_ms, HELP_IMPORT_BUDGET_MS)
+
+    def test_numpy_engine_skips_pydantic(self):
+        """The numpy engine never validates a row model, so it does not import pydantic"""
+        modules, _ = import_profile("--input", str(DATA_DIR / "e2e_input.csv"), "--engine", "numpy")
+        self.assertIn("numpy", modules)
+        self._assert_not_imported(modules, ("pydantic",))
+
+    def test_choices_match(self):
+        """The argument choices main declares up front match the classes they stand in for"""
+        self.assertEqual(main.ENGINES, Scheduler.ENGINES)
+        self.assertEqual(main.FOLDS, ScheduleMatrix.FOLDS)
+        self.assertEqual(main.COLUMNAR_FORMATS, ColumnarStore.FORMATS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import random
+from src.models import CallRequirement, RequirementBatch
+from src.scheduler import Scheduler
+from src.sweep import UtilizationSweep
+
+
+class TestUtilizationSweep(unittest.TestCase):
+    """Unit tests for the UtilizationSweep class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        rng = random.Random(7)
+        self.requirements = []
+        for i in range(300):
+            start = rng.randint(0, 23)
+            self.requirements.append(CallRequirement(
+                customer_name=f"Customer {rng.randint(0, 40)}",
+                avg_duration_sec=rng.randint(1, 3600),
+                start_hour=start,
+                end_hour=rng.randint(start + 1, 24),
+                total_calls=rng.randint(1, 100000),
+                priority=rng.randint(1, 5),
+            ))
+
+    def test_parse_range_is_inclusive_and_exact(self):
+        """Test that range values equal the floats parsed from their decimal strings"""
+        values = UtilizationSweep.parse_range("0.6:1.0:0.01")
+        self.assertEqual(len(values), 41)
+        self.assertEqual(values[0], 0.6)
+        self.assertEqual(values[-1], 1.0)
+        self.assertEqual(values[1], float("0.61"))
+        self.assertEqual(values[30], float("0.9"))
+
+    def test_parse_range_invalid(self):
+        """Test that malformed ranges are rejected"""
+        for spec in ["0.6:1.0", "a:b:c", "1.0:0.6:0.1", "0.6:1.0:0"]:
+            with self.assertRaises(ValueError):
+                UtilizationSweep.parse_range(spec)
+
+    def test_sweep_matches_scheduler_per_utilization(self):
+        """Test that every sweep row equals a separate Scheduler run at that utilization"""
+        utilizations = UtilizationSweep.parse_range("0.01:1.0:0.01") + [0.0, 0.333]
+        sweep = UtilizationSweep(utilizations)
+        sweep.CHUNK_SIZE = 64
+        sweep.process_batch(RequirementBatch.from_requirements(self.requirements))
+
+        for row, utilization in enumerate(utilizations):
+            scheduler = Scheduler(utilization=utilization)
+            scheduler.process_requirements(self.requirements)
+            self.assertEqual(sweep.totals[row].tolist(), [slot.total_agents for slot in scheduler.schedule], utilization)
+
+
+    def test_sweep_with_resolution(self):
+        """Test that a sub-hour sweep matches the scheduler at the same resolution"""
+        sweep = UtilizationSweep([0.5, 1.0], resolution=30)
+        sweep.process_batch(RequirementBatch.from_requirements(self.requirements))
+
+        self.assertEqual(sweep.totals.shape, (2, 48))
+        for row, utilization in enumerate(sweep.utilizations):
+            scheduler = Scheduler(utilization=utilization, resolution=30)
+            scheduler.process_requirements(self.requirements)
+            self.assertEqual(sweep.totals[row].tolist(), [slot.total_agents for slot in scheduler.schedule])
+
+
+    def test_sweep_multi_day_wrap_and_fold(self):
+        """Test that a weekly sweep wraps like the scheduler and folds to one day"""
+        requirements = [
+            CallRequirement(customer_name="A", avg_duration_sec=600, start_day=6, start_hour=22, end_day=7, end_hour=6,
+                            total_calls=800, priority=1),
+            CallRequirement(customer_name="B", avg_duration_sec=300, start_day=0, start_hour=9, end_day=4, end_hour=17,
+                            total_calls=10000, priority=2),
+        ]
+        sweep = UtilizationSweep([0.8, 1.0], days=7)
+        sweep.process_batch(RequirementBatch.from_requirements(requirements))
+
+        for row, utilization in enumerate(sweep.utilizations):
+            scheduler = Scheduler(utilization=utilization, days=7)
+            scheduler.process_requirements(requirements)
+            self.assertEqual(sweep.totals[row].tolist(), scheduler.schedule.totals.tolist())
+
+        expected = sweep.totals.reshape(2, 7, 24).max(axis=1).tolist()
+        sweep.fold("max")
+        self.assertEqual(sweep.totals.tolist(), expected)
+        self.assertEqual(sweep.slots, 24)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+from src.time_normalizer import TimeNormalizer
+
+
+class TestTimeNormalizer(unittest.TestCase):
+    """Unit tests for the TimeNormalizer class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.normalizer = TimeNormalizer()
+
+    def test_bare_hours(self):
+        """Test that bare integers are read as hours, including 24 for end of day"""
+        self.assertEqual(self.normalizer.hour("0"), 0)
+        self.assertEqual(self.normalizer.hour("9"), 9)
+        self.assertEqual(self.normalizer.hour("17"), 17)
+        self.assertEqual(self.normalizer.hour("24"), 24)
+
+    def test_meridiem_formats(self):
+        """Test 12-hour formats, including the 12AM and 12PM edge cases"""
+        self.assertEqual(self.normalizer.hour("9AM"), 9)
+        self.assertEqual(self.normalizer.hour("12AM"), 0)
+        self.assertEqual(self.normalizer.hour("12PM"), 12)
+        self.assertEqual(self.normalizer.hour("12:30 am"), 0)
+        self.assertEqual(self.normalizer.hour("7:00 PM"), 19)
+        self.assertEqual(self.normalizer.hour("9 a.m."), 9)
+        self.assertEqual(self.normalizer.hour("9p"), 21)
+
+    def test_minutes(self):
+        """Test that minutes are kept"""
+        self.assertEqual(self.normalizer.minutes("14:30"), 14 * 60 + 30)
+        self.assertEqual(self.normalizer.minutes("7:45 PM"), 19 * 60 + 45)
+        self.assertEqual(self.normalizer.minutes("15:45:30"), 15 * 60 + 45)
+
+    def test_dateutil_fallback(self):
+        """Test that formats outside the grammar still go through dateutil"""
+        self.assertEqual(self.normalizer.hour("2024-11-30 15:45"), 15)
+        self.assertEqual(self.normalizer.hour("13PM"), 13)
+
+    def test_invalid_formats(self):
+        """Test that invalid strings raise ValueError"""
+        for value in ["", "invalid time", "25", "25:00", "9:60", "16161"]:
+            with self.assertRaises(ValueError):
+                self.normalizer.hour(value)
+
+    def test_results_are_memoized(self):
+        """Test that each distinct string is parsed only once, including failures"""
+        with mock.patch.object(TimeNormalizer, "_normalize", wraps=TimeNormalizer._normalize) as normalize:
+            for _ in range(3):
+                self.normalizer.hour("9AM")
+                with self.assertRaises(ValueError):
+                    self.normalizer.hour("invalid time")
+        self.assertEqual(normalize.call_count, 2)
+
+    def test_cache_is_bounded(self):
+        """Test that the memo table does not grow past max_entries"""
+        normalizer = TimeNormalizer(max_entries=4)
+        for hour in range(10):
+            normalizer.hour(f"{hour}:00")
+        self.assertLessEqual(len(normalizer._cache), 4)
+
+
+    def test_day_prefixes(self):
+        """Test that weekday and day index prefixes are split off the time"""
+        self.assertEqual(self.normalizer.day_and_minutes("9:30"), (None, 570))
+        self.assertEqual(self.normalizer.day_and_minutes("Mon 22:00"), (0, 22 * 60))
+        self.assertEqual(self.normalizer.day_and_minutes("Tuesday 6AM"), (1, 6 * 60))
+        self.assertEqual(self.normalizer.day_and_minutes("sun. 12PM"), (6, 12 * 60))
+        self.assertEqual(self.normalizer.day_and_minutes("d10 9AM"), (10, 9 * 60))
+        with self.assertRaises(ValueError):
+            self.normalizer.day_and_minutes("Mon invalid")
+
+if __name__ == '__main__':
+    unittest.main()
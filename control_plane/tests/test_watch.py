@@ -0,0 +1,128 @@
+import unittest
+import io
+import os
+from contextlib import redirect_stderr
+from pathlib import Path
+from src.generator import WorkloadGenerator
+from src.parser import InputParser
+from src.scheduler import Scheduler
+from src.watch import InputWatcher, _changed_rows
+from tests.helpers import HEADER, TempDirTestCase
+
+
+class TestInputWatcher(TempDirTestCase):
+    """Unit tests for the InputWatcher class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        super().setUp()
+        out = io.StringIO(newline="")
+        WorkloadGenerator(seed=11, customers=30).write(out, 300)
+        self.lines = out.getvalue().splitlines(keepends=True)
+        self.input = self.temp / "input.csv"
+
+    def _write(self, path: Path, lines):
+        path.write_text("".join(lines))
+        # Make every write visible to the (mtime, size) check, even within one timer tick
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def _columns(self, scheduler: Scheduler) -> dict:
+        cells = scheduler.schedule.cells
+        return {name: cells[:, c].tolist() for c, name in enumerate(scheduler.schedule.customer_names)
+                if cells[:, c].any()}
+
+    def _assert_matches_fresh_parse(self, scheduler: Scheduler, *paths: Path):
+        fresh = Scheduler(engine=scheduler.engine)
+        with redirect_stderr(io.StringIO()):
+            for path in paths:
+                fresh.process_requirements(InputParser.parse_csv_batch(str(path)))
+        self.assertEqual(self._columns(scheduler), self._columns(fresh))
+        self.assertEqual(scheduler.schedule.totals.tolist(), fresh.schedule.totals.tolist())
+
+    def test_changed_rows(self):
+        """Only edited, appended and inserted lines are returned, with their row numbers"""
+        old = "".join(self.lines).encode()
+        edited = self.lines[:]
+        edited[101] = "Edited,300,9AM,5PM,10,1\n"
+        edited.insert(201, "Inserted,300,9AM,5PM,10,1\n")
+        edited.append("Appended,300,9AM,5PM,10,1\n")
+        _, removed, _, added = _changed_rows(old, "".join(edited).encode())
+
+        self.assertEqual(removed, [self.lines[101].rstrip("\n").encode()])
+        self.assertEqual(added, [(100, b"Edited,300,9AM,5PM,10,1"), (200, b"Inserted,300,9AM,5PM,10,1"),
+                                 (301, b"Appended,300,9AM,5PM,10,1")])
+        # Reordering rows changes nothing; a new header replaces every row
+        swapped = self.lines[:]
+        swapped[10], swapped[20] = swapped[20], swapped[10]
+        self.assertEqual(_changed_rows(old, "".join(swapped).encode())[1:4:2], ([], []))
+        _, removed, _, added = _changed_rows(old, ("name," + "".join(self.lines)).encode())
+        self.assertEqual((len(removed), len(added)), (300, 300))
+
+    def test_updates_match_full_parse(self):
+        """Edits, appends and deletions leave the same schedule as parsing the new file from scratch"""
+        for engine in Scheduler.ENGINES:
+            self._write(self.input, self.lines)
+            watcher = InputWatcher(str(self.input), Scheduler(engine=engine))
+            with redirect_stderr(io.StringIO()):
+                self.assertTrue(watcher.update())
+                self.assertFalse(watcher.update())
+                lines = self.lines[:]
+                lines[5] = lines[5].replace("Customer", "Renamed")
+                del lines[150:160]
+                lines.append("New,600,8AM,11AM,90,2\n")
+                self._write(self.input, lines)
+                self.assertTrue(watcher.update())
+            self._assert_matches_fresh_parse(watcher.scheduler, self.input)
+
+    def test_directory(self):
+        """A watched directory schedules all of its CSV files and follows files being added and removed"""
+        first, second = self.temp / "a.csv", self.temp / "b.csv"
+        self._write(first, self.lines[:150])
+        watcher = InputWatcher(str(self.temp), Scheduler(engine="numpy"))
+        with redirect_stderr(io.StringIO()):
+            watcher.update()
+            self._write(second, [HEADER] + self.lines[150:])
+            watcher.update()
+            self._assert_matches_fresh_parse(watcher.scheduler, first, second)
+            first.unlink()
+            watcher.update()
+        self._assert_matches_fresh_parse(watcher.scheduler, second)
+
+    def test_errors_keep_file_row_numbers(self):
+        """Rows rejected in a change are reported under their row in the file; a bad header keeps the old rows"""
+        self._write(self.input, self.lines)
+        watcher = InputWatcher(str(self.input), Scheduler())
+        with redirect_stderr(io.StringIO()):
+            watcher.update()
+        lines = self.lines[:]
+        lines[42] = "Broken,abc,9AM,5PM,10,1\n"
+        self._write(self.input, lines)
+        with redirect_stderr(io.StringIO()) as printed:
+            watcher.update()
+        self.assertIn("Error parsing row 41:", printed.getvalue())
+
+        before = self._columns(watcher.scheduler)
+        self._write(self.input, ["Wrong,Header\n"] + lines[1:])
+        with redirect_stderr(io.StringIO()) as printed:
+            self.assertFalse(watcher.update())
+        self.assertIn("keeping its previous rows", printed.getvalue())
+        self.assertEqual(self._columns(watcher.scheduler), before)
+
+    def test_watch_debounces(self):
+        """The watch loop applies a change once the file has settled and then calls back"""
+        self._write(self.input, self.lines)
+        watcher = InputWatcher(str(self.input), Scheduler(engine="numpy"))
+        with redirect_stderr(io.StringIO()):
+            watcher.update()
+        self._write(self.input, self.lines + ["Late,300,9AM,5PM,10,1\n"])
+        calls = []
+        with redirect_stderr(io.StringIO()):
+            watcher.watch(lambda: calls.append(len(watcher.scheduler.customers)), interval=0.01, debounce=0.01,
+                          stop=lambda: bool(calls))
+        self.assertEqual(len(calls), 1)
+        self.assertIn("Late", watcher.scheduler.customers)
+
+
+if __name__ == '__main__':
+    unittest.main()
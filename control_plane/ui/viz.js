@@ -12,13 +12,42 @@ class SchedulerVisualizer {
         const closeBtn = document.querySelector('.close');
 
         fileInput.addEventListener('change', (e) => this.handleFileUpload(e));
+        document.getElementById('serviceFetch').addEventListener('click', () => {
+            const url = document.getElementById('serviceUrl').value.trim();
+            if (url) this.loadFromURL(url);
+        });
         closeBtn.addEventListener('click', () => modal.style.display = 'none');
         window.addEventListener('click', (e) => {
             if (e.target === modal) modal.style.display = 'none';
         });
     }
 
+    async loadFromURL(url) {
+        // Fetch a schedule from the scheduler service (or any URL serving JSON or CSV)
+        try {
+            const response = await fetch(url);
+            if (!response.ok) throw new Error(`${response.status} ${await response.text()}`);
+            const text = await response.text();
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.includes('csv')) {
+                this.loadCSV(text);
+            } else {
+                this.loadJSON(text);
+            }
+            document.getElementById('fileName').textContent = url;
+        } catch (e) {
+            alert('Error fetching schedule: ' + e.message);
+        }
+    }
+
     async tryLoadDefaultFile() {
+        // ?source=<url> loads from the scheduler service instead of the outputs directory
+        const source = new URLSearchParams(window.location.search).get('source');
+        if (source) {
+            document.getElementById('serviceUrl').value = source;
+            await this.loadFromURL(source);
+            return;
+        }
         try {
             // Try to load from the outputs directory
             const response = await fetch('../outputs/schedule_20251201_102202.csv');
@@ -88,6 +117,7 @@ class SchedulerVisualizer {
 
                 schedule.push({
                     hour: parseInt(hourStr) || (schedule.length),
+                    label: hourStr,
                     total_agents: totalAgents,
                     breakdown: breakdown
                 });
@@ -105,6 +135,7 @@ class SchedulerVisualizer {
         if (Array.isArray(data)) {
             return data.map(item => ({
                 hour: item.hour || 0,
+                label: `${item.day !== undefined ? `d${item.day} ` : ''}${String(item.hour || 0).padStart(2, '0')}:${String(item.minute || 0).padStart(2, '0')}`,
                 total_agents: item.total_agents || 0,
                 breakdown: item.breakdown || {}
             }));
@@ -112,6 +143,11 @@ class SchedulerVisualizer {
         throw new Error('Invalid JSON format');
     }
 
+    slotLabel(slot, index) {
+        // Slots may be finer than an hour (e.g. 15-minute buckets), so prefer the label from the file
+        return slot.label || `${String(index).padStart(2, '0')}:00`;
+    }
+
     getColorIntensity(agents, max) {
         if (max === 0) return 'low';
         const ratio = agents / max;
@@ -140,7 +176,7 @@ class SchedulerVisualizer {
         });
 
         const peakHourIndex = this.schedule.findIndex(s => s.total_agents === maxAgents);
-        const peakHour = peakHourIndex !== -1 ? `${String(peakHourIndex).padStart(2, '0')}:00` : '-';
+        const peakHour = peakHourIndex !== -1 ? this.slotLabel(this.schedule[peakHourIndex], peakHourIndex) : '-';
 
         return {
             maxAgents,
@@ -169,12 +205,12 @@ class SchedulerVisualizer {
             const cell = document.createElement('div');
             cell.className = `hour-cell ${this.getColorIntensity(slot.total_agents, stats.maxAgents)}`;
 
-            const hourStr = String(index).padStart(2, '0');
+            const hourStr = this.slotLabel(slot, index);
             const breakdownCount = Object.keys(slot.breakdown).length;
 
             cell.innerHTML = `
                 <div>
-                    <div class="hour-time">${hourStr}:00</div>
+                    <div class="hour-time">${hourStr}</div>
                     <div class="hour-agents">${slot.total_agents}</div>
                     <div class="hour-label">${breakdownCount} customer${breakdownCount !== 1 ? 's' : ''}</div>
                 </div>
@@ -192,7 +228,7 @@ class SchedulerVisualizer {
         const breakdownList = document.getElementById('breakdownList');
         const modalTotal = document.getElementById('modalTotal');
 
-        modalTitle.textContent = `Hour ${hourStr}:00 - Agent Breakdown`;
+        modalTitle.textContent = `Hour ${hourStr} - Agent Breakdown`;
 
         breakdownList.innerHTML = '';
         if (Object.keys(slot.breakdown).length === 0) {